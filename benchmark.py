@@ -0,0 +1,291 @@
+"""
+Benchmark del motore di calcolo e della pagina Streamlit.
+
+Misura:
+- calcola_dettagli scalare (una chiamata per riga), anche attraverso CacheCalcolo
+- calcola_dettagli_batch e ral_per_netto_mensile_batch (vettoriali)
+- costruzione di grafico Netto vs Lordo, tabella simulazione e grafico ricchezza
+- rendering headless dell'intera pagina calc_stip.py (streamlit.testing)
+
+per le dimensioni richieste (default 1, 1.000 e 1.000.000 righe).
+
+I risultati vengono scritti in JSON; con una baseline salvata, ogni caso più
+lento della baseline oltre la soglia fa terminare lo script con codice 1.
+
+Esempi:
+    python benchmark.py --salva-baseline
+    python benchmark.py --soglia 0.25
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from motore_fiscale import ALIQUOTE_REGIONALI, calcola_dettagli
+from motore_batch import calcola_dettagli_batch
+
+BASELINE_PREDEFINITA = Path(__file__).with_name("benchmark_baseline.json")
+DIMENSIONI_PREDEFINITE = (1, 1_000, 1_000_000)
+
+# tempo minimo di misura per caso: i casi veloci vengono ripetuti
+TEMPO_MINIMO = 0.2
+RIPETIZIONI_MINIME = 3
+RIPETIZIONI_MASSIME = 200
+
+# parametri della pagina con i valori di default dell'app
+PARAMETRI_APP = dict(
+    regione="Lombardia",
+    addizionale_comunale_perc=0.8,
+    tipo_contratto="Indeterminato",
+    assicurazione_sanitaria_perc=0.0,
+    fondo_pensione_val=0.0,
+    fondo_pensione_perc=None,
+    premio_risultato=0.0,
+    premio_modalita="flat",
+    premio_flat_perc=1.0,
+    giorni_lavorati=365,
+)
+
+
+def popolazione(n: int, seme: int = 0) -> dict:
+    """n dipendenti casuali ma riproducibili, come colonne per calcola_dettagli_batch."""
+    rng = np.random.default_rng(seme)
+    regioni = np.array(list(ALIQUOTE_REGIONALI))
+    return {
+        "ral": rng.uniform(1000, 200000, n).round(),
+        "regione": regioni[rng.integers(0, len(regioni), n)],
+        "addizionale_comunale_perc": rng.uniform(0, 2, n).round(1),
+        "mensilita": rng.integers(12, 16, n),
+        "tipo_contratto": np.where(rng.random(n) < 0.1, "Apprendistato", "Indeterminato"),
+        "buono_giornaliero": rng.choice([0.0, 5.29, 8.0], n),
+        "giorni_buoni": rng.integers(180, 230, n),
+        "assicurazione_sanitaria_perc": np.zeros(n),
+        "fondo_pensione_val": np.where(rng.random(n) < 0.5, np.nan, rng.uniform(0, 5300, n)),
+        "fondo_pensione_perc": np.where(rng.random(n) < 0.5, np.nan, 2.0),
+        "contributo_datore_perc": rng.uniform(0, 3, n),
+        "premio_risultato": rng.choice([0.0, 1000.0, 3000.0], n),
+        "premio_modalita": rng.choice(["flat", "irpef"], n),
+        "premio_flat_perc": np.full(n, 5.0),
+        "welfare": rng.choice([0.0, 500.0], n),
+        "giorni_lavorati": np.full(n, 365),
+        "orario_settimanale": np.full(n, 40.0),
+        "giorni_ferie": rng.integers(20, 35, n),
+    }
+
+
+def misura(funzione) -> float:
+    """Mediana dei tempi di esecuzione di `funzione()` in secondi."""
+    tempi = []
+    inizio_totale = time.perf_counter()
+    while True:
+        inizio = time.perf_counter()
+        funzione()
+        tempi.append(time.perf_counter() - inizio)
+        trascorso = time.perf_counter() - inizio_totale
+        if len(tempi) >= RIPETIZIONI_MASSIME:
+            break
+        if len(tempi) >= RIPETIZIONI_MINIME and trascorso >= TEMPO_MINIMO:
+            break
+        if tempi[0] > TEMPO_MINIMO * 5:
+            # caso lento: una misura basta
+            break
+    return statistics.median(tempi)
+
+
+# -------------------------
+# Casi
+# -------------------------
+def caso_scalare(n: int):
+    colonne = popolazione(min(n, 1000))
+    # le righe scalari riusano (ciclicamente) al massimo 1000 combinazioni di parametri
+    parametri = [
+        {
+            nome: (None if isinstance(v[i], float) and np.isnan(v[i]) else v[i].item())
+            for nome, v in colonne.items() if nome != "ral"
+        }
+        for i in range(len(colonne["ral"]))
+    ]
+    ral = popolazione(n)["ral"].tolist()
+
+    def esegui():
+        for i, r in enumerate(ral):
+            calcola_dettagli(r, **parametri[i % len(parametri)])
+
+    return esegui
+
+
+def caso_scalare_cache(n: int):
+    from cache_calcolo import CacheCalcolo
+
+    # richieste ripetute: 10 profili e RAL al migliaio (circa 2.000 combinazioni)
+    colonne = popolazione(10)
+    parametri = [
+        tuple(
+            None if isinstance(v[i], float) and np.isnan(v[i]) else v[i].item()
+            for nome, v in colonne.items() if nome != "ral"
+        )
+        for i in range(10)
+    ]
+    ral = (popolazione(n)["ral"] // 1000 * 1000).tolist()
+
+    def esegui():
+        cache = CacheCalcolo(max_voci=4096)
+        for i, r in enumerate(ral):
+            cache.calcola_dettagli_record(r, *parametri[i % 10])
+
+    return esegui
+
+
+def caso_batch(n: int):
+    colonne = popolazione(n)
+    return lambda: calcola_dettagli_batch(**colonne)
+
+
+def caso_inverso(n: int):
+    from inversa import ral_per_netto_mensile_batch
+
+    obiettivi = np.random.default_rng(1).uniform(800, 6000, n)
+    return lambda: ral_per_netto_mensile_batch(obiettivi, 13, **PARAMETRI_APP)
+
+
+def caso_grafico_netto_lordo():
+    import grafici
+
+    return lambda: grafici.grafico_netto_lordo(**PARAMETRI_APP)
+
+
+def caso_tabella_simulazione():
+    import grafici
+
+    return lambda: grafici.tabella_simulazione(
+        ral_iniziale=10000,
+        step_ral=1000,
+        mensilita=13,
+        orario_settimanale=40.0,
+        giorni_ferie=26,
+        **PARAMETRI_APP
+    )
+
+
+def caso_grafico_ricchezza():
+    import grafici
+
+    return lambda: grafici.grafico_ricchezza(
+        [25000.0, 1672.0, 0.0, 2000.0],
+        ["Netto in busta", "Buoni pasto (scontati)", "Welfare (scontato)", "Fondo pensione + TFR (scontati)"]
+    )
+
+
+def caso_pagina():
+    import streamlit as st
+    from streamlit.logger import set_log_level
+    from streamlit.testing.v1 import AppTest
+
+    # senza runtime Streamlit avvisa a ogni esecuzione: qui non interessa
+    set_log_level("error")
+    percorso = str(Path(__file__).with_name("calc_stip.py"))
+
+    def esegui():
+        # senza cache: misura il costo di una sessione "fredda"
+        st.cache_data.clear()
+        app = AppTest.from_file(percorso, default_timeout=120).run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+    return esegui
+
+
+def esegui_benchmark(dimensioni) -> dict:
+    casi = {}
+    for n in dimensioni:
+        casi[f"scalare[{n}]"] = (n, caso_scalare(n))
+        casi[f"scalare_cache[{n}]"] = (n, caso_scalare_cache(n))
+        casi[f"batch[{n}]"] = (n, caso_batch(n))
+        casi[f"inverso_batch[{n}]"] = (n, caso_inverso(n))
+    casi["grafico_netto_lordo"] = (1, caso_grafico_netto_lordo())
+    casi["tabella_simulazione"] = (1, caso_tabella_simulazione())
+    casi["grafico_ricchezza"] = (1, caso_grafico_ricchezza())
+    casi["pagina"] = (1, caso_pagina())
+
+    risultati = {}
+    for nome, (righe, funzione) in casi.items():
+        secondi = misura(funzione)
+        risultati[nome] = {
+            "secondi": secondi,
+            "righe": righe,
+            "righe_al_secondo": righe / secondi if secondi > 0 else None,
+        }
+        print(f"{nome:<30} {secondi * 1000:>12.3f} ms", file=sys.stderr)
+    return risultati
+
+
+def confronta(risultati: dict, baseline: dict, soglia: float):
+    """Elenco dei casi più lenti della baseline di oltre `soglia` (0.25 = +25%)."""
+    regressioni = []
+    for nome, attuale in risultati.items():
+        riferimento = baseline.get(nome)
+        if riferimento is None:
+            continue
+        rapporto = attuale["secondi"] / riferimento["secondi"]
+        if rapporto > 1 + soglia:
+            regressioni.append((nome, riferimento["secondi"], attuale["secondi"], rapporto))
+    return regressioni
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del calcolatore stipendio.")
+    parser.add_argument(
+        "--dimensioni", type=int, nargs="+", default=list(DIMENSIONI_PREDEFINITE),
+        help="numero di righe per i casi scalare/batch (default: 1 1000 1000000)"
+    )
+    parser.add_argument(
+        "--baseline", type=Path, default=BASELINE_PREDEFINITA,
+        help=f"file JSON della baseline (default: {BASELINE_PREDEFINITA.name})"
+    )
+    parser.add_argument(
+        "--salva-baseline", action="store_true",
+        help="salva i risultati come nuova baseline invece di confrontarli"
+    )
+    parser.add_argument(
+        "--soglia", type=float, default=0.25,
+        help="rallentamento massimo tollerato rispetto alla baseline (default: 0.25 = +25%%)"
+    )
+    parser.add_argument("--output", type=Path, help="scrive anche qui i risultati in JSON")
+    args = parser.parse_args(argv)
+
+    documento = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "macchina": platform.platform(),
+        "risultati": esegui_benchmark(args.dimensioni),
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(documento, indent=2))
+
+    if args.salva_baseline:
+        args.baseline.write_text(json.dumps(documento, indent=2))
+        print(f"Baseline salvata in {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not args.baseline.exists():
+        print(f"Nessuna baseline in {args.baseline}: usa --salva-baseline", file=sys.stderr)
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())["risultati"]
+    regressioni = confronta(documento["risultati"], baseline, args.soglia)
+    for nome, prima, dopo, rapporto in regressioni:
+        print(
+            f"REGRESSIONE {nome}: {prima * 1000:.3f} ms -> {dopo * 1000:.3f} ms (x{rapporto:.2f})",
+            file=sys.stderr
+        )
+    return 1 if regressioni else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
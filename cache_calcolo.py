@@ -0,0 +1,177 @@
+"""
+Cache LRU facoltativa davanti al motore scalare.
+
+Molti chiamanti ripetono le stesse combinazioni (RAL tonde, 220 giorni di
+buoni pasto, addizionale comunale allo 0.8%): CacheCalcolo restituisce il
+risultato già calcolato invece di rifare il calcolo.
+
+La chiave è normalizzata su tutti i 18 argomenti:
+- i numeri sono arrotondati a `decimali` cifre e salvati come interi in
+  unità di 10**-decimali (30000 e 30000.0 danno la stessa chiave);
+- se fondo_pensione_val è impostato, fondo_pensione_perc viene ignorato
+  (come nel motore).
+Il calcolo avviene sui valori normalizzati, quindi il risultato non dipende
+da quale chiamata ha riempito la cache.
+
+Normalizzare 18 argomenti costa quasi quanto il calcolo stesso: le chiamate
+posizionali già viste passano da un indice sulla tupla di argomenti così
+com'è (alias della chiave normalizzata), senza normalizzare di nuovo.
+
+Uso:
+    cache = CacheCalcolo(max_voci=4096)
+    dettagli = cache.calcola_dettagli(30000, "Lombardia", 0.8, 13, ...)
+    cache.statistiche()
+"""
+import inspect
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from motore_fiscale import calcola_dettagli_record
+
+# argomenti di calcola_dettagli_record nell'ordine posizionale (senza quelli
+# facoltativi come `regole`, fissati per l'intera cache)
+_ARGOMENTI = tuple(
+    nome for nome, p in inspect.signature(calcola_dettagli_record).parameters.items()
+    if p.default is inspect.Parameter.empty
+)
+_POSIZIONE = {nome: i for i, nome in enumerate(_ARGOMENTI)}
+_FONDO_VAL = _POSIZIONE["fondo_pensione_val"]
+_FONDO_PERC = _POSIZIONE["fondo_pensione_perc"]
+_MANCANTE = object()
+# alias (tuple di argomenti esatte) conservati al massimo per ogni voce
+MAX_ALIAS_PER_VOCE = 8
+
+
+class StatisticheCache(NamedTuple):
+    successi: int
+    mancati: int
+    espulsioni: int
+    voci: int
+    max_voci: int
+
+    @property
+    def tasso_successo(self) -> float:
+        richieste = self.successi + self.mancati
+        return self.successi / richieste if richieste else 0.0
+
+
+class CacheCalcolo:
+    """
+    Cache LRU limitata per calcola_dettagli, condivisibile tra thread.
+
+    Il calcolo di una chiave mancante avviene fuori dal lock: due thread che
+    chiedono la stessa chiave nello stesso istante possono calcolarla
+    entrambi (risultato identico), ma nessuno resta in attesa dell'altro.
+    """
+
+    def __init__(self, max_voci: int = 4096, decimali: int = 6, regole=None):
+        if max_voci < 1:
+            raise ValueError("max_voci deve essere almeno 1")
+        self.max_voci = max_voci
+        self.decimali = decimali
+        self._scala = 10.0 ** decimali
+        self.regole = regole
+        # chiave normalizzata -> (record, alias); alias esatto -> chiave normalizzata
+        self._voci = OrderedDict()
+        self._alias = {}
+        self._lock = threading.Lock()
+        self._successi = 0
+        self._mancati = 0
+        self._espulsioni = 0
+
+    def _chiave(self, args, kwargs) -> tuple:
+        if kwargs:
+            if len(args) > len(_ARGOMENTI):
+                raise TypeError(f"attesi al massimo {len(_ARGOMENTI)} argomenti posizionali")
+            valori = list(args) + [_MANCANTE] * (len(_ARGOMENTI) - len(args))
+            for nome, valore in kwargs.items():
+                i = _POSIZIONE.get(nome)
+                if i is None:
+                    raise TypeError(f"argomento sconosciuto: {nome!r}")
+                if valori[i] is not _MANCANTE:
+                    raise TypeError(f"argomento ripetuto: {nome!r}")
+                valori[i] = valore
+            if any(v is _MANCANTE for v in valori):
+                mancanti = [n for n, v in zip(_ARGOMENTI, valori) if v is _MANCANTE]
+                raise TypeError(f"argomenti mancanti: {', '.join(mancanti)}")
+        elif len(args) == len(_ARGOMENTI):
+            valori = list(args)
+        else:
+            raise TypeError(f"attesi {len(_ARGOMENTI)} argomenti, ricevuti {len(args)}")
+
+        # round(v * scala) è molto più veloce di round(v, decimali) e, diviso per
+        # scala, restituisce lo stesso float
+        scala = self._scala
+        valori = [round(v * scala) if isinstance(v, (int, float)) else v for v in valori]
+        if valori[_FONDO_VAL] is not None:
+            valori[_FONDO_PERC] = None
+        return tuple(valori)
+
+    def calcola_dettagli_record(self, *args, **kwargs):
+        """Come motore_fiscale.calcola_dettagli_record (il record è immutabile e condiviso)."""
+        esatta = None
+        if not kwargs:
+            try:
+                hash(args)
+                esatta = args
+            except TypeError:
+                pass
+            else:
+                with self._lock:
+                    chiave = self._alias.get(esatta)
+                    if chiave is not None:
+                        self._voci.move_to_end(chiave)
+                        self._successi += 1
+                        return self._voci[chiave][0]
+
+        chiave = self._chiave(args, kwargs)
+        with self._lock:
+            voce = self._voci.get(chiave)
+            if voce is not None:
+                self._voci.move_to_end(chiave)
+                self._successi += 1
+                self._registra_alias(esatta, chiave, voce[1])
+                return voce[0]
+            self._mancati += 1
+
+        scala = self._scala
+        argomenti = [v / scala if isinstance(v, int) else v for v in chiave]
+        record = calcola_dettagli_record(*argomenti, regole=self.regole)
+
+        with self._lock:
+            voce = self._voci.get(chiave)
+            if voce is None:
+                voce = self._voci[chiave] = (record, [])
+                while len(self._voci) > self.max_voci:
+                    _, (_, alias) = self._voci.popitem(last=False)
+                    for a in alias:
+                        del self._alias[a]
+                    self._espulsioni += 1
+            self._voci.move_to_end(chiave)
+            self._registra_alias(esatta, chiave, voce[1])
+        return voce[0]
+
+    def _registra_alias(self, esatta, chiave, alias):
+        # da chiamare con il lock acquisito
+        if esatta is not None and esatta not in self._alias and len(alias) < MAX_ALIAS_PER_VOCE:
+            self._alias[esatta] = chiave
+            alias.append(esatta)
+
+    def calcola_dettagli(self, *args, **kwargs) -> dict:
+        """Come motore_fiscale.calcola_dettagli: ogni chiamata riceve un dizionario nuovo."""
+        return self.calcola_dettagli_record(*args, **kwargs).come_dizionario()
+
+    def statistiche(self) -> StatisticheCache:
+        with self._lock:
+            return StatisticheCache(
+                self._successi, self._mancati, self._espulsioni, len(self._voci), self.max_voci
+            )
+
+    def svuota(self):
+        """Elimina tutte le voci e azzera le statistiche."""
+        with self._lock:
+            self._voci.clear()
+            self._alias.clear()
+            self._successi = self._mancati = self._espulsioni = 0
+
@@ -1,326 +1,42 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-
-# ======================
-# ADDIZIONALI REGIONALI
-# ======================
-
-
-ALIQUOTE_REGIONALI = {
-    "Lazio": [
-        (15000, 0.0173),
-        (float("inf"), 0.0333)
-    ],
-    "Provincia Autonoma di Bolzano": [
-        (50000, 0.0123),
-        (float("inf"), 0.0173)
-    ],
-    "Provincia Autonoma di Trento": [
-        (50000, 0.0123),
-        (float("inf"), 0.0173)
-    ],
-    "Sicilia": [
-        (float("inf"), 0.0123)
-    ],
-    "Puglia": [
-        (15000, 0.0133),
-        (28000, 0.0143),
-        (50000, 0.0163),
-        (float("inf"), 0.0185)
-    ],
-    "Sardegna": [
-        (float("inf"), 0.0123)
-    ],
-    "Calabria": [
-        (float("inf"), 0.0173)
-    ],
-    "Molise": [
-        (15000, 0.0173),
-        (28000, 0.0193),
-        (50000, 0.0333),
-        (float("inf"), 0.0333)
-    ],
-    "Friuli Venezia Giulia": [
-        (15000, 0.0070),
-        (float("inf"), 0.0123)
-    ],
-    "Lombardia": [
-        (15000, 0.0123),
-        (28000, 0.0158),
-        (50000, 0.0172),
-        (float("inf"), 0.0173)
-    ],
-    "Liguria": [
-        (28000, 0.0123),
-        (50000, 0.0318),
-        (float("inf"), 0.0323)
-    ],
-    "Marche": [
-        (15000, 0.0123),
-        (28000, 0.0153),
-        (50000, 0.0170),
-        (float("inf"), 0.0173)
-    ],
-    "Umbria": [
-        (15000, 0.0173),
-        (28000, 0.0302),
-        (50000, 0.0312),
-        (float("inf"), 0.0333)
-    ],
-    "Valle d’Aosta": [
-        (float("inf"), 0.0123)
-    ],
-    "Piemonte": [
-        (15000, 0.0162),
-        (28000, 0.0268),
-        (50000, 0.0331),
-        (float("inf"), 0.0333)
-    ],
-    "Abruzzo": [
-        (28000, 0.0167),
-        (50000, 0.0287),
-        (float("inf"), 0.0333)
-    ],
-    "Veneto": [
-        (float("inf"), 0.0123)
-    ],
-    "Emilia-Romagna": [
-        (15000, 0.0133),
-        (28000, 0.0193),
-        (50000, 0.0278),
-        (float("inf"), 0.0333)
-    ],
-    "Toscana": [
-        (15000, 0.0142),
-        (28000, 0.0143),
-        (50000, 0.0332),
-        (float("inf"), 0.0333)
-    ],
-    "Basilicata": [
-        (float("inf"), 0.0123)
-    ],
-    "Campania": [
-        (15000, 0.0173),
-        (28000, 0.0296),
-        (50000, 0.0320),
-        (float("inf"), 0.0333)
-    ]
-}
-
-def calcola_addizionale_regionale(regione: str, reddito_imponibile: float) -> float:
-    """
-    Addizionale regionale IRPEF:
-    aliquota UNICA in base alla fascia di reddito.
-    NON è progressiva.
-    """
-    if regione not in ALIQUOTE_REGIONALI:
-        return 0.0
+from functools import partial, wraps
 
-    for soglia, aliquota in ALIQUOTE_REGIONALI[regione]:
-        if reddito_imponibile <= soglia:
-            return reddito_imponibile * aliquota
-
-    return 0.0
+import streamlit as st
 
+import grafici
+from comuni import DatasetComuni
+from fasi import SessioneCalcolo
+from montecarlo import PREMIO_MASSIMO, Distribuzione
+from ottimizzatore import ottimizza
+from motore_fiscale import REGOLE_2026
+from pacchetti_regole import descrizione, versioni_disponibili
+from profilazione import PROFILATORE
+from validazione import limiti_widget
 
 
 # -------------------------
-# Funzione per calcolare il netto
+# Grafici e tabelle (in cache tra un rerun e l'altro)
 # -------------------------
-def calcola_dettagli(
-    ral,
-    regione,
-    addizionale_comunale_perc,
-    mensilita,
-    tipo_contratto,
-
-    buono_giornaliero,
-    giorni_buoni,
-
-    assicurazione_sanitaria_perc,
-
-    fondo_pensione_val,
-    fondo_pensione_perc,
-    contributo_datore_perc,
-
-    premio_risultato,
-    premio_modalita,   # "flat" o "irpef"
-    premio_flat_perc,      # usato solo se flat
-    welfare,
-
-    giorni_lavorati,
-    orario_settimanale,
-    giorni_ferie
-):
-    # =========================
-    # 1. CONTRIBUTI INPS
-    # =========================
-    aliquota_inps = 0.0584 if tipo_contratto.lower() == "apprendistato" else 0.0919
-    contributi_inps = ral * aliquota_inps
-
-    # =========================
-    # 2. TFR
-    # =========================
-    tfr = ral / 13.5 - ral * 0.005
-
-    # =========================
-    # 3. FONDO PENSIONE (deducibile)
-    # =========================
-    base_fondo = ral - contributi_inps
-    if fondo_pensione_val is not None:
-        contributo_volontario = fondo_pensione_val
-    elif fondo_pensione_perc is not None:
-        contributo_volontario = base_fondo * fondo_pensione_perc / 100
-    else:
-        contributo_volontario = 0.0
-
-    contributo_datore = base_fondo * contributo_datore_perc / 100
-    fondo_totale = contributo_volontario + contributo_datore
-
-    # =========================
-    # 4. ASSICURAZIONE SANITARIA
-    # =========================
-    assicurazione = ral * assicurazione_sanitaria_perc / 100
-
-    # =========================
-    # 5. PREMIO VARIABILE
-    # =========================
-    if premio_modalita == "irpef":
-        ral_effettiva = ral + premio_risultato
-        premio_netto = 0  # viene tassato insieme alla RAL
-    else:
-        ral_effettiva = ral
-        premio_netto = premio_risultato * (1 - premio_flat_perc / 100)
-
-    # =========================
-    # 6. IMPONIBILE IRPEF
-    # =========================
-    imponibile = max(0, ral_effettiva - contributi_inps - contributo_volontario - assicurazione)
-
-    # =========================
-    # 7. IRPEF
-    # =========================
-    if imponibile <= 28000:
-        irpef_lorda = imponibile * 0.23
-    elif imponibile <= 50000:
-        irpef_lorda = 28000 * 0.23 + (imponibile - 28000) * 0.33
-    else:
-        irpef_lorda = 28000 * 0.23 + 22000 * 0.33 + (imponibile - 50000) * 0.43
-
-    # =========================
-    # 8. ADDIZIONALI
-    # =========================
-    add_regionale = calcola_addizionale_regionale(regione, imponibile)
-    add_comunale = imponibile * addizionale_comunale_perc / 100
-
-    if imponibile <= 8500:
-        imposta_lorda_totale = 0
-    else:
-        imposta_lorda_totale = irpef_lorda + add_regionale + add_comunale
-
-    # =========================
-    # 9. DETRAZIONI LAVORO + BONUS RENZI
-    # =========================
-
-    if imponibile < 8500:
-        detrazioni = 0
-    elif imponibile <= 15000:
-        detrazioni = 1955 + 1200
-    elif imponibile <= 28000:
-        detrazioni = 1910 + 1190 * (28000 - imponibile) / 13000
-    elif imponibile <= 50000:
-        detrazioni = 1910 * (50000 - imponibile) / 22000
-    else:
-        detrazioni = 0
-
-    detrazioni *= giorni_lavorati / 365
-
-    # =========================
-    # 10. AGEVOLAZIONI
-    # =========================
-
-    if imponibile <= 20000:
-        if imponibile <= 8500:
-            agevolazioni = imponibile * 0.071
-        elif imponibile <= 15000:
-            agevolazioni = imponibile * 0.053
-        else:
-            agevolazioni = imponibile * 0.048
-    elif imponibile <= 32000:
-        agevolazioni = 1000
-    elif imponibile <= 40000:
-        agevolazioni = 1000 * (40000 - imponibile) / 8000
-    else:
-        agevolazioni = 0.0
-
-    # =========================
-    # 11. IMPOSTA NETTA
-    # =========================
-    imposta_netta = max(0, imposta_lorda_totale - detrazioni) - agevolazioni
+# voci massime in cache per ciascuna funzione: oltre, le meno recenti vengono scartate
+MAX_VOCI_CACHE = 256
 
-    # imposta_netta =  imposta_lorda_totale - detrazioni - agevolazioni
-
-    # =========================
-    # 12. NETTO BUSTA
-    # =========================
-    netto_busta = imponibile - imposta_netta  + (premio_netto if premio_modalita=="flat" else 0)
-
-    # =========================
-    # 13. BUONI PASTO
-    # =========================
-    buoni_annui = buono_giornaliero * giorni_buoni
-    buoni_mensili = buoni_annui / 12
-
-    # =========================
-    # 14. NETTO TOTALE E MENSILE
-    # =========================
-    netto_totale = netto_busta + buoni_annui + welfare
-    netto_mensile = netto_busta / mensilita
-
-    tasse_totali = imposta_lorda_totale
-
-    # =========================
-    # 15. NETTO ORARIO
-    # =========================
-    GIORNI_LAVORATIVI_STANDARD = 253
-
-    giorni_effettivi = GIORNI_LAVORATIVI_STANDARD - giorni_ferie
-    ore_giornaliere = orario_settimanale / 5
-
-    ore_lavorate_annue = giorni_effettivi * ore_giornaliere
-
-    netto_orario = netto_busta / ore_lavorate_annue
-
-
-    return {
-        "Stipendio Lordo": ral,
-        "Reddito Imponibile Fiscale": imponibile,
-        "IRPEF Lorda": irpef_lorda,
-        "Addizionale Regionale": add_regionale,
-        "Addizionale Comunale": add_comunale,
-        "Detrazioni": detrazioni,
-        "Agevolazioni": agevolazioni,
-        "Tasse Totali": tasse_totali,
-        "Stipendio Netto": netto_busta,
-        "Stipendio Netto Orario": netto_orario,
-        "Buoni Pasto Annui": buoni_annui,
-        "Buoni Pasto Mensili": buoni_mensili,
-        "Stipendio Netto con buoni": netto_totale,
-        "Stipendio Netto Mensile": netto_mensile,
-        "Fondo Pensione Totale": fondo_totale,
-        "TFR": tfr,
-        "Premio Netto": premio_netto,
-        "Welfare": welfare,
-        "Regione": regione,
-        "Tipo Contratto": tipo_contratto
-    }
+# la chiave contiene solo i parametri da cui dipendono le colonne mostrate
+grafico_netto_lordo = st.cache_data(max_entries=MAX_VOCI_CACHE, show_spinner=False)(grafici.grafico_netto_lordo)
+grafico_netto_lordo_denso = st.cache_data(max_entries=MAX_VOCI_CACHE, show_spinner=False)(grafici.grafico_netto_lordo_denso)
+tabella_simulazione = st.cache_data(max_entries=MAX_VOCI_CACHE, show_spinner=False)(grafici.tabella_simulazione)
+tabella_proiezione = st.cache_data(max_entries=MAX_VOCI_CACHE, show_spinner=False)(grafici.tabella_proiezione)
+tabella_montecarlo = st.cache_data(max_entries=MAX_VOCI_CACHE, show_spinner="Simulazione in corso...")(grafici.tabella_montecarlo)
+grafico_ricchezza = grafici.grafico_ricchezza
 
+# dataset delle addizionali comunali (memory-map), se presente accanto all'app
+dataset_comuni = st.cache_resource(show_spinner=False)(DatasetComuni.apri_se_presente)()
 
 
 # -------------------------
 # Interfaccia Streamlit
 # -------------------------
+# tempi delle sezioni (solo con CALCOLATORE_PROFILAZIONE impostata)
+cronometro = PROFILATORE.cronometro("sezione")
+
 st.set_page_config(
     page_title="Calcolatore Stipendio Netto",
     page_icon="💶",
@@ -338,198 +54,234 @@ st.write(
     "e i dettagli fiscali in base alla tua situazione."
 )
 
-# -------------------------
-# Input principali
-# -------------------------
-col1, col2 = st.columns(2)
-
-lordo_input = col1.number_input(
-    "Stipendio Lordo Annuale (€)",
-    min_value=1000,
-    max_value=200000,
-    step=1000,
-    value=30000
+# con "Applica" gli input stanno in un form: più modifiche, un solo calcolo
+modalita_applica = st.toggle(
+    "Applica le modifiche con un pulsante",
+    help="Gli input vengono letti solo alla pressione di «Applica»: "
+         "utile per cambiarne molti senza ricalcolare a ogni modifica."
 )
 
-mensilita = col2.number_input(
-    "Numero di Mensilità",
-    min_value=12,
-    max_value=15,
-    step=1,
-    value=13
-)
-# -------------------------
-# Dati contrattuali
-# -------------------------
-col1, col2 = st.columns(2)
-
-with col1:
-    tipo_contratto = st.selectbox(
-        "Tipo di Contratto",
-        ["Indeterminato", "Apprendistato", "Determinato"],
-        index=0  # default Indeterminato
-    )
-
-with col2:
-    giorni_lavoro = st.number_input(
-        "Giorni di lavoro dipendente",
-        min_value=0,
-        max_value=365,
-        value=365,
-        step=1
-    )
-
-col3, col4 = st.columns(2)
-
-with col3:
-    regione = st.selectbox(
-        "Regione di Residenza",
-        [
-            "Lombardia", "Abruzzo", "Basilicata", "Calabria", "Campania",
-            "Emilia-Romagna", "Friuli Venezia Giulia", "Lazio",
-            "Liguria", "Marche", "Molise",
-            "Piemonte", "Puglia", "Sardegna", "Sicilia",
-            "Toscana", "Provincia Autonoma di Trento",
-            "Provincia Autonoma di Bolzano", "Umbria",
-            "Valle d’Aosta", "Veneto"
-        ],
-        index=0  
+with st.form("input", border=False) if modalita_applica else st.container():
+    # -------------------------
+    # Input principali
+    # -------------------------
+    col1, col2 = st.columns(2)
+
+    lordo_input = col1.number_input(
+        "Stipendio Lordo Annuale (€)",
+        **limiti_widget("ral"),
+        step=1000,
+        value=30000,
+        key="lordo_input"
     )
 
-with col4:
-    addizionale_comunale_perc = st.number_input(
-        "Addizionale Comunale (%)",
-        min_value=0.0,
-        max_value=2.0,
-        value=0.8,
-        step=0.1,
-        help="Es. Milano 0.8%"
-    )
-col1, col2 = st.columns(2)
-
-with col1:
-    orario_settimanale = st.number_input(
-        "Ore settimanali",
-        min_value=1.0,
-        max_value=120.0,
-        value=40.0,
-        step=0.5
-    )
-with col2:
-    giorni_ferie = st.number_input(
-        "Giorni di ferie e permessi annui",
-        min_value=0,
-        max_value=100,
-        value=26,
-        step=1
+    mensilita = col2.number_input(
+        "Numero di Mensilità",
+        **limiti_widget("mensilita"),
+        step=1,
+        value=13,
+        key="mensilita"
     )
+    # -------------------------
+    # Dati contrattuali
+    # -------------------------
+    col1, col2 = st.columns(2)
+
+    with col1:
+        tipo_contratto = st.selectbox(
+            "Tipo di Contratto",
+            ["Indeterminato", "Apprendistato", "Determinato"],
+            index=0,  # default Indeterminato
+            key="tipo_contratto"
+        )
 
-# -------------------------
-# Benefit e contributi
-# -------------------------
-st.subheader("💼 Benefit e contributi opzionali")
-
-col1, col2 = st.columns(2)
-with col1:
-    buoni_pasto = st.number_input(
-        "Importo buono pasto giornaliero (€)",
-        min_value=0.0,
-        value=8.0,
-        step=0.1
-    )
-with col2:
-    giorni_buoni_pasto = st.number_input(
-        "Giorni annuali con buono pasto",
-        min_value=0,
-        max_value=365,
-        value=220,
-        step=1
-    )
+    with col2:
+        giorni_lavoro = st.number_input(
+            "Giorni di lavoro dipendente",
+            **limiti_widget("giorni_lavorati"),
+            value=365,
+            step=1,
+            key="giorni_lavoro"
+        )
 
-premio_modalita = st.radio(
-    "Modalità tassazione premio di risultato/ Variabile:",
-    ("Flat (tassazione fissa)", "Aggiunto alla RAL"),
-    horizontal=True
-)
-if premio_modalita == "Flat (tassazione fissa)":
-    premio_modalita_val = "flat"
-else:
-    premio_modalita_val = "irpef"
+    col3, col4 = st.columns(2)
+
+    with col3:
+        regione = st.selectbox(
+            "Regione di Residenza",
+            [
+                "Lombardia", "Abruzzo", "Basilicata", "Calabria", "Campania",
+                "Emilia-Romagna", "Friuli Venezia Giulia", "Lazio",
+                "Liguria", "Marche", "Molise",
+                "Piemonte", "Puglia", "Sardegna", "Sicilia",
+                "Toscana", "Provincia Autonoma di Trento",
+                "Provincia Autonoma di Bolzano", "Umbria",
+                "Valle d’Aosta", "Veneto"
+            ],
+            index=0,
+            key="regione"
+        )
 
+    with col4:
+        comune = None
+        if dataset_comuni is not None:
+            ricerca_comune = st.text_input(
+                "Comune di residenza",
+                placeholder="Scrivi l'inizio del nome…",
+                help="Applica aliquota, soglia di esenzione e fasce del comune",
+                key="ricerca_comune"
+            )
+            if ricerca_comune:
+                comune = st.selectbox(
+                    "Comune",
+                    dataset_comuni.cerca(ricerca_comune),
+                    format_func=lambda c: f"{c.nome} ({c.provincia})",
+                    label_visibility="collapsed"
+                )
+        addizionale_comunale_perc = st.number_input(
+            "Addizionale Comunale (%)",
+            **limiti_widget("addizionale_comunale_perc"),
+            value=0.8 if comune is None else comune.aliquota,
+            step=0.1,
+            disabled=comune is not None,
+            help="Es. Milano 0.8%" if comune is None else "Aliquota del comune scelto (la più alta se a fasce)"
+        )
+    col1, col2 = st.columns(2)
+
+    with col1:
+        orario_settimanale = st.number_input(
+            "Ore settimanali",
+            **limiti_widget("orario_settimanale"),
+            value=40.0,
+            step=0.5,
+            key="orario_settimanale"
+        )
+    with col2:
+        giorni_ferie = st.number_input(
+            "Giorni di ferie e permessi annui",
+            **limiti_widget("giorni_ferie"),
+            value=26,
+            step=1,
+            key="giorni_ferie"
+        )
 
+    # -------------------------
+    # Benefit e contributi
+    # -------------------------
+    st.subheader("💼 Benefit e contributi opzionali")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        buoni_pasto = st.number_input(
+            "Importo buono pasto giornaliero (€)",
+            **limiti_widget("buono_giornaliero"),
+            value=8.0,
+            step=0.1,
+            key="buoni_pasto"
+        )
+    with col2:
+        giorni_buoni_pasto = st.number_input(
+            "Giorni annuali con buono pasto",
+            **limiti_widget("giorni_buoni"),
+            value=220,
+            step=1,
+            key="giorni_buoni_pasto"
+        )
 
-col1, col2 = st.columns(2)
-with col1:
-    premio_risultato = st.number_input(
-        "Premio / Variabile (€ annuo)",
-        min_value=0.0,
-        value=0.0,
-        step=100.0
-    )
-    welfare = st.number_input(
-        "Importo Welfare detassato (€ annuo)",
-        min_value=0.0,
-        value=0.0,
-        step=50.0
-    )
-with col2:
-    premio_flat_perc = st.number_input(
-        "Tassazione premio (%)",
-        min_value=0.0,
-        max_value=50.0,
-        value=1.0,
-        step=1.0
-    )
-    assicurazione_sanitaria_perc = st.number_input(
-        "Costo assicurazione sanitaria (% del reddito lordo)",
-        min_value=0.0,
-        value=0.0,
-        step=0.1
+    premio_modalita = st.radio(
+        "Modalità tassazione premio di risultato/ Variabile:",
+        ("Flat (tassazione fissa)", "Aggiunto alla RAL"),
+        horizontal=True,
+        key="premio_modalita"
     )
+    if premio_modalita == "Flat (tassazione fissa)":
+        premio_modalita_val = "flat"
+    else:
+        premio_modalita_val = "irpef"
 
-# -------------------------
-# Fondo pensione
-# -------------------------
-st.markdown("### 🏦 Fondo pensione")
 
-modo_fondo = st.radio(
-    "Contributo volontario:",
-    ("Importo fisso (€ annuo)", "Percentuale della RAL (%)"),
-    horizontal=True
-)
 
-col1, col2 = st.columns(2)
-with col1:
-    if modo_fondo == "Importo fisso (€ annuo)":
-        fondo_pensione_val = st.number_input(
-            "Importo volontario annuo (€)",
-            min_value=0.0,
+    col1, col2 = st.columns(2)
+    with col1:
+        premio_risultato = st.number_input(
+            "Premio / Variabile (€ annuo)",
+            **limiti_widget("premio_risultato"),
             value=0.0,
-            step=50.0
+            step=100.0,
+            key="premio_risultato"
         )
-        fondo_pensione_perc = None
-    else:
-        fondo_pensione_val = None
-        fondo_pensione_perc = st.number_input(
-            "Percentuale volontaria della RAL (%)",
-            min_value=0.0,
-            value=2.0,
-            step=0.1
-    )
-with col2:
-    contributo_datore_perc = st.number_input(
-        "Contributo datoriale (% della RAL)",
-        min_value=0.0,
-        max_value=10.0,
-        value=0.0,
-        step=0.1
+        welfare = st.number_input(
+            "Importo Welfare detassato (€ annuo)",
+            **limiti_widget("welfare"),
+            value=0.0,
+            step=50.0,
+            key="welfare"
+        )
+    with col2:
+        premio_flat_perc = st.number_input(
+            "Tassazione premio (%)",
+            **limiti_widget("premio_flat_perc"),
+            value=1.0,
+            step=1.0,
+            key="premio_flat_perc"
+        )
+        assicurazione_sanitaria_perc = st.number_input(
+            "Costo assicurazione sanitaria (% del reddito lordo)",
+            **limiti_widget("assicurazione_sanitaria_perc"),
+            value=0.0,
+            step=0.1,
+            key="assicurazione_sanitaria_perc"
+        )
+
+    # -------------------------
+    # Fondo pensione
+    # -------------------------
+    st.markdown("### 🏦 Fondo pensione")
+
+    modo_fondo = st.radio(
+        "Contributo volontario:",
+        ("Importo fisso (€ annuo)", "Percentuale della RAL (%)"),
+        horizontal=True,
+        key="modo_fondo"
     )
 
+    col1, col2 = st.columns(2)
+    with col1:
+        if modo_fondo == "Importo fisso (€ annuo)":
+            fondo_pensione_val = st.number_input(
+                "Importo volontario annuo (€)",
+                **limiti_widget("fondo_pensione_val"),
+                value=0.0,
+                step=50.0,
+                key="fondo_pensione_val"
+            )
+            fondo_pensione_perc = None
+        else:
+            fondo_pensione_val = None
+            fondo_pensione_perc = st.number_input(
+                "Percentuale volontaria della RAL (%)",
+                **limiti_widget("fondo_pensione_perc"),
+                value=2.0,
+                step=0.1,
+                key="fondo_pensione_perc"
+            )
+    with col2:
+        contributo_datore_perc = st.number_input(
+            "Contributo datoriale (% della RAL)",
+            **limiti_widget("contributo_datore_perc"),
+            value=0.0,
+            step=0.1,
+            key="contributo_datore_perc"
+        )
+
+    if modalita_applica:
+        st.form_submit_button("Applica", type="primary")
+
 # =========================
 # Calcolo deducibilità fondo pensione
 # =========================
 # base_fondo = RAL - INPS
-base_fondo = lordo_input * (1 - (0.0584 if tipo_contratto.lower() == "apprendistato" else 0.0919))
+base_fondo = lordo_input * (1 - REGOLE_2026.aliquota_contributi(tipo_contratto))
 if fondo_pensione_val is not None:
     contrib_vol = fondo_pensione_val
 elif fondo_pensione_perc is not None:
@@ -540,8 +292,8 @@ else:
 contrib_datore = base_fondo * contributo_datore_perc / 100
 fondo_totale = contrib_vol + contrib_datore
 
-# soglia deducibilità 2026
-soglia_deducibile = 5300
+# soglia del pacchetto di regole attivo
+soglia_deducibile = REGOLE_2026.soglia_deducibilita_fondo
 
 # messaggio colorato
 if fondo_totale <= soglia_deducibile:
@@ -549,12 +301,15 @@ if fondo_totale <= soglia_deducibile:
     st.markdown(f"<span style='color:green'>Deducibile ✅, puoi ancora dedurre {restante:.2f} €</span>", unsafe_allow_html=True)
 else:
     eccedenza = fondo_totale - soglia_deducibile
-    st.markdown(f"<span style='color:red'>Supera la soglia di 5.300€ ❌, eccedenza {eccedenza:.2f} €</span>", unsafe_allow_html=True)
+    st.markdown(f"<span style='color:red'>Supera la soglia di {soglia_deducibile:,.2f} € ❌, eccedenza {eccedenza:.2f} €</span>", unsafe_allow_html=True)
+
+cronometro.segna("input")
 
 # -------------------------
 # Calcolo
 # -------------------------
-dati = calcola_dettagli(
+# argomenti di calcola_dettagli, condivisi dalle sezioni qui sotto
+parametri = dict(
     ral=lordo_input,
     regione=regione,
     addizionale_comunale_perc=addizionale_comunale_perc,
@@ -572,9 +327,41 @@ dati = calcola_dettagli(
     welfare=welfare,
     giorni_lavorati=giorni_lavoro,
     orario_settimanale=orario_settimanale,
-    giorni_ferie=giorni_ferie
+    giorni_ferie=giorni_ferie,
+    # regola del comune scelto (esenzione e fasce), None = solo la %
+    addizionale_comunale=comune
 )
 
+# la sessione conserva i risultati intermedi: a ogni rerun si rieseguono
+# solo le fasi a valle degli input cambiati
+if "sessione_calcolo" not in st.session_state:
+    st.session_state.sessione_calcolo = SessioneCalcolo()
+sessione_calcolo = st.session_state.sessione_calcolo
+
+sessione_calcolo.calcola(**parametri)
+dati = sessione_calcolo.dettagli()
+cronometro.segna("calcolo")
+
+
+def sezione(nome: str):
+    """
+    Sezione della pagina come st.fragment: un widget della sezione riesegue
+    solo la sezione (con gli argomenti dell'ultimo rerun completo), non
+    l'intero script. Il tempo della sezione è registrato sotto `nome`.
+    """
+    def decoratore(funzione):
+        @st.fragment
+        @wraps(funzione)
+        def frammento(*args, **kwargs):
+            cronometro_sezione = PROFILATORE.cronometro("sezione")
+            funzione(*args, **kwargs)
+            cronometro_sezione.segna(nome)
+            if PROFILATORE.attivo:
+                PROFILATORE.esporta()
+        return frammento
+    return decoratore
+
+
 # -------------------------
 # Risultati
 # -------------------------
@@ -613,141 +400,182 @@ st.write(
 st.write(f"**TFR stimato:** {dati['TFR']:.2f} €")
 st.write(f"**Premio Netto:** {dati['Premio Netto']:.2f} €")
 st.write(f"**Welfare detassato:** {dati['Welfare']:.2f} €")
+cronometro.segna("metriche")
 
 
 # -------------------------
-# Grafico
+# Premio incerto (Monte Carlo)
 # -------------------------
-df = pd.DataFrame([
-    calcola_dettagli(
-        l,
-        regione,
-        addizionale_comunale_perc,
-        mensilita,
-        tipo_contratto,
-        buoni_pasto,
-        giorni_buoni_pasto,
-        assicurazione_sanitaria_perc,
-        fondo_pensione_val,
-        fondo_pensione_perc,
-        contributo_datore_perc,
-        premio_risultato,
-        premio_modalita,
-        premio_flat_perc,
-        welfare,
-        giorni_lavoro,
-        orario_settimanale,
-        giorni_ferie
-
-    )
-    for l in range(1000, 80001, 1000)
-])
-
-fig = px.line(
-    df,
-    x="Stipendio Lordo",
-    y=[
-        "Stipendio Netto", 
-        "Tasse Totali",
-        "Detrazioni",
-        "Agevolazioni"
-    ],
-    title="Andamento Netto Annuale vs Lordo",
-    labels={
-        "value": "Euro (€)",
-        "variable": "Voce"
-    }
-)
+@sezione("montecarlo")
+def sezione_montecarlo(parametri):
+    with st.expander("🎲 Premio incerto: simulazione Monte Carlo"):
+        st.write(
+            "Il premio (e, se vuoi, il welfare) viene estratto da una distribuzione: "
+            "per ogni estrazione si calcola il netto con premio flat e con premio in IRPEF."
+        )
+        col1, col2 = st.columns(2)
+        tipo_distribuzione = col1.selectbox(
+            "Distribuzione del premio",
+            ["normale", "lognormale", "uniforme", "triangolare"]
+        )
+        n_estrazioni = col2.select_slider(
+            "Estrazioni",
+            options=[10_000, 100_000, 1_000_000],
+            value=100_000
+        )
 
-st.plotly_chart(fig, use_container_width=True)
+        col1, col2, col3 = st.columns(3)
+        if tipo_distribuzione in ("normale", "lognormale"):
+            parametri_premio = (
+                col1.number_input("Premio medio (€)", min_value=0.0, max_value=PREMIO_MASSIMO, value=min(max(float(parametri["premio_risultato"]), 1000.0), PREMIO_MASSIMO), step=100.0),
+                col2.number_input("Deviazione standard (€)", min_value=0.0, max_value=PREMIO_MASSIMO, value=500.0, step=100.0),
+            )
+        elif tipo_distribuzione == "uniforme":
+            parametri_premio = (
+                col1.number_input("Premio minimo (€)", min_value=0.0, max_value=PREMIO_MASSIMO, value=0.0, step=100.0),
+                col2.number_input("Premio massimo (€)", min_value=0.0, max_value=PREMIO_MASSIMO, value=2000.0, step=100.0),
+            )
+        else:
+            parametri_premio = (
+                col1.number_input("Premio minimo (€)", min_value=0.0, max_value=PREMIO_MASSIMO, value=0.0, step=100.0),
+                col2.number_input("Premio più probabile (€)", min_value=0.0, max_value=PREMIO_MASSIMO, value=1000.0, step=100.0),
+                col3.number_input("Premio massimo (€)", min_value=0.0, max_value=PREMIO_MASSIMO, value=2000.0, step=100.0),
+            )
+
+        welfare_incerto = st.checkbox("Anche il welfare è incerto (uniforme tra 0 e il valore inserito)")
+
+        # la simulazione parte solo su richiesta: ogni input cambiato la invaliderebbe
+        if st.toggle("Esegui la simulazione"):
+            welfare = parametri["welfare"]
+            try:
+                df_montecarlo, quota_flat = tabella_montecarlo(
+                    n_estrazioni,
+                    Distribuzione(tipo_distribuzione, parametri_premio),
+                    Distribuzione("uniforme", (0.0, float(welfare))) if welfare_incerto else welfare,
+                    **{
+                        nome: valore for nome, valore in parametri.items()
+                        if nome not in ("premio_risultato", "premio_modalita", "welfare")
+                    }
+                )
+            except ValueError as errore:
+                st.error(str(errore))
+            else:
+                st.dataframe(df_montecarlo, use_container_width=True, hide_index=True)
+                st.caption(f"Con il premio flat il netto è più alto nel {quota_flat:.0%} delle estrazioni.")
+
+
+sezione_montecarlo(parametri)
 
 
 # -------------------------
-# Tabella simulazione RAL
+# Grafico
 # -------------------------
-st.subheader("📋 Simulazione dettagliata RAL")
+@sezione("grafico netto/lordo")
+def sezione_grafico(parametri_grafico):
+    # alta risoluzione: RAL fino al massimo ammesso, zoom e intervallo gestiti dal browser
+    alta_risoluzione = st.toggle(
+        f"Grafico ad alta risoluzione (RAL fino a {grafici.RAL_MAX_DENSO:,.0f} €, zoom nel browser)",
+        help="Curva calcolata euro per euro e disegnata in WebGL: "
+             "trascina per ingrandire un intervallo, doppio clic per tornare alla vista iniziale."
+    )
 
-col1, col2 = st.columns(2)
+    fig = (grafico_netto_lordo_denso if alta_risoluzione else grafico_netto_lordo)(**parametri_grafico)
 
-ral_iniziale = col1.number_input(
-    "RAL iniziale (€)",
-    min_value=0,
-    value=10000,
-    step=500
-)
+    st.plotly_chart(fig, use_container_width=True)
 
-step_ral = col2.number_input(
-    "Step incremento RAL (€)",
-    min_value=100,
-    value=1000,
-    step=100
-)
 
-NUM_RIGHE = 50
-risultati = []
-netto_precedente = None
-
-for i in range(NUM_RIGHE):
-    ral_corrente = ral_iniziale + i * step_ral
-
-    try:
-        dati_row = calcola_dettagli(
-            ral_corrente,
-            regione,
-            addizionale_comunale_perc,
-            mensilita,
-            tipo_contratto,
-            buoni_pasto,
-            giorni_buoni_pasto,
-            assicurazione_sanitaria_perc,
-            fondo_pensione_val,
-            fondo_pensione_perc,
-            contributo_datore_perc,
-            premio_risultato,
-            premio_modalita,
-            premio_flat_perc,
-            welfare,
-            giorni_lavoro,
-            orario_settimanale,
-            giorni_ferie
+sezione_grafico(dict(
+    regione=regione,
+    addizionale_comunale_perc=addizionale_comunale_perc,
+    tipo_contratto=tipo_contratto,
+    assicurazione_sanitaria_perc=assicurazione_sanitaria_perc,
+    fondo_pensione_val=fondo_pensione_val,
+    fondo_pensione_perc=fondo_pensione_perc,
+    premio_risultato=premio_risultato,
+    premio_modalita=premio_modalita_val,
+    premio_flat_perc=premio_flat_perc,
+    giorni_lavorati=giorni_lavoro,
+    addizionale_comunale=comune
+))
 
-        )
 
-        netto_busta = float(dati_row["Stipendio Netto"])
+# -------------------------
+# Tabella simulazione RAL
+# -------------------------
+@sezione("tabella simulazione")
+def sezione_simulazione(parametri):
+    st.subheader("📋 Simulazione dettagliata RAL")
 
-    except Exception:
-        # salta le righe che danno problemi (RAL bassi, imponibile negativo, ecc.)
-        continue
+    col1, col2 = st.columns(2)
 
-    # Differenza marginale
-    if netto_precedente is None:
-        diff_marginale = None
-    else:
-        diff_marginale = netto_busta - netto_precedente
+    ral_iniziale = col1.number_input(
+        "RAL iniziale (€)",
+        min_value=0,
+        value=10000,
+        step=500
+    )
 
-    risultati.append({
-        "RAL": ral_corrente,
-        "Imponibile fiscale": dati_row["Reddito Imponibile Fiscale"],
-        "Netto annuale": netto_busta,
-        "Differenza marginale netto": diff_marginale,
-        f"Netto su {mensilita} mensilità": netto_busta / mensilita,
-        "Netto orario": dati_row["Stipendio Netto Orario"],
-        "Tasse": dati_row["Tasse Totali"],
-        "Detrazioni": dati_row["Detrazioni"],
-        "Agevolazioni": dati_row["Agevolazioni"]
-    })
+    step_ral = col2.number_input(
+        "Step incremento RAL (€)",
+        min_value=100,
+        value=1000,
+        step=100
+    )
 
-    netto_precedente = netto_busta
+    parametri_simulazione = dict(
+        ral_iniziale=ral_iniziale,
+        step_ral=step_ral,
+        regione=parametri["regione"],
+        addizionale_comunale_perc=parametri["addizionale_comunale_perc"],
+        mensilita=parametri["mensilita"],
+        tipo_contratto=parametri["tipo_contratto"],
+        assicurazione_sanitaria_perc=parametri["assicurazione_sanitaria_perc"],
+        fondo_pensione_val=parametri["fondo_pensione_val"],
+        fondo_pensione_perc=parametri["fondo_pensione_perc"],
+        premio_risultato=parametri["premio_risultato"],
+        premio_modalita=parametri["premio_modalita"],
+        premio_flat_perc=parametri["premio_flat_perc"],
+        giorni_lavorati=parametri["giorni_lavorati"],
+        orario_settimanale=parametri["orario_settimanale"],
+        giorni_ferie=parametri["giorni_ferie"],
+        addizionale_comunale=parametri["addizionale_comunale"]
+    )
 
+    # altre annualità (o proposte di legge) tra i pacchetti di regole
+    versioni = [v for v in versioni_disponibili() if v != REGOLE_2026.versione]
+    confronto = st.selectbox(
+        "Confronta con le regole",
+        [None] + versioni,
+        format_func=lambda versione: "Nessun confronto" if versione is None else versione
+    )
+    if confronto is not None:
+        st.caption(descrizione(confronto))
+        parametri_simulazione["confronto"] = confronto
+
+    df_simulazione = tabella_simulazione(**parametri_simulazione)
+
+    st.dataframe(df_simulazione, use_container_width=True, hide_index=True)
+    # il file viene costruito solo al clic, dalle colonne non arrotondate
+    st.download_button(
+        "⬇️ Scarica in Parquet",
+        data=partial(grafici.simulazione_parquet, **parametri_simulazione),
+        file_name="simulazione_ral.parquet",
+        mime="application/vnd.apache.parquet",
+        on_click="ignore"
+    )
 
-df_simulazione = pd.DataFrame(risultati).round(2)
 
-st.dataframe(df_simulazione, use_container_width=True, hide_index=True)
+sezione_simulazione(parametri)
 
 
-st.subheader("💎 Ricchezza Generata")
+# -------------------------
+# Ricchezza generata
+# -------------------------
+@sezione("ricchezza")
+def sezione_ricchezza(dati, parametri):
+    st.subheader("💎 Ricchezza Generata")
 
-st.markdown("""
+    st.markdown("""
 **Quanto questo lavoro ti rende, non solo quanto ti paga.**
 
 Non tutto quello che ricevi dal tuo lavoro vale come denaro liquido:
@@ -759,105 +587,146 @@ Qui puoi dire al sistema **quanto per te vale davvero 1€ in ciascuna voce**.
 Il risultato è un unico numero che rappresenta la **ricchezza reale generata dal lavoro**.
 """)
 
-col1, col2, col3 = st.columns(3)
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        coeff_buoni = st.number_input(
+            "Valore buoni pasto (1€ = …)",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.95,
+            step=0.01
+        )
+
+    with col2:
+        coeff_welfare = st.number_input(
+            "Valore welfare (1€ = …)",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.95,
+            step=0.01
+        )
+
+    with col3:
+        coeff_futuro = st.number_input(
+            "Valore fondo pensione / TFR (1€ = …)",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.85,
+            step=0.01
+        )
 
-with col1:
-    coeff_buoni = st.number_input(
-        "Valore buoni pasto (1€ = …)",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.95,
-        step=0.01
+    ricchezza_generata = (
+        dati["Stipendio Netto"]
+        + dati["Buoni Pasto Annui"] * coeff_buoni
+        + dati["Welfare"] * coeff_welfare
+        + (dati["Fondo Pensione Totale"] + dati["TFR"]) * coeff_futuro
     )
 
-with col2:
-    coeff_welfare = st.number_input(
-        "Valore welfare (1€ = …)",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.95,
-        step=0.01
+    ricchezza_mensile = ricchezza_generata / 12
+
+    giorni_effettivi = REGOLE_2026.giorni_lavorativi - parametri["giorni_ferie"]
+    ore_giornaliere = parametri["orario_settimanale"] / 5
+    ore_lavorate_annue = giorni_effettivi * ore_giornaliere
+    ricchezza_oraria = ricchezza_generata / ore_lavorate_annue
+
+    # ricchezza_oraria = ricchezza_generata / ((253 - giorni_ferie) * (orario_settimanale / 5))
+
+    col1, col2, col3 = st.columns(3)
+
+    col1.metric(
+        "💎 Ricchezza Generata Annua",
+        f"{ricchezza_generata:,.2f} €"
     )
 
-with col3:
-    coeff_futuro = st.number_input(
-        "Valore fondo pensione / TFR (1€ = …)",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.85,
-        step=0.01
+    col2.metric(
+        "Ricchezza Generata Mensile",
+        f"{ricchezza_mensile:,.2f} €"
     )
 
-ricchezza_generata = (
-    dati["Stipendio Netto"]
-    + dati["Buoni Pasto Annui"] * coeff_buoni
-    + dati["Welfare"] * coeff_welfare
-    + (dati["Fondo Pensione Totale"] + dati["TFR"]) * coeff_futuro
-)
+    col3.metric(
+        "Ricchezza Generata Oraria",
+        f"{ricchezza_oraria:,.2f} € /h"
+    )
 
-ricchezza_mensile = ricchezza_generata / 12
+    coefficienti = dict(coeff_buoni=coeff_buoni, coeff_welfare=coeff_welfare, coeff_futuro=coeff_futuro)
 
-giorni_effettivi = 253 - giorni_ferie
-ore_giornaliere = orario_settimanale / 5
-ore_lavorate_annue = giorni_effettivi * ore_giornaliere
-ricchezza_oraria = ricchezza_generata / ore_lavorate_annue
+    with st.expander("🎯 Fondo pensione e premio ottimali"):
+        scelta = ottimizza(
+            **coefficienti,
+            **{
+                nome: valore for nome, valore in parametri.items()
+                if nome not in ("fondo_pensione_val", "fondo_pensione_perc", "premio_modalita")
+            }
+        )
+        st.write(
+            f"Contributo volontario e tassazione del premio che massimizzano la ricchezza generata, "
+            f"restando entro la soglia di deducibilità di {REGOLE_2026.soglia_deducibilita_fondo:,.2f} € "
+            f"(contributo del datore compreso)."
+        )
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Contributo volontario", f"{scelta.fondo_pensione_val:,.2f} €")
+        col2.metric("Premio", "Flat" if scelta.premio_modalita == "flat" else "IRPEF")
+        col3.metric(
+            "Ricchezza Generata Annua",
+            f"{scelta.ricchezza:,.2f} €",
+            delta=f"{scelta.ricchezza - ricchezza_generata:,.2f} €"
+        )
 
-# ricchezza_oraria = ricchezza_generata / ((253 - giorni_ferie) * (orario_settimanale / 5))
 
-col1, col2, col3 = st.columns(3)
+    valori = [
+        dati["Stipendio Netto"],
+        dati["Buoni Pasto Annui"] * coeff_buoni,
+        dati["Welfare"] * coeff_welfare,
+        (dati["Fondo Pensione Totale"] + dati["TFR"]) * coeff_futuro
+    ]
 
-col1.metric(
-    "💎 Ricchezza Generata Annua",
-    f"{ricchezza_generata:,.2f} €"
-)
+    etichette = [
+        "Netto in busta",
+        "Buoni pasto (scontati)",
+        "Welfare (scontato)",
+        "Fondo pensione + TFR (scontati)"
+    ]
 
-col2.metric(
-    "Ricchezza Generata Mensile",
-    f"{ricchezza_mensile:,.2f} €"
-)
+    fig = grafico_ricchezza(valori, etichette)
 
-col3.metric(
-    "Ricchezza Generata Oraria",
-    f"{ricchezza_oraria:,.2f} € /h"
-)
+    st.plotly_chart(fig, use_container_width=True)
 
+    with st.expander("📈 Proiezione su più anni"):
+        st.write(
+            "RAL in crescita anno per anno, TFR rivalutato (1,5% + 75% dell'inflazione) "
+            "e fondo pensione capitalizzato; la ricchezza usa i coefficienti qui sopra "
+            "ed è scontata a oggi."
+        )
+        col1, col2, col3 = st.columns(3)
+        anni_proiezione = col1.number_input("Anni", min_value=1, max_value=45, value=20, step=1)
+        crescita_ral = col2.number_input("Crescita RAL annua (%)", min_value=-10.0, max_value=20.0, value=2.0, step=0.5)
+        rendimento_fondo = col3.number_input("Rendimento netto fondo (%)", min_value=-5.0, max_value=15.0, value=3.0, step=0.5)
+        col1, col2 = st.columns(2)
+        inflazione = col1.number_input("Inflazione (%)", min_value=-2.0, max_value=15.0, value=2.0, step=0.5)
+        tasso_sconto = col2.number_input("Tasso di sconto (%)", min_value=0.0, max_value=15.0, value=2.0, step=0.5)
+
+        df_proiezione, ricchezza_scontata = tabella_proiezione(
+            parametri["ral"],
+            anni_proiezione,
+            crescita_ral / 100,
+            rendimento_fondo / 100,
+            inflazione / 100,
+            tasso_sconto / 100,
+            **coefficienti,
+            **{nome: valore for nome, valore in parametri.items() if nome != "ral"}
+        )
 
-import plotly.graph_objects as go
-
-valori = [
-    dati["Stipendio Netto"],
-    dati["Buoni Pasto Annui"] * coeff_buoni,
-    dati["Welfare"] * coeff_welfare,
-    (dati["Fondo Pensione Totale"] + dati["TFR"]) * coeff_futuro
-]
-
-etichette = [
-    "Netto in busta",
-    "Buoni pasto (scontati)",
-    "Welfare (scontato)",
-    "Fondo pensione + TFR (scontati)"
-]
-
-fig = go.Figure(
-    data=[go.Pie(
-        labels=etichette,
-        values=valori,
-        hole=0.5
-    )]
-)
+        st.metric(f"💎 Ricchezza scontata in {anni_proiezione} anni", f"{ricchezza_scontata:,.2f} €")
+        st.line_chart(df_proiezione, x="Anno", y=["Netto cumulato", "TFR maturato", "Fondo pensione maturato"])
 
-fig.update_layout(
-    title="Composizione della Ricchezza Generata",
-    showlegend=True
-)
 
-st.plotly_chart(fig, use_container_width=True)
+sezione_ricchezza(dati, parametri)
 
 
 # Footer
 st.markdown("---")
 st.markdown("<p style='text-align:center; color:gray;'>© 2026, Luca Merlini</p>", unsafe_allow_html=True)
 
-
-
-
+if PROFILATORE.attivo:
+    PROFILATORE.esporta()
@@ -0,0 +1,280 @@
+"""
+Addizionali comunali IRPEF per comune.
+
+Il dataset è un unico file .npy (array strutturato DTYPE_COMUNI, ordinato per
+codice ISTAT) aperto in memory-map: nessun parsing all'avvio. Contiene per
+ogni comune aliquota, soglia di esenzione ed eventuali fasce progressive,
+oltre all'indice dei nomi normalizzati per la ricerca per prefisso.
+
+Regole applicate (come nel calcolo ufficiale):
+- reddito imponibile fino alla soglia di esenzione: addizionale 0;
+- oltre la soglia l'addizionale si applica a tutto il reddito, con
+  l'aliquota unica oppure per fasce progressive (come l'IRPEF).
+
+Il file si costruisce dal CSV del Dipartimento delle Finanze riportato nel
+formato di costruisci_dataset:
+    python comuni.py addizionali_comunali.csv comuni_addizionale.npy
+"""
+import csv
+import math
+import sys
+import unicodedata
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+PERCORSO_PREDEFINITO = Path(__file__).with_name("comuni_addizionale.npy")
+
+# fasce progressive massime per comune
+MAX_FASCE = 8
+
+DTYPE_COMUNI = np.dtype([
+    ("codice_istat", "S6"),
+    ("nome", "S96"),               # UTF-8
+    ("nome_normalizzato", "S96"),  # ASCII minuscolo, vedi normalizza_nome
+    ("provincia", "S2"),
+    ("aliquota", "f8"),            # % unica (o della fascia più alta)
+    ("soglia_esenzione", "f8"),
+    ("n_fasce", "i1"),
+    ("limiti", "f8", (MAX_FASCE,)),
+    ("aliquote", "f8", (MAX_FASCE,)),
+    ("ordine_nome", "i4"),         # riga i: indice del comune i-esimo per nome
+])
+
+
+def normalizza_nome(nome: str) -> str:
+    """'Forlì', "L'Aquila", 'FORLI' -> 'forli', 'l aquila', 'forli'."""
+    senza_accenti = "".join(
+        c for c in unicodedata.normalize("NFKD", nome) if not unicodedata.combining(c)
+    )
+    parole = "".join(c if c.isalnum() else " " for c in senza_accenti.lower()).split()
+    return " ".join(parole)
+
+
+def _codice(codice) -> str:
+    return str(codice).strip().zfill(6)
+
+
+class AddizionaleComunale(NamedTuple):
+    """Regola di un comune; chiamata sul reddito imponibile restituisce l'importo annuo."""
+    codice_istat: str
+    nome: str
+    provincia: str
+    aliquota: float
+    soglia_esenzione: float = 0.0
+    fasce: tuple = ()  # ((limite superiore, aliquota %), ...), ultimo limite inf
+
+    def __call__(self, imponibile: float) -> float:
+        if imponibile <= self.soglia_esenzione:
+            return 0.0
+        if not self.fasce:
+            # stessa formula del motore con addizionale_comunale_perc
+            return imponibile * self.aliquota / 100
+        importo, inferiore = 0.0, 0.0
+        for limite, aliquota in self.fasce:
+            if imponibile <= inferiore:
+                break
+            importo += (min(imponibile, limite) - inferiore) * aliquota / 100
+            inferiore = limite
+        return importo
+
+    def valuta_array(self, imponibile):
+        """Versione vettoriale di __call__ (stessi risultati al bit), per calcola_colonne e SessioneCalcolo."""
+        imponibile = np.asarray(imponibile, dtype=float)
+        if not self.fasce:
+            importo = imponibile * self.aliquota / 100
+        else:
+            importo = np.zeros(imponibile.shape)
+            inferiore = 0.0
+            for limite, aliquota in self.fasce:
+                quota = (np.minimum(imponibile, limite) - inferiore) * aliquota / 100
+                importo = np.where(imponibile > inferiore, importo + quota, importo)
+                inferiore = limite
+        return np.where(imponibile <= self.soglia_esenzione, 0.0, importo)
+
+    def affine(self, imponibile: float):
+        """(pendenza, intercetta) del tratto che contiene `imponibile`."""
+        if imponibile <= self.soglia_esenzione:
+            return 0.0, 0.0
+        if not self.fasce:
+            return self.aliquota / 100, 0.0
+        maturato, inferiore = 0.0, 0.0
+        for limite, aliquota in self.fasce:
+            if imponibile <= limite:
+                return aliquota / 100, maturato - inferiore * aliquota / 100
+            maturato += (limite - inferiore) * aliquota / 100
+            inferiore = limite
+        return 0.0, maturato
+
+    @property
+    def punti_di_rottura(self):
+        """Soglia di esenzione e limiti delle fasce (finiti, > 0)."""
+        punti = {float(self.soglia_esenzione)} | {float(limite) for limite, _ in self.fasce}
+        return tuple(sorted(p for p in punti if 0 < p < math.inf))
+
+
+class SelezioneComuni:
+    """Comuni di un batch (un indice per riga), da passare a calcola_colonne."""
+
+    def __init__(self, dataset, indici):
+        self.dataset = dataset
+        self.indici = indici
+
+    def valuta_array(self, imponibile):
+        return self.dataset.addizionale_array(self.indici, imponibile)
+
+
+class DatasetComuni:
+    def __init__(self, record):
+        self.record = record
+        self._nomi_ordinati = None
+
+    @classmethod
+    def apri(cls, percorso=PERCORSO_PREDEFINITO):
+        return cls(np.load(percorso, mmap_mode="r"))
+
+    @classmethod
+    def apri_se_presente(cls, percorso=PERCORSO_PREDEFINITO):
+        """Come apri, ma None se il file non c'è (l'app torna all'inserimento manuale)."""
+        percorso = Path(percorso)
+        return cls.apri(percorso) if percorso.exists() else None
+
+    def __len__(self):
+        return len(self.record)
+
+    def _regola(self, i: int) -> AddizionaleComunale:
+        r = self.record[i]
+        n = int(r["n_fasce"])
+        return AddizionaleComunale(
+            codice_istat=r["codice_istat"].decode(),
+            nome=r["nome"].decode("utf-8"),
+            provincia=r["provincia"].decode(),
+            aliquota=float(r["aliquota"]),
+            soglia_esenzione=float(r["soglia_esenzione"]),
+            fasce=tuple(zip(r["limiti"][:n].tolist(), r["aliquote"][:n].tolist())),
+        )
+
+    # ----- ricerca -----
+    def per_codice(self, codice) -> AddizionaleComunale:
+        return self._regola(int(self.indici([codice])[0]))
+
+    def cerca(self, prefisso: str, limite: int = 20):
+        """Comuni il cui nome normalizzato inizia con `prefisso`, in ordine alfabetico."""
+        chiave = normalizza_nome(prefisso).encode()
+        if self._nomi_ordinati is None:
+            self._nomi_ordinati = self.record["nome_normalizzato"][self.record["ordine_nome"]]
+        inizio = np.searchsorted(self._nomi_ordinati, chiave, side="left")
+        fine = np.searchsorted(self._nomi_ordinati, chiave + b"\xff", side="left")
+        ordine = self.record["ordine_nome"][inizio:min(fine, inizio + limite)]
+        return [self._regola(int(i)) for i in ordine]
+
+    def per_nome(self, nome: str):
+        """Tutti i comuni con quel nome (esistono omonimi in province diverse)."""
+        chiave = normalizza_nome(nome)
+        return [c for c in self.cerca(nome, limite=len(self)) if normalizza_nome(c.nome) == chiave]
+
+    # ----- batch -----
+    def indici(self, codici):
+        """Riga del dataset per ogni codice ISTAT (KeyError se un codice manca)."""
+        codici = np.char.encode(np.char.zfill(np.char.strip(np.asarray(codici).astype(str)), 6), "ascii")
+
+        tutti = self.record["codice_istat"]
+        indici = np.searchsorted(tutti, codici)
+        trovati = indici < len(tutti)
+        trovati[trovati] = tutti[indici[trovati]] == codici[trovati]
+        if not trovati.all():
+            mancanti = np.unique(codici[~trovati])[:5]
+            raise KeyError(f"codici ISTAT non presenti: {', '.join(c.decode() for c in mancanti)}")
+        return indici
+
+    def seleziona(self, codici) -> SelezioneComuni:
+        """Regole dei comuni indicati, per calcola_colonne(addizionale_comunale=...)."""
+        return SelezioneComuni(self, self.indici(codici))
+
+    def addizionale_array(self, indici, imponibile):
+        """Versione vettoriale di AddizionaleComunale.__call__ (stessi risultati al bit)."""
+        imponibile, indici = np.broadcast_arrays(np.asarray(imponibile, dtype=float), indici)
+        r = self.record
+        aliquota = r["aliquota"][indici]
+        n_fasce = r["n_fasce"][indici]
+        limiti = r["limiti"][indici]
+        aliquote = r["aliquote"][indici]
+
+        progressiva = np.zeros(imponibile.shape)
+        inferiore = np.zeros(imponibile.shape)
+        with np.errstate(invalid="ignore"):  # inf - inf nelle fasce non usate
+            for j in range(MAX_FASCE):
+                attiva = (j < n_fasce) & (imponibile > inferiore)
+                quota = (np.minimum(imponibile, limiti[..., j]) - inferiore) * aliquote[..., j] / 100
+                progressiva = np.where(attiva, progressiva + quota, progressiva)
+                inferiore = limiti[..., j]
+
+        importo = np.where(n_fasce > 0, progressiva, imponibile * aliquota / 100)
+        return np.where(imponibile <= r["soglia_esenzione"][indici], 0.0, importo)
+
+
+# -------------------------
+# Costruzione del dataset
+# -------------------------
+def _numero(testo: str) -> float:
+    testo = testo.strip().replace(",", ".")
+    return math.inf if testo.lower() == "inf" else float(testo or 0)
+
+
+def costruisci_dataset(percorso_csv, percorso_npy=PERCORSO_PREDEFINITO) -> int:
+    """
+    Converte il CSV (UTF-8, separatore ';', decimali con '.' o ',') nel file .npy.
+    Colonne:
+
+        codice_istat;comune;provincia;aliquota;soglia_esenzione;fasce
+
+    `fasce` è vuoto per l'aliquota unica, altrimenti "limite:aliquota|...",
+    ad es. "15000:0,5|28000:0,6|50000:0,7|inf:0,8" (ultimo limite inf).
+    Restituisce il numero di comuni scritti.
+    """
+    with open(percorso_csv, newline="", encoding="utf-8-sig") as f:
+        righe = list(csv.DictReader(f, delimiter=";"))
+
+    record = np.zeros(len(righe), dtype=DTYPE_COMUNI)
+    for i, riga in enumerate(righe):
+        dove = f"riga {i + 2}"
+        fasce = []
+        if riga["fasce"].strip():
+            for fascia in riga["fasce"].split("|"):
+                limite, aliquota = fascia.split(":")
+                fasce.append((_numero(limite), _numero(aliquota)))
+        if len(fasce) > MAX_FASCE:
+            raise ValueError(f"{dove}: al massimo {MAX_FASCE} fasce")
+        if fasce and (fasce[-1][0] != math.inf or any(a[0] >= b[0] for a, b in zip(fasce, fasce[1:]))):
+            raise ValueError(f"{dove}: limiti delle fasce non crescenti o ultimo limite diverso da inf")
+
+        r = record[i]
+        r["codice_istat"] = _codice(riga["codice_istat"]).encode("ascii")
+        r["nome"] = riga["comune"].strip().encode("utf-8")
+        r["nome_normalizzato"] = normalizza_nome(riga["comune"]).encode("ascii", "ignore")
+        r["provincia"] = riga["provincia"].strip().upper().encode("ascii")
+        r["aliquota"] = fasce[-1][1] if fasce else _numero(riga["aliquota"])
+        r["soglia_esenzione"] = _numero(riga["soglia_esenzione"])
+        r["n_fasce"] = len(fasce)
+        r["limiti"][:] = math.inf
+        for j, (limite, aliquota) in enumerate(fasce):
+            r["limiti"][j] = limite
+            r["aliquote"][j] = aliquota
+
+    record.sort(order="codice_istat")
+    doppi = record["codice_istat"][1:] == record["codice_istat"][:-1]
+    if doppi.any():
+        raise ValueError(f"codice ISTAT ripetuto: {record['codice_istat'][1:][doppi][0].decode()}")
+    record["ordine_nome"] = np.argsort(record["nome_normalizzato"], kind="stable")
+
+    np.save(percorso_npy, record)
+    return len(record)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("uso: python comuni.py sorgente.csv [destinazione.npy]", file=sys.stderr)
+        sys.exit(2)
+    n = costruisci_dataset(*sys.argv[1:])
+    print(f"{n} comuni scritti", file=sys.stderr)
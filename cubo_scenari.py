@@ -0,0 +1,186 @@
+"""
+Cubo di scenari: regioni × tipi di contratto × addizionale comunale × RAL.
+
+Per confronti tra offerte e trasferimenti: tutte le combinazioni in un solo
+array N-dimensionale (dtype DTYPE_DETTAGLI, un campo per voce di
+DettagliStipendio) con assi etichettati.
+
+Il calcolo è vettoriale (broadcast su calcola_colonne) e procede a blocchi di
+celle; con `percorso` il cubo viene scritto direttamente in un file .npy
+mappato in memoria (più un .json con gli assi), così anche decine di milioni
+di celle si affettano senza caricarle in RAM.
+
+Esempio:
+    cubo = calcola_cubo(np.arange(20000, 100001, 1000), [0.0, 0.5, 0.8], percorso="cubo.npy")
+    cubo.seleziona("netto_mensile", regione="Lazio", tipo_contratto="Indeterminato")
+    cubo = apri_cubo("cubo.npy")
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+from motore_batch import CAMPI_NUMERICI, DTYPE_DETTAGLI, calcola_colonne
+from motore_fiscale import ALIQUOTE_REGIONALI, REGOLE_2026
+from validazione import TIPI_CONTRATTO, VALORI_PREDEFINITI
+
+ASSI = ("regione", "tipo_contratto", "addizionale_comunale_perc", "ral")
+
+# celle calcolate insieme: limita la memoria dei risultati intermedi
+CELLE_PER_BLOCCO = 1_000_000
+
+
+class CuboScenari:
+    """
+    Risultati del cubo con i relativi assi.
+
+    valori:    array strutturato (o memmap) di forma (regioni, contratti,
+               aliquote comunali, RAL), dtype DTYPE_DETTAGLI o un suo
+               sottoinsieme di campi
+    assi:      nome asse -> array delle etichette, nell'ordine di ASSI
+    parametri: gli altri argomenti di calcola_dettagli, uguali per tutte le celle
+    versione_regole, impronta_regole: versione e impronta (sha256 del
+               contenuto) del pacchetto di regole usato ("" se sconosciute)
+    """
+
+    def __init__(self, valori, assi: dict, parametri: dict, versione_regole: str = "", impronta_regole: str = ""):
+        self.valori = valori
+        self.assi = assi
+        self.parametri = parametri
+        self.versione_regole = versione_regole
+        self.impronta_regole = impronta_regole
+
+    @property
+    def forma(self):
+        return self.valori.shape
+
+    def indice(self, asse: str, etichetta) -> int:
+        posizioni = np.flatnonzero(self.assi[asse] == etichetta)
+        if len(posizioni) == 0:
+            raise KeyError(f"{asse}: {etichetta!r} non presente nel cubo")
+        return int(posizioni[0])
+
+    def seleziona(self, campo: str = None, **selezione):
+        """
+        Fetta del cubo: gli assi indicati per etichetta vengono fissati, gli
+        altri restano. Con `campo` restituisce un array float di quel campo,
+        altrimenti l'array strutturato.
+
+        Es. seleziona("netto", regione="Lazio") -> forma (contratti, comunali, RAL)
+        """
+        sconosciuti = set(selezione) - set(ASSI)
+        if sconosciuti:
+            raise KeyError(f"assi sconosciuti: {', '.join(sorted(sconosciuti))}")
+        chiave = tuple(
+            self.indice(asse, selezione[asse]) if asse in selezione else slice(None)
+            for asse in ASSI
+        )
+        fetta = self.valori[chiave]
+        return fetta if campo is None else fetta[campo]
+
+    def assi_rimanenti(self, **selezione):
+        """Assi (nome, etichette) della fetta restituita da seleziona(**selezione)."""
+        return {asse: etichette for asse, etichette in self.assi.items() if asse not in selezione}
+
+
+def _percorso_assi(percorso: Path) -> Path:
+    return percorso.with_suffix(".json")
+
+
+def calcola_cubo(
+    ral,
+    addizionale_comunale_perc=(VALORI_PREDEFINITI["addizionale_comunale_perc"],),
+    regioni=None,
+    tipi_contratto=TIPI_CONTRATTO,
+    percorso=None,
+    celle_per_blocco: int = CELLE_PER_BLOCCO,
+    regole=None,
+    campi=CAMPI_NUMERICI,
+    **altri
+) -> CuboScenari:
+    """
+    Calcola il cubo regioni × contratti × aliquote comunali × RAL.
+
+    regioni: default tutte quelle di ALIQUOTE_REGIONALI.
+    altri:   gli altri argomenti di calcola_dettagli (scalari), per default
+             i valori predefiniti dell'app.
+    percorso: se indicato, il cubo è scritto in un .npy mappato in memoria
+              (e gli assi nel .json accanto) invece che in RAM.
+    campi:    voci di DettagliStipendio da conservare (default tutte quelle
+              numeriche): con pochi campi il cubo occupa molto meno spazio.
+    """
+    sconosciuti = (set(altri) - set(VALORI_PREDEFINITI)) | (set(altri) & set(ASSI))
+    if sconosciuti:
+        raise TypeError(f"argomenti non ammessi: {', '.join(sorted(sconosciuti))}")
+    campi_sconosciuti = set(campi) - set(CAMPI_NUMERICI)
+    if campi_sconosciuti:
+        raise KeyError(f"campi sconosciuti: {', '.join(sorted(campi_sconosciuti))}")
+    dtype = DTYPE_DETTAGLI if tuple(campi) == CAMPI_NUMERICI else np.dtype([(c, np.float64) for c in campi])
+    parametri = {
+        nome: altri.get(nome, valore)
+        for nome, valore in VALORI_PREDEFINITI.items()
+        if nome not in ASSI
+    }
+
+    assi = {
+        "regione": np.array(list(ALIQUOTE_REGIONALI) if regioni is None else list(regioni), dtype=str),
+        "tipo_contratto": np.array(list(tipi_contratto), dtype=str),
+        "addizionale_comunale_perc": np.atleast_1d(np.asarray(addizionale_comunale_perc, dtype=float)),
+        "ral": np.atleast_1d(np.asarray(ral, dtype=float)),
+    }
+    forma = tuple(len(assi[asse]) for asse in ASSI)
+    versione_regole = (regole or REGOLE_2026).versione
+    impronta_regole = (regole or REGOLE_2026).impronta
+
+    if percorso is None:
+        valori = np.empty(forma, dtype=dtype)
+    else:
+        percorso = Path(percorso)
+        valori = np.lib.format.open_memmap(percorso, mode="w+", dtype=dtype, shape=forma)
+
+    # l'asse delle RAL resta intero, gli altri vengono percorsi a gruppi di righe
+    n_ral = forma[-1]
+    piatto = valori.reshape(-1, n_ral)
+    righe_per_blocco = max(1, celle_per_blocco // max(n_ral, 1))
+    for inizio in range(0, piatto.shape[0], righe_per_blocco):
+        righe = np.arange(inizio, min(inizio + righe_per_blocco, piatto.shape[0]))
+        i_regione, i_contratto, i_comunale = np.unravel_index(righe, forma[:-1])
+        colonne = calcola_colonne(
+            ral=assi["ral"][np.newaxis, :],
+            regione=assi["regione"][i_regione][:, np.newaxis],
+            tipo_contratto=assi["tipo_contratto"][i_contratto][:, np.newaxis],
+            addizionale_comunale_perc=assi["addizionale_comunale_perc"][i_comunale][:, np.newaxis],
+            regole=regole,
+            **parametri
+        )
+        blocco = piatto[inizio:inizio + len(righe)]
+        for campo in campi:
+            blocco[campo] = colonne[campo]
+
+    if percorso is not None:
+        valori.flush()
+        _percorso_assi(percorso).write_text(json.dumps(
+            {
+                "assi": {asse: assi[asse].tolist() for asse in ASSI},
+                "parametri": parametri,
+                "versione_regole": versione_regole,
+                "impronta_regole": impronta_regole,
+            },
+            ensure_ascii=False,
+            indent=2
+        ), encoding="utf-8")
+    return CuboScenari(valori, assi, parametri, versione_regole, impronta_regole)
+
+
+def apri_cubo(percorso, modalita: str = "r") -> CuboScenari:
+    """Riapre un cubo salvato da calcola_cubo senza caricarlo in memoria."""
+    percorso = Path(percorso)
+    valori = np.load(percorso, mmap_mode=modalita)
+    dati = json.loads(_percorso_assi(percorso).read_text(encoding="utf-8"))
+    assi = {
+        asse: np.array(dati["assi"][asse], dtype=str if asse in ("regione", "tipo_contratto") else float)
+        for asse in ASSI
+    }
+    return CuboScenari(
+        valori, assi, dati["parametri"], dati.get("versione_regole", ""), dati.get("impronta_regole", "")
+    )
@@ -0,0 +1,127 @@
+"""
+Curva Netto vs Lordo esatta.
+
+Invece di campionare la RAL a passo fisso, la curva è costruita sui vertici
+della funzione lineare a tratti (vedi inversa.ProfiloNetto): soglie IRPEF,
+no tax area, detrazioni, agevolazioni e fasce regionali riportate sulla RAL.
+Pochi punti, nessun gomito o salto perso, a qualunque intervallo di RAL.
+"""
+import numpy as np
+
+from inversa import ProfiloNetto
+from motore_batch import CAMPI_NUMERICI, calcola_colonne
+from motore_fiscale import ETICHETTE_DETTAGLI
+
+
+def curva_netto_lordo(
+    ral_min,
+    ral_max,
+    regione,
+    addizionale_comunale_perc,
+    tipo_contratto,
+    assicurazione_sanitaria_perc=0.0,
+    fondo_pensione_val=None,
+    fondo_pensione_perc=None,
+    premio_risultato=0.0,
+    premio_modalita="flat",
+    premio_flat_perc=0.0,
+    giorni_lavorati=365,
+    mensilita=12,
+    orario_settimanale=40.0,
+    giorni_ferie=0,
+    regole=None,
+    addizionale_comunale=None
+):
+    """
+    Colonne di calcola_dettagli_batch (solo numeriche) calcolate nei vertici
+    della curva tra ral_min e ral_max.
+
+    Ogni tratto contribuisce con i due estremi; in corrispondenza di un salto
+    due vertici consecutivi hanno la stessa RAL (limite sinistro e destro).
+    Su ogni tratto tutte le colonne sono lineari nella RAL: il motore viene
+    valutato in due punti interni e i valori agli estremi sono estrapolati,
+    così non dipendono dal lato della soglia su cui cade l'arrotondamento.
+    """
+    parametri = dict(
+        regione=regione,
+        addizionale_comunale_perc=addizionale_comunale_perc,
+        tipo_contratto=tipo_contratto,
+        assicurazione_sanitaria_perc=assicurazione_sanitaria_perc,
+        fondo_pensione_val=fondo_pensione_val,
+        fondo_pensione_perc=fondo_pensione_perc,
+        premio_risultato=premio_risultato,
+        premio_modalita=premio_modalita,
+        premio_flat_perc=premio_flat_perc,
+        giorni_lavorati=giorni_lavorati,
+        addizionale_comunale=addizionale_comunale,
+    )
+    inizio, fine, _ = ProfiloNetto(regole=regole, **parametri).tratti_aperti()
+
+    a = np.maximum(inizio, ral_min)
+    b = np.minimum(fine, ral_max)
+    nel_range = a < b
+    a, b = a[nel_range], b[nel_range]
+
+    u1 = a + (b - a) / 4
+    u2 = b - (b - a) / 4
+    altri = dict(
+        mensilita=mensilita,
+        buono_giornaliero=0.0,
+        giorni_buoni=0,
+        contributo_datore_perc=0.0,
+        welfare=0.0,
+        orario_settimanale=orario_settimanale,
+        giorni_ferie=giorni_ferie,
+        regole=regole,
+    )
+    c1 = calcola_colonne(ral=u1, **parametri, **altri)
+    c2 = calcola_colonne(ral=u2, **parametri, **altri)
+
+    colonne = {}
+    for campo in CAMPI_NUMERICI:
+        pendenza = (c2[campo] - c1[campo]) / (u2 - u1)
+        valori = np.empty(2 * len(a))
+        valori[0::2] = c1[campo] - pendenza * (u1 - a)
+        valori[1::2] = c2[campo] + pendenza * (b - u2)
+        colonne[campo] = valori
+    ral = np.empty(2 * len(a))
+    ral[0::2] = a
+    ral[1::2] = b
+    colonne["stipendio_lordo"] = ral
+
+    # dove la curva è continua l'inizio di un tratto coincide con la fine del precedente
+    doppione = np.zeros(len(ral), dtype=bool)
+    doppione[2::2] = (ral[2::2] == ral[1:-1:2]) & np.all(
+        [np.isclose(colonne[c][2::2], colonne[c][1:-1:2], rtol=1e-12, atol=1e-9) for c in CAMPI_NUMERICI],
+        axis=0
+    )
+    return {ETICHETTE_DETTAGLI[c]: colonne[c][~doppione] for c in CAMPI_NUMERICI}
+
+
+def netto_marginale(ral, **parametri):
+    """
+    Quota esatta di ogni euro di RAL in più che arriva nel netto annuo,
+    per il tratto in cui cade ciascuna RAL (parametri come ProfiloNetto).
+    """
+    return ProfiloNetto(**parametri).pendenza(ral)
+
+
+def curva_densa(ral_min, ral_max, passo=1.0, regole=None, **parametri):
+    """
+    Colonne numeriche di calcola_colonne su tutta la griglia di RAL
+    ral_min, ral_min + passo, ..., ral_max (parametri come curva_netto_lordo).
+    A differenza di curva_netto_lordo non richiede un profilo lineare a tratti.
+    """
+    altri = dict(
+        mensilita=12,
+        buono_giornaliero=0.0,
+        giorni_buoni=0,
+        contributo_datore_perc=0.0,
+        welfare=0.0,
+        orario_settimanale=40.0,
+        giorni_ferie=0,
+    )
+    altri.update(parametri)
+    ral = np.arange(ral_min, ral_max + passo / 2, passo, dtype=float)
+    colonne = calcola_colonne(ral=ral, regole=regole, **altri)
+    return {ETICHETTE_DETTAGLI[c]: np.broadcast_to(colonne[c], ral.shape) for c in CAMPI_NUMERICI}
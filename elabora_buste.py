@@ -0,0 +1,194 @@
+"""
+Calcolo massivo delle buste paga da riga di comando.
+
+Legge un export dipendenti (CSV o Parquet) a blocchi, una riga per dipendente
+con le stesse colonne degli argomenti di calcola_dettagli, e scrive i
+risultati man mano (CSV, Parquet o Arrow), così la memoria resta costante
+qualunque sia la dimensione del file.
+
+Con una colonna `codice_istat` l'addizionale comunale segue le regole del
+comune (soglia di esenzione, fasce) lette dal dataset di comuni.py invece di
+addizionale_comunale_perc.
+
+Esempio:
+    python elabora_buste.py dipendenti.csv risultati.csv --blocco 50000 --processi 4
+"""
+import argparse
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import pandas as pd
+
+from comuni import PERCORSO_PREDEFINITO as PERCORSO_COMUNI, DatasetComuni
+from esportazione import ESTENSIONI_ARROW, ESTENSIONI_PARQUET, ScrittoreArrow
+from motore_batch import calcola_dettagli_batch
+from validazione import COLONNE_INPUT, VALORI_PREDEFINITI
+
+
+@lru_cache(maxsize=None)
+def _dataset_comuni(percorso: str) -> DatasetComuni:
+    # aperto (in memory-map) una volta sola per processo
+    return DatasetComuni.apri(percorso)
+
+
+def elabora_blocco(blocco: pd.DataFrame, percorso_comuni: str = str(PERCORSO_COMUNI)) -> pd.DataFrame:
+    """
+    Calcola un blocco di dipendenti.
+    Le colonne di input restano invariate, i risultati vengono aggiunti a destra.
+    """
+    if "ral" not in blocco.columns:
+        raise ValueError("Colonna obbligatoria mancante: 'ral'")
+
+    argomenti = {
+        nome: (blocco[nome].to_numpy() if nome in blocco.columns else VALORI_PREDEFINITI[nome])
+        for nome in COLONNE_INPUT
+    }
+    if "codice_istat" in blocco.columns:
+        argomenti["addizionale_comunale"] = _dataset_comuni(percorso_comuni).seleziona(
+            blocco["codice_istat"].to_numpy()
+        )
+    risultati = calcola_dettagli_batch(**argomenti)
+
+    # Regione e Tipo Contratto sono già tra gli input
+    del risultati["Regione"], risultati["Tipo Contratto"]
+
+    return pd.concat(
+        [blocco.reset_index(drop=True), pd.DataFrame(risultati)],
+        axis=1
+    )
+
+
+# -------------------------
+# Lettura / scrittura a blocchi
+# -------------------------
+def _e_parquet(percorso: str) -> bool:
+    return percorso.lower().endswith(ESTENSIONI_PARQUET)
+
+
+def _e_csv(percorso: str) -> bool:
+    return not percorso.lower().endswith(ESTENSIONI_PARQUET + ESTENSIONI_ARROW)
+
+
+def leggi_blocchi(percorso: str, dimensione_blocco: int):
+    """Genera DataFrame da al più dimensione_blocco righe."""
+    if _e_parquet(percorso):
+        import pyarrow.parquet as pq
+
+        file_parquet = pq.ParquetFile(percorso)
+        for batch in file_parquet.iter_batches(batch_size=dimensione_blocco):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(percorso, chunksize=dimensione_blocco)
+
+
+class ScrittoreRisultati:
+    """
+    Scrive i blocchi di risultati in coda al file di output (CSV, Parquet o
+    Arrow): per Parquet e Arrow colonna per colonna, con esportazione.ScrittoreArrow.
+    """
+
+    def __init__(self, percorso: str):
+        self.percorso = percorso
+        self._writer = None if _e_csv(percorso) else ScrittoreArrow(percorso)
+        self._primo_blocco = True
+
+    def scrivi(self, blocco: pd.DataFrame):
+        if self._writer is not None:
+            self._writer.scrivi({nome: blocco[nome].to_numpy() for nome in blocco.columns})
+        else:
+            blocco.to_csv(
+                self.percorso,
+                mode="w" if self._primo_blocco else "a",
+                header=self._primo_blocco,
+                index=False
+            )
+        self._primo_blocco = False
+
+    def chiudi(self):
+        if self._writer is not None:
+            self._writer.chiudi()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.chiudi()
+
+
+def elabora_file(
+    percorso_input: str,
+    percorso_output: str,
+    dimensione_blocco: int = 50000,
+    processi: int = 1,
+    percorso_comuni: str = str(PERCORSO_COMUNI)
+) -> int:
+    """
+    Elabora l'intero file e restituisce il numero di righe scritte.
+    Con processi > 1 i blocchi sono distribuiti su un pool di processi;
+    al massimo 2 blocchi per processo sono in volo, e l'ordine delle righe
+    in output è quello del file di input.
+    """
+    righe = 0
+    blocchi = leggi_blocchi(percorso_input, dimensione_blocco)
+
+    with ScrittoreRisultati(percorso_output) as scrittore:
+        if processi <= 1:
+            for blocco in blocchi:
+                risultato = elabora_blocco(blocco, percorso_comuni)
+                scrittore.scrivi(risultato)
+                righe += len(risultato)
+            return righe
+
+        with ProcessPoolExecutor(max_workers=processi) as pool:
+            in_corso = deque()
+            for blocco in blocchi:
+                in_corso.append(pool.submit(elabora_blocco, blocco, percorso_comuni))
+                if len(in_corso) >= 2 * processi:
+                    risultato = in_corso.popleft().result()
+                    scrittore.scrivi(risultato)
+                    righe += len(risultato)
+            while in_corso:
+                risultato = in_corso.popleft().result()
+                scrittore.scrivi(risultato)
+                righe += len(risultato)
+
+    return righe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Calcolo del netto in busta per un intero file di dipendenti."
+    )
+    parser.add_argument("input", help="file CSV o Parquet, una riga per dipendente")
+    parser.add_argument("output", help="file di risultati (.csv, .parquet o .arrow)")
+    parser.add_argument(
+        "--blocco", type=int, default=50000,
+        help="righe lette ed elaborate per volta (default: 50000)"
+    )
+    parser.add_argument(
+        "--processi", type=int, default=1,
+        help="numero di processi in parallelo (default: 1)"
+    )
+    parser.add_argument(
+        "--comuni", default=str(PERCORSO_COMUNI),
+        help=f"dataset delle addizionali comunali, usato con la colonna codice_istat (default: {PERCORSO_COMUNI.name})"
+    )
+    args = parser.parse_args(argv)
+
+    inizio = time.perf_counter()
+    righe = elabora_file(args.input, args.output, args.blocco, args.processi, args.comuni)
+    durata = time.perf_counter() - inizio
+
+    velocita = righe / durata if durata > 0 else float("inf")
+    print(
+        f"{righe} righe elaborate in {durata:.2f} s ({velocita:,.0f} righe/s)",
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Esportazione colonnare dei risultati in Arrow / Parquet.
+
+Le colonne del motore (calcola_colonne, tabella di simulazione, cubo di
+scenari) diventano record batch Arrow senza passare da righe Python o da un
+DataFrame: gli array float64 contigui sono riusati senza copia, le stringhe
+ripetute (regione, tipo contratto, modalità del premio) diventano colonne
+dictionary (codici interi più poche etichette).
+
+Il formato si sceglie dall'estensione:
+- .arrow / .feather: file IPC Arrow non compresso, che si apre in
+  memory-map senza copie (apri_arrow, oppure pyarrow, polars, DuckDB);
+- .parquet / .pq: Parquet compresso, per archivio e strumenti di analisi.
+
+pyarrow (già installato con streamlit) viene importato solo quando si
+esporta.
+
+Esempio:
+    with ScrittoreArrow("popolazione.arrow") as scrittore:
+        for blocco in blocchi:
+            scrittore.scrivi(calcola_colonne(**blocco), ingressi=blocco)
+    tabella = apri_arrow("popolazione.arrow")
+"""
+from pathlib import Path
+
+import numpy as np
+
+from cubo_scenari import ASSI
+
+ESTENSIONI_ARROW = (".arrow", ".feather")
+ESTENSIONI_PARQUET = (".parquet", ".pq")
+
+
+def formato(percorso) -> str:
+    """"arrow" o "parquet", dall'estensione del file."""
+    estensione = Path(percorso).suffix.lower()
+    if estensione in ESTENSIONI_ARROW:
+        return "arrow"
+    if estensione in ESTENSIONI_PARQUET:
+        return "parquet"
+    raise ValueError(
+        f"estensione non supportata: {estensione!r} "
+        f"(ammesse: {', '.join(ESTENSIONI_ARROW + ESTENSIONI_PARQUET)})"
+    )
+
+
+def _colonne_piatte(colonne: dict, ingressi: dict = None) -> dict:
+    """
+    Ingressi (solo quelli non già tra i risultati) e risultati, portati alla
+    forma comune e appiattiti. None (fondo pensione non impostato) diventa NaN.
+    """
+    unite = {
+        nome: np.asarray(np.nan if valore is None else valore)
+        for nome, valore in {**(ingressi or {}), **colonne}.items()
+    }
+    forma = np.broadcast_shapes(*(valore.shape for valore in unite.values()))
+    return {nome: np.broadcast_to(valore, forma).ravel() for nome, valore in unite.items()}
+
+
+class _Codificatore:
+    """
+    Etichette di una colonna di testo, nell'ordine in cui compaiono: tra un
+    blocco e l'altro il dizionario si allunga soltanto (delta IPC).
+    """
+
+    def __init__(self):
+        self.etichette = []
+        self._posizioni = {}
+
+    def codifica(self, valori):
+        uniche, inversa = np.unique(valori, return_inverse=True)
+        codici_unici = np.empty(len(uniche), dtype=np.int32)
+        for i, etichetta in enumerate(uniche.tolist()):
+            posizione = self._posizioni.get(etichetta)
+            if posizione is None:
+                posizione = self._posizioni[etichetta] = len(self.etichette)
+                self.etichette.append(etichetta)
+            codici_unici[i] = posizione
+        return codici_unici[inversa.ravel()]
+
+
+def _array_arrow(pa, valori, codificatore):
+    if valori.dtype.kind in "USO":
+        codici = codificatore.codifica(valori.astype(str))
+        return pa.DictionaryArray.from_arrays(pa.array(codici), pa.array(codificatore.etichette, pa.string()))
+    if valori.dtype.kind == "b":
+        return pa.array(valori)
+    # contiguo e nativo: pyarrow lo usa senza copia
+    return pa.array(np.ascontiguousarray(valori, dtype=np.float64 if valori.dtype.kind == "f" else valori.dtype))
+
+
+class ScrittoreArrow:
+    """
+    Scrive blocchi di colonne in un file .arrow o .parquet, uno per record
+    batch. Lo schema è fissato dal primo blocco; i blocchi successivi devono
+    avere le stesse colonne.
+
+    percorso: file, oppure un flusso pyarrow con formato_file indicato
+    """
+
+    def __init__(self, percorso, metadati: dict = None, formato_file: str = None):
+        self.percorso = percorso if formato_file else str(percorso)
+        self.formato = formato_file or formato(percorso)
+        self.metadati = {str(k): str(v) for k, v in (metadati or {}).items()}
+        self.righe = 0
+        self._writer = None
+        self._schema = None
+        self._codificatori = {}
+
+    def scrivi(self, colonne: dict, ingressi: dict = None):
+        """
+        colonne: risultati (ad es. calcola_colonne), array o scalari
+        ingressi: argomenti del calcolo da affiancare ai risultati
+        """
+        import pyarrow as pa
+
+        piatte = _colonne_piatte(colonne, ingressi)
+        if self._schema is not None and list(piatte) != self._schema.names:
+            raise ValueError("il blocco non ha le stesse colonne dei precedenti")
+        array = [
+            _array_arrow(pa, valori, self._codificatori.setdefault(nome, _Codificatore()))
+            for nome, valori in piatte.items()
+        ]
+        if self._schema is None:
+            campi = [pa.field(nome, a.type) for nome, a in zip(piatte, array)]
+            self._schema = pa.schema(campi, metadata=self.metadati or None)
+            self._apri(pa)
+        batch = pa.record_batch(array, schema=self._schema)
+        self._writer.write_batch(batch)
+        self.righe += batch.num_rows
+
+    def _apri(self, pa):
+        if self.formato == "arrow":
+            self._writer = pa.ipc.new_file(
+                self.percorso, self._schema,
+                options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            )
+        else:
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(self.percorso, self._schema)
+
+    def chiudi(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.chiudi()
+
+
+def esporta_colonne(percorso, colonne: dict, ingressi: dict = None, metadati: dict = None) -> int:
+    """Scrive un solo blocco di colonne; restituisce il numero di righe."""
+    with ScrittoreArrow(percorso, metadati) as scrittore:
+        scrittore.scrivi(colonne, ingressi)
+    return scrittore.righe
+
+
+def esporta_cubo(percorso, cubo, celle_per_blocco: int = 1_000_000) -> int:
+    """
+    Cubo di scenari in formato lungo: una riga per cella, con le etichette
+    degli assi come colonne e un record batch ogni celle_per_blocco celle.
+    I parametri comuni a tutte le celle finiscono nei metadati.
+    """
+    forma = cubo.forma
+    piatto = cubo.valori.reshape(-1)
+    with ScrittoreArrow(percorso, metadati=cubo.parametri) as scrittore:
+        for inizio in range(0, piatto.size, celle_per_blocco):
+            celle = np.arange(inizio, min(inizio + celle_per_blocco, piatto.size))
+            indici = np.unravel_index(celle, forma)
+            ingressi = {asse: cubo.assi[asse][i] for asse, i in zip(ASSI, indici)}
+            blocco = piatto[inizio:inizio + len(celle)]
+            scrittore.scrivi({campo: blocco[campo] for campo in blocco.dtype.names}, ingressi)
+    return scrittore.righe
+
+
+def in_memoria(colonne: dict, ingressi: dict = None, formato_file: str = "parquet") -> bytes:
+    """Come esporta_colonne ma restituisce il contenuto del file (per i download)."""
+    import pyarrow as pa
+
+    buffer = pa.BufferOutputStream()
+    with ScrittoreArrow(buffer, formato_file=formato_file) as scrittore:
+        scrittore.scrivi(colonne, ingressi)
+    return buffer.getvalue().to_pybytes()
+
+
+def apri_arrow(percorso):
+    """
+    pyarrow.Table di un file esportato. I file .arrow sono letti in
+    memory-map: le colonne numeriche puntano direttamente al file.
+    """
+    import pyarrow as pa
+
+    if formato(percorso) == "arrow":
+        return pa.ipc.open_file(pa.memory_map(str(percorso), "r")).read_all()
+    import pyarrow.parquet as pq
+
+    return pq.read_table(str(percorso), memory_map=True)
@@ -0,0 +1,331 @@
+"""
+Il calcolo del netto come grafo di fasi.
+
+Le 15 fasi di calcola_dettagli (INPS, TFR, fondo pensione, ... netto orario)
+sono dichiarate con i loro ingressi e le loro uscite. Le funzioni sono quelle
+vettoriali del motore batch (calcola_colonne esegue tutte le fasi in ordine).
+
+SessioneCalcolo conserva i risultati intermedi tra una chiamata e l'altra:
+quando cambia un ingresso vengono rieseguite solo le fasi a valle, e una fase
+il cui risultato non cambia non propaga nulla (es. premio_flat_perc con
+premio tassato in IRPEF). Vale per valori singoli (interfaccia) e per array
+(simulazioni what-if su intere popolazioni).
+
+Con la profilazione attiva (profilazione.py) ogni fase eseguita registra la
+propria durata.
+"""
+from time import perf_counter
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from motore_fiscale import ETICHETTE_DETTAGLI, REGOLE_2026, DettagliStipendio
+from profilazione import PROFILATORE
+
+# ingressi numerici e testuali, nell'ordine di calcola_dettagli
+INGRESSI_TESTO = ("regione", "tipo_contratto", "premio_modalita")
+INGRESSI = (
+    "ral", "regione", "addizionale_comunale_perc", "mensilita", "tipo_contratto",
+    "buono_giornaliero", "giorni_buoni", "assicurazione_sanitaria_perc",
+    "fondo_pensione_val", "fondo_pensione_perc", "contributo_datore_perc",
+    "premio_risultato", "premio_modalita", "premio_flat_perc", "welfare",
+    "giorni_lavorati", "orario_settimanale", "giorni_ferie",
+)
+# ingressi non vettoriali: tabelle fiscali e regola del comune
+INGRESSI_OGGETTO = ("regole", "regola_comunale")
+
+
+class Fase(NamedTuple):
+    nome: str
+    ingressi: tuple
+    uscite: tuple
+    funzione: Callable
+
+    def esegui(self, valori: dict) -> tuple:
+        if PROFILATORE.attivo:
+            inizio = perf_counter()
+            risultato = self.funzione(*(valori[nome] for nome in self.ingressi))
+            PROFILATORE.registra("fase", self.nome, perf_counter() - inizio)
+        else:
+            risultato = self.funzione(*(valori[nome] for nome in self.ingressi))
+        return risultato if len(self.uscite) > 1 else (risultato,)
+
+
+# -------------------------
+# Fasi (stesse formule e stesso ordine di motore_fiscale.calcola_dettagli)
+# -------------------------
+def _inps(ral, tipo_contratto, regole):
+    aliquota_inps = (regole or REGOLE_2026).aliquota_contributi_array(tipo_contratto)
+    return ral * aliquota_inps
+
+
+def _tfr(ral):
+    return ral / 13.5 - ral * 0.005
+
+
+def _fondo_pensione(ral, contributi_inps, fondo_pensione_val, fondo_pensione_perc, contributo_datore_perc):
+    base_fondo = ral - contributi_inps
+    contributo_volontario = np.where(
+        ~np.isnan(fondo_pensione_val),
+        fondo_pensione_val,
+        np.where(~np.isnan(fondo_pensione_perc), base_fondo * fondo_pensione_perc / 100, 0.0)
+    )
+    contributo_datore = base_fondo * contributo_datore_perc / 100
+    return contributo_volontario, contributo_volontario + contributo_datore
+
+
+def _assicurazione(ral, assicurazione_sanitaria_perc):
+    return ral * assicurazione_sanitaria_perc / 100
+
+
+def _premio(ral, premio_risultato, premio_modalita, premio_flat_perc):
+    premio_irpef = premio_modalita == "irpef"
+    ral_effettiva = np.where(premio_irpef, ral + premio_risultato, ral)
+    premio_netto = np.where(premio_irpef, 0.0, premio_risultato * (1 - premio_flat_perc / 100))
+    return ral_effettiva, premio_netto
+
+
+def _imponibile(ral_effettiva, contributi_inps, contributo_volontario, assicurazione):
+    return np.maximum(0, ral_effettiva - contributi_inps - contributo_volontario - assicurazione)
+
+
+def _irpef(reddito_imponibile, regole):
+    return (regole or REGOLE_2026).irpef.valuta_array(reddito_imponibile)
+
+
+def _addizionali(reddito_imponibile, regione, addizionale_comunale_perc, regola_comunale, irpef_lorda, regole):
+    regole = regole or REGOLE_2026
+    add_regionale = regole.addizionale_regionale_array(regione, reddito_imponibile)
+    if regola_comunale is None:
+        add_comunale = reddito_imponibile * addizionale_comunale_perc / 100
+    else:
+        add_comunale = regola_comunale.valuta_array(reddito_imponibile)
+    imposta_lorda_totale = np.where(
+        reddito_imponibile <= regole.soglia_no_tax, 0.0, irpef_lorda + add_regionale + add_comunale
+    )
+    return add_regionale, add_comunale, imposta_lorda_totale
+
+
+def _detrazioni(reddito_imponibile, giorni_lavorati, regole):
+    detrazioni = (regole or REGOLE_2026).detrazioni_lavoro.valuta_array(reddito_imponibile)
+    return detrazioni * (giorni_lavorati / 365)
+
+
+def _agevolazioni(reddito_imponibile, regole):
+    return (regole or REGOLE_2026).agevolazioni.valuta_array(reddito_imponibile)
+
+
+def _imposta_netta(tasse_totali, detrazioni, agevolazioni):
+    return np.maximum(0, tasse_totali - detrazioni) - agevolazioni
+
+
+def _netto(reddito_imponibile, imposta_netta, premio_modalita, premio_netto):
+    return reddito_imponibile - imposta_netta + np.where(premio_modalita == "flat", premio_netto, 0.0)
+
+
+def _buoni_pasto(buono_giornaliero, giorni_buoni):
+    buoni_annui = buono_giornaliero * giorni_buoni
+    return buoni_annui, buoni_annui / 12
+
+
+def _totali(netto, buoni_pasto_annui, welfare, mensilita):
+    return netto + buoni_pasto_annui + welfare, netto / mensilita
+
+
+def _netto_orario(netto, giorni_ferie, orario_settimanale, regole):
+    giorni_effettivi = (regole or REGOLE_2026).giorni_lavorativi - giorni_ferie
+    ore_giornaliere = orario_settimanale / 5
+    ore_lavorate_annue = giorni_effettivi * ore_giornaliere
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return netto / ore_lavorate_annue
+
+
+FASI = (
+    Fase("1. contributi INPS", ("ral", "tipo_contratto", "regole"), ("contributi_inps",), _inps),
+    Fase("2. TFR", ("ral",), ("tfr",), _tfr),
+    Fase(
+        "3. fondo pensione",
+        ("ral", "contributi_inps", "fondo_pensione_val", "fondo_pensione_perc", "contributo_datore_perc"),
+        ("contributo_volontario", "fondo_pensione_totale"),
+        _fondo_pensione,
+    ),
+    Fase("4. assicurazione sanitaria", ("ral", "assicurazione_sanitaria_perc"), ("assicurazione",), _assicurazione),
+    Fase(
+        "5. premio variabile",
+        ("ral", "premio_risultato", "premio_modalita", "premio_flat_perc"),
+        ("ral_effettiva", "premio_netto"),
+        _premio,
+    ),
+    Fase(
+        "6. imponibile IRPEF",
+        ("ral_effettiva", "contributi_inps", "contributo_volontario", "assicurazione"),
+        ("reddito_imponibile",),
+        _imponibile,
+    ),
+    Fase("7. IRPEF", ("reddito_imponibile", "regole"), ("irpef_lorda",), _irpef),
+    Fase(
+        "8. addizionali",
+        ("reddito_imponibile", "regione", "addizionale_comunale_perc", "regola_comunale", "irpef_lorda", "regole"),
+        ("addizionale_regionale", "addizionale_comunale", "tasse_totali"),
+        _addizionali,
+    ),
+    Fase("9. detrazioni lavoro", ("reddito_imponibile", "giorni_lavorati", "regole"), ("detrazioni",), _detrazioni),
+    Fase("10. agevolazioni", ("reddito_imponibile", "regole"), ("agevolazioni",), _agevolazioni),
+    Fase("11. imposta netta", ("tasse_totali", "detrazioni", "agevolazioni"), ("imposta_netta",), _imposta_netta),
+    Fase(
+        "12. netto busta",
+        ("reddito_imponibile", "imposta_netta", "premio_modalita", "premio_netto"),
+        ("netto",),
+        _netto,
+    ),
+    Fase("13. buoni pasto", ("buono_giornaliero", "giorni_buoni"), ("buoni_pasto_annui", "buoni_pasto_mensili"), _buoni_pasto),
+    Fase(
+        "14. netto totale e mensile",
+        ("netto", "buoni_pasto_annui", "welfare", "mensilita"),
+        ("netto_con_buoni", "netto_mensile"),
+        _totali,
+    ),
+    Fase(
+        "15. netto orario",
+        ("netto", "giorni_ferie", "orario_settimanale", "regole"),
+        ("netto_orario",),
+        _netto_orario,
+    ),
+)
+
+# fasi 7-11: dall'imponibile all'imposta netta (usate anche dal motore mensile)
+FASI_IMPOSTE = FASI[6:11]
+
+
+class GrafoFasi:
+    """Fasi in ordine topologico, con la ricerca di quelle a valle di un insieme di valori."""
+
+    def __init__(self, fasi=FASI):
+        disponibili = set(INGRESSI) | set(INGRESSI_OGGETTO)
+        for fase in fasi:
+            mancanti = set(fase.ingressi) - disponibili
+            if mancanti:
+                raise ValueError(f"fase {fase.nome!r}: ingressi non ancora calcolati {sorted(mancanti)}")
+            disponibili.update(fase.uscite)
+        self.fasi = tuple(fasi)
+
+    def a_valle(self, cambiati):
+        """Fasi che dipendono (anche indirettamente) dai valori `cambiati`, in ordine di esecuzione."""
+        sporchi = set(cambiati)
+        risultato = []
+        for fase in self.fasi:
+            if sporchi.intersection(fase.ingressi):
+                risultato.append(fase)
+                sporchi.update(fase.uscite)
+        return risultato
+
+    def esegui(self, valori: dict, fasi=None) -> dict:
+        """Esegue le fasi indicate (default tutte) aggiungendo le uscite a `valori`."""
+        for fase in self.fasi if fasi is None else fasi:
+            valori.update(zip(fase.uscite, fase.esegui(valori)))
+        return valori
+
+
+GRAFO_CALCOLO = GrafoFasi()
+
+
+def prepara_ingressi(**ingressi) -> dict:
+    """
+    Converte gli ingressi di calcola_dettagli in array della stessa forma
+    (broadcast); None o NaN in fondo_pensione_val / fondo_pensione_perc
+    significano "non impostato". Gli array sono copie: modificare in seguito
+    quelli passati non altera i valori preparati.
+    """
+    sconosciuti = set(ingressi) - set(INGRESSI)
+    mancanti = set(INGRESSI) - set(ingressi)
+    if sconosciuti or mancanti:
+        raise TypeError(f"ingressi sconosciuti {sorted(sconosciuti)} o mancanti {sorted(mancanti)}")
+    convertiti = [
+        np.array(ingressi[nome], dtype=str if nome in INGRESSI_TESTO else float)  # None -> NaN
+        for nome in INGRESSI
+    ]
+    return dict(zip(INGRESSI, np.broadcast_arrays(*convertiti)))
+
+
+def risultato(valori: dict) -> dict:
+    """Campi di DettagliStipendio a partire dai valori del grafo (gli ingressi sono copiati)."""
+    uscite = {campo: valori[campo] for campo in DettagliStipendio._fields if campo in valori}
+    uscite["stipendio_lordo"] = valori["ral"]
+    for campo in ("stipendio_lordo", "welfare", "regione", "tipo_contratto"):
+        uscite[campo] = uscite[campo].copy()
+    return {campo: uscite[campo] for campo in DettagliStipendio._fields}
+
+
+def _uguali(a, b) -> bool:
+    if a is b:
+        return True
+    if isinstance(a, tuple) and type(a) is type(b):  # es. comuni.AddizionaleComunale
+        return a == b
+    if not (isinstance(a, np.ndarray) and isinstance(b, np.ndarray)):
+        return False
+    if a.shape != b.shape or a.dtype != b.dtype:
+        return False
+    return np.array_equal(a, b, equal_nan=a.dtype.kind == "f")
+
+
+class SessioneCalcolo:
+    """
+    Calcolo incrementale: conserva ingressi e risultati intermedi e, a ogni
+    chiamata, riesegue solo le fasi a valle degli ingressi cambiati.
+
+        sessione = SessioneCalcolo()
+        sessione.calcola(**argomenti)              # prima volta: tutte le fasi
+        sessione.aggiorna(buono_giornaliero=10.0)  # solo fasi 13 e 14
+        sessione.fasi_eseguite                     # nomi delle fasi rieseguite
+    """
+
+    def __init__(self, grafo: GrafoFasi = GRAFO_CALCOLO):
+        self.grafo = grafo
+        self.valori = {}
+        self.fasi_eseguite = ()
+
+    def calcola(self, regole=None, addizionale_comunale=None, **ingressi) -> dict:
+        """
+        Come calcola_colonne (snake_case, array); stessi risultati al bit.
+        Gli array restituiti sono in sola lettura: restano i valori intermedi
+        della sessione.
+        """
+        nuovi = prepara_ingressi(**ingressi)
+        nuovi["regole"] = regole
+        nuovi["regola_comunale"] = addizionale_comunale
+
+        if not self.valori or nuovi["ral"].shape != self.valori["ral"].shape:
+            cambiati = set(nuovi)
+        else:
+            cambiati = {nome for nome, valore in nuovi.items() if not _uguali(valore, self.valori[nome])}
+        self.valori.update(nuovi)
+
+        sporchi = set(cambiati)
+        eseguite = []
+        for fase in self.grafo.fasi:
+            if not sporchi.intersection(fase.ingressi):
+                continue
+            eseguite.append(fase.nome)
+            for nome, valore in zip(fase.uscite, fase.esegui(self.valori)):
+                valore = np.asarray(valore)  # con ingressi 0-d NumPy restituisce scalari
+                # un'uscita identica alla precedente non rende sporche le fasi a valle
+                if nome not in self.valori or not _uguali(valore, self.valori[nome]):
+                    sporchi.add(nome)
+                    valore.flags.writeable = False  # condiviso tra le chiamate
+                    self.valori[nome] = valore
+        self.fasi_eseguite = tuple(eseguite)
+        return risultato(self.valori)
+
+    def aggiorna(self, **modifiche) -> dict:
+        """Ricalcola cambiando solo alcuni ingressi rispetto alla chiamata precedente."""
+        if not self.valori:
+            raise RuntimeError("nessun calcolo precedente: usare prima calcola()")
+        ingressi = {nome: self.valori[nome] for nome in INGRESSI}
+        ingressi["regole"] = self.valori["regole"]
+        ingressi["addizionale_comunale"] = self.valori["regola_comunale"]
+        ingressi.update(modifiche)
+        return self.calcola(**ingressi)
+
+    def dettagli(self) -> dict:
+        """Ultimo risultato con le etichette di calcola_dettagli (scalari se gli ingressi erano scalari)."""
+        return {ETICHETTE_DETTAGLI[campo]: valore[()] for campo, valore in risultato(self.valori).items()}
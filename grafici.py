@@ -0,0 +1,351 @@
+"""
+Costruzione di grafici e tabelle dell'app.
+
+Funzioni pure, senza Streamlit: calc_stip.py le mette in cache, il
+benchmark le misura direttamente. pandas e plotly vengono importati solo
+quando un grafico o una tabella viene davvero costruito.
+"""
+import numpy as np
+
+from curva import curva_densa, curva_netto_lordo, netto_marginale
+from esportazione import in_memoria
+from montecarlo import QUANTILI, simula_premio
+from proiezione import percorso_ral, proietta_carriera
+from motore_batch import calcola_dettagli_batch
+from pacchetti_regole import carica_regole
+from validazione import LIMITI
+
+NUM_RIGHE = 50
+
+# intervallo di RAL del grafico Netto vs Lordo
+RAL_MIN_GRAFICO = 1000
+RAL_MAX_GRAFICO = 80000
+
+# grafico ad alta risoluzione: tutta la RAL ammessa a passo di 1 €, ridotta ad
+# al più PUNTI_GRAFICO_DENSO punti (qualche volta la larghezza in pixel)
+RAL_MAX_DENSO = LIMITI["ral"][1]
+PASSO_DENSO = 1.0
+PUNTI_GRAFICO_DENSO = 4000
+
+VOCI_GRAFICO = ("Stipendio Netto", "Tasse Totali", "Detrazioni", "Agevolazioni")
+
+# Grafico e tabella ricevono solo i parametri da cui dipendono le colonne
+# mostrate: buoni pasto, welfare e contributo datoriale non cambiano netto,
+# tasse, detrazioni e agevolazioni, quindi vengono passati con valori fissi.
+
+
+def grafico_netto_lordo(
+    regione,
+    addizionale_comunale_perc,
+    tipo_contratto,
+    assicurazione_sanitaria_perc,
+    fondo_pensione_val,
+    fondo_pensione_perc,
+    premio_risultato,
+    premio_modalita,
+    premio_flat_perc,
+    giorni_lavorati,
+    addizionale_comunale=None
+):
+    import pandas as pd
+    import plotly.express as px
+
+    parametri = dict(
+        regione=regione,
+        addizionale_comunale_perc=addizionale_comunale_perc,
+        tipo_contratto=tipo_contratto,
+        assicurazione_sanitaria_perc=assicurazione_sanitaria_perc,
+        fondo_pensione_val=fondo_pensione_val,
+        fondo_pensione_perc=fondo_pensione_perc,
+        premio_risultato=premio_risultato,
+        premio_modalita=premio_modalita,
+        premio_flat_perc=premio_flat_perc,
+        giorni_lavorati=giorni_lavorati,
+        addizionale_comunale=addizionale_comunale
+    )
+
+    try:
+        # vertici esatti della curva (soglie, gomiti e salti)
+        dati_curva = curva_netto_lordo(RAL_MIN_GRAFICO, RAL_MAX_GRAFICO, **parametri)
+    except ValueError:
+        # deduzioni >= RAL: nessun profilo lineare a tratti, si campiona a passo fisso
+        dati_curva = calcola_dettagli_batch(
+            ral=np.arange(RAL_MIN_GRAFICO, RAL_MAX_GRAFICO + 1, 1000),
+            mensilita=12,
+            buono_giornaliero=0.0,
+            giorni_buoni=0,
+            contributo_datore_perc=0.0,
+            welfare=0.0,
+            orario_settimanale=40.0,
+            giorni_ferie=0,
+            **parametri
+        )
+        del dati_curva["Regione"], dati_curva["Tipo Contratto"]
+
+    df = pd.DataFrame(dati_curva)
+
+    return px.line(
+        df,
+        x="Stipendio Lordo",
+        y=list(VOCI_GRAFICO),
+        title="Andamento Netto Annuale vs Lordo",
+        labels={
+            "value": "Euro (€)",
+            "variable": "Voce"
+        }
+    )
+
+
+def _sottocampiona(x, serie: dict, punti: int):
+    """
+    Indici dei punti da disegnare.
+
+    Prima si scartano i punti interni ai tratti rettilinei di tutte le serie
+    (seconda differenza nulla): la curva lineare a tratti resta esatta a
+    qualunque zoom. Se i punti sono ancora troppi, per ogni intervallo di x
+    si tengono primo, ultimo, minimo e massimo di ogni serie: picchi e
+    salti restano visibili.
+    """
+    n = len(x)
+    if n <= 2:
+        return np.arange(n)
+    tieni = np.zeros(n, dtype=bool)
+    tieni[[0, -1]] = True
+    for y in serie.values():
+        # tolleranza: solo l'errore di arrotondamento su importi fino a qualche milione
+        tieni[1:-1] |= np.abs(np.diff(y, 2)) > 1e-7
+    indici = np.flatnonzero(tieni)
+    if len(indici) <= punti:
+        return indici
+
+    intervalli = max(1, punti // (2 + 2 * len(serie)))
+    gruppo = np.minimum(((x - x[0]) / (x[-1] - x[0]) * intervalli).astype(np.int64), intervalli - 1)
+    inizi = np.flatnonzero(np.r_[True, np.diff(gruppo) != 0])
+    fini = np.r_[inizi[1:] - 1, n - 1]
+    scelti = [inizi, fini]
+    for y in serie.values():
+        ordine = np.lexsort((y, gruppo))
+        scelti += [ordine[inizi], ordine[fini]]
+    return np.unique(np.concatenate(scelti))
+
+
+def grafico_netto_lordo_denso(
+    regione,
+    addizionale_comunale_perc,
+    tipo_contratto,
+    assicurazione_sanitaria_perc,
+    fondo_pensione_val,
+    fondo_pensione_perc,
+    premio_risultato,
+    premio_modalita,
+    premio_flat_perc,
+    giorni_lavorati,
+    addizionale_comunale=None
+):
+    """
+    Netto vs Lordo da 0 a RAL_MAX_DENSO a passo di PASSO_DENSO, con tracce
+    WebGL: zoom e intervallo si cambiano nel browser, senza rerun.
+    """
+    import plotly.graph_objects as go
+
+    dati = curva_densa(
+        0.0, RAL_MAX_DENSO, PASSO_DENSO,
+        regione=regione,
+        addizionale_comunale_perc=addizionale_comunale_perc,
+        tipo_contratto=tipo_contratto,
+        assicurazione_sanitaria_perc=assicurazione_sanitaria_perc,
+        fondo_pensione_val=fondo_pensione_val,
+        fondo_pensione_perc=fondo_pensione_perc,
+        premio_risultato=premio_risultato,
+        premio_modalita=premio_modalita,
+        premio_flat_perc=premio_flat_perc,
+        giorni_lavorati=giorni_lavorati,
+        addizionale_comunale=addizionale_comunale
+    )
+    ral = dati["Stipendio Lordo"]
+    serie = {voce: dati[voce] for voce in VOCI_GRAFICO}
+    indici = _sottocampiona(ral, serie, PUNTI_GRAFICO_DENSO)
+
+    fig = go.Figure([
+        go.Scattergl(x=ral[indici], y=valori[indici], mode="lines", name=voce)
+        for voce, valori in serie.items()
+    ])
+    fig.update_layout(
+        title="Andamento Netto Annuale vs Lordo",
+        xaxis_title="Stipendio Lordo",
+        yaxis_title="Euro (€)",
+        legend_title_text="Voce",
+        hovermode="x unified",
+        # lo zoom scelto nel browser resta anche quando il grafico viene aggiornato
+        uirevision="netto_lordo",
+        xaxis_range=[RAL_MIN_GRAFICO, RAL_MAX_GRAFICO],
+    )
+    return fig
+
+
+def colonne_simulazione(
+    ral_iniziale,
+    step_ral,
+    regione,
+    addizionale_comunale_perc,
+    mensilita,
+    tipo_contratto,
+    assicurazione_sanitaria_perc,
+    fondo_pensione_val,
+    fondo_pensione_perc,
+    premio_risultato,
+    premio_modalita,
+    premio_flat_perc,
+    giorni_lavorati,
+    orario_settimanale,
+    giorni_ferie,
+    addizionale_comunale=None,
+    confronto=None
+) -> dict:
+    """
+    Colonne (array NumPy, non arrotondate) della tabella di simulazione RAL.
+
+    addizionale_comunale: regola del comune scelto (sostituisce la %).
+    confronto: versione di un altro pacchetto di regole (es. "2025"); aggiunge
+    il netto calcolato con quelle regole e la differenza rispetto al 2026.
+    """
+    ral_simulate = ral_iniziale + np.arange(NUM_RIGHE) * step_ral
+
+    ingressi = dict(
+        ral=ral_simulate,
+        regione=regione,
+        addizionale_comunale_perc=addizionale_comunale_perc,
+        mensilita=mensilita,
+        tipo_contratto=tipo_contratto,
+        buono_giornaliero=0.0,
+        giorni_buoni=0,
+        assicurazione_sanitaria_perc=assicurazione_sanitaria_perc,
+        fondo_pensione_val=fondo_pensione_val,
+        fondo_pensione_perc=fondo_pensione_perc,
+        contributo_datore_perc=0.0,
+        premio_risultato=premio_risultato,
+        premio_modalita=premio_modalita,
+        premio_flat_perc=premio_flat_perc,
+        welfare=0.0,
+        giorni_lavorati=giorni_lavorati,
+        orario_settimanale=orario_settimanale,
+        giorni_ferie=giorni_ferie,
+        addizionale_comunale=addizionale_comunale
+    )
+    dati_sim = calcola_dettagli_batch(**ingressi)
+    netto_sim = dati_sim["Stipendio Netto"]
+
+    # Netto marginale esatto: quanti € netti arrivano ogni 100 € di RAL in più,
+    # nel tratto in cui cade la RAL della riga
+    try:
+        netto_marg = 100 * netto_marginale(
+            ral_simulate,
+            regione=regione,
+            addizionale_comunale_perc=addizionale_comunale_perc,
+            tipo_contratto=tipo_contratto,
+            assicurazione_sanitaria_perc=assicurazione_sanitaria_perc,
+            fondo_pensione_val=fondo_pensione_val,
+            fondo_pensione_perc=fondo_pensione_perc,
+            premio_risultato=premio_risultato,
+            premio_modalita=premio_modalita,
+            premio_flat_perc=premio_flat_perc,
+            giorni_lavorati=giorni_lavorati,
+            addizionale_comunale=addizionale_comunale
+        )
+    except ValueError:
+        netto_marg = np.full(NUM_RIGHE, np.nan)
+
+    colonne = {
+        "RAL": ral_simulate,
+        "Imponibile fiscale": dati_sim["Reddito Imponibile Fiscale"],
+        "Netto annuale": netto_sim,
+        "Netto marginale (%)": netto_marg,
+        f"Netto su {mensilita} mensilità": netto_sim / mensilita,
+        "Netto orario": dati_sim["Stipendio Netto Orario"],
+        "Tasse": dati_sim["Tasse Totali"],
+        "Detrazioni": dati_sim["Detrazioni"],
+        "Agevolazioni": dati_sim["Agevolazioni"]
+    }
+
+    if confronto is not None:
+        # stessi ingressi, un secondo passaggio vettoriale con le altre regole
+        regole = carica_regole(confronto)
+        netto_confronto = calcola_dettagli_batch(**ingressi, regole=regole)["Stipendio Netto"]
+        colonne[f"Netto annuale {regole.versione}"] = netto_confronto
+        colonne[f"Δ netto vs {regole.versione}"] = netto_sim - netto_confronto
+
+    return colonne
+
+
+def tabella_simulazione(*args, **kwargs):
+    """Tabella di simulazione RAL (stessi argomenti di colonne_simulazione)."""
+    import pandas as pd
+
+    return pd.DataFrame(colonne_simulazione(*args, **kwargs)).round(2)
+
+
+def simulazione_parquet(*args, **kwargs) -> bytes:
+    """Tabella di simulazione RAL come file Parquet, a piena precisione."""
+    return in_memoria(colonne_simulazione(*args, **kwargs))
+
+
+def tabella_montecarlo(n_estrazioni, premio, welfare, seme=0, **parametri):
+    """
+    Quantili del netto annuo e mensile con premio (ed eventualmente welfare,
+    se è una Distribuzione) incerto, per le due modalità del premio; più la
+    quota di estrazioni in cui la tassazione flat rende di più.
+    """
+    import pandas as pd
+
+    risultato = simula_premio(n_estrazioni, premio, welfare, seme=seme, **parametri)
+    quantili = risultato.quantili()
+
+    colonne = {"Quantile": [f"P{round(q * 100)}" for q in QUANTILI]}
+    for campo, nome in (("netto", "Netto annuo"), ("netto_mensile", "Netto mensile"), ("netto_con_buoni", "Netto + buoni + welfare")):
+        for modalita, etichetta in (("flat", "flat"), ("irpef", "IRPEF")):
+            colonne[f"{nome} ({etichetta})"] = list(quantili[modalita][campo].values())
+
+    return pd.DataFrame(colonne).round(2), risultato.quota_flat_migliore
+
+
+def tabella_proiezione(ral, anni, crescita, rendimento_fondo, inflazione, tasso_sconto, **parametri):
+    """
+    Proiezione di un solo scenario: per anno RAL, netto, TFR e fondo
+    maturati; più la ricchezza totale scontata.
+    """
+    import pandas as pd
+
+    proiezione = proietta_carriera(
+        percorso_ral(ral, crescita, anni),
+        rendimento_fondo=rendimento_fondo,
+        inflazione=inflazione,
+        tasso_sconto=tasso_sconto,
+        **parametri
+    )
+    df = pd.DataFrame({
+        "Anno": np.arange(1, anni + 1),
+        "RAL": proiezione["ral"][0],
+        "Netto cumulato": np.cumsum(proiezione["netto"][0]),
+        "TFR maturato": proiezione["montante_tfr"][0],
+        "Fondo pensione maturato": proiezione["montante_fondo"][0],
+    }).round(2)
+    return df, float(proiezione["ricchezza_scontata"][0])
+
+
+def grafico_ricchezza(valori, etichette):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(
+        data=[go.Pie(
+            labels=etichette,
+            values=valori,
+            hole=0.5
+        )]
+    )
+
+    fig.update_layout(
+        title="Composizione della Ricchezza Generata",
+        showlegend=True
+    )
+
+    return fig
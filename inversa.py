@@ -0,0 +1,354 @@
+"""
+Dal netto alla RAL: inversione esatta di calcola_dettagli.
+
+A parametri fissati (regione, contratto, fondo pensione, premio...) il netto
+annuo in busta è una funzione lineare a tratti della RAL: i tratti cambiano
+alle soglie di IRPEF, no tax area, detrazioni, agevolazioni e fasce regionali
+(riportate sulla RAL attraverso INPS, fondo pensione e assicurazione) e nel
+punto in cui l'imposta lorda eguaglia le detrazioni (max(0, ...)).
+
+ProfiloNetto costruisce questi tratti una volta; ogni obiettivo di netto si
+risolve poi con un'equazione lineare sul primo tratto che lo contiene.
+Alle soglie la funzione può saltare: gli obiettivi che cadono in un salto
+non sono raggiungibili esattamente e vengono segnalati con esatta=False.
+"""
+import math
+from typing import NamedTuple
+
+import numpy as np
+
+from motore_fiscale import REGOLE_2026
+from motore_batch import calcola_dettagli_batch
+
+
+class Segmento(NamedTuple):
+    """
+    Tratto del netto annuo in funzione della RAL:
+    netto = pendenza * ral + intercetta.
+
+    Se ral_inizio == ral_fine è un punto isolato (una soglia), altrimenti
+    l'intervallo aperto (ral_inizio, ral_fine).
+    """
+    ral_inizio: float
+    ral_fine: float
+    pendenza: float
+    intercetta: float
+
+    @property
+    def puntuale(self) -> bool:
+        return self.ral_inizio == self.ral_fine
+
+
+class SoluzioneRAL(NamedTuple):
+    ral: float
+    netto_mensile: float  # netto mensile calcolato da calcola_dettagli alla RAL trovata
+    esatta: bool
+
+
+def _somma(*affini):
+    return sum(p for p, _ in affini), sum(q for _, q in affini)
+
+
+class ProfiloNetto:
+    """Netto annuo in busta come funzione lineare a tratti della RAL."""
+
+    def __init__(
+        self,
+        regione,
+        addizionale_comunale_perc,
+        tipo_contratto,
+        assicurazione_sanitaria_perc=0.0,
+        fondo_pensione_val=None,
+        fondo_pensione_perc=None,
+        premio_risultato=0.0,
+        premio_modalita="flat",
+        premio_flat_perc=0.0,
+        giorni_lavorati=365,
+        regole=None,
+        addizionale_comunale=None  # regola del comune (comuni.AddizionaleComunale), sostituisce la %
+    ):
+        self.regole = regole or REGOLE_2026
+        self.parametri = dict(
+            regione=regione,
+            addizionale_comunale_perc=addizionale_comunale_perc,
+            tipo_contratto=tipo_contratto,
+            assicurazione_sanitaria_perc=assicurazione_sanitaria_perc,
+            fondo_pensione_val=fondo_pensione_val,
+            fondo_pensione_perc=fondo_pensione_perc,
+            premio_risultato=premio_risultato,
+            premio_modalita=premio_modalita,
+            premio_flat_perc=premio_flat_perc,
+            giorni_lavorati=giorni_lavorati,
+            addizionale_comunale=addizionale_comunale,
+        )
+
+        # imponibile = max(0, k * ral + c)
+        inps = self.regole.aliquota_contributi(tipo_contratto)
+        self.k = 1 - inps - assicurazione_sanitaria_perc / 100
+        if fondo_pensione_val is None and fondo_pensione_perc is not None:
+            self.k -= (1 - inps) * fondo_pensione_perc / 100
+        if self.k <= 0:
+            raise ValueError("Deduzioni pari o superiori alla RAL: il netto non dipende dalla RAL")
+
+        self.c = premio_risultato if premio_modalita == "irpef" else 0.0
+        if fondo_pensione_val is not None:
+            self.c -= fondo_pensione_val
+
+        self.premio_flat = premio_risultato * (1 - premio_flat_perc / 100) if premio_modalita == "flat" else 0.0
+        self.segmenti = self._costruisci_segmenti()
+        self._array = None
+
+    # -------------------------
+    # Netto in funzione dell'imponibile
+    # -------------------------
+    def _netto_da_imponibile(self, imponibile):
+        """Stessi passaggi 7-12 di calcola_dettagli, a imponibile dato."""
+        r = self.regole
+        p = self.parametri
+        if imponibile <= r.soglia_no_tax:
+            imposta_lorda = 0.0
+        else:
+            if p["addizionale_comunale"] is None:
+                add_comunale = imponibile * p["addizionale_comunale_perc"] / 100
+            else:
+                add_comunale = p["addizionale_comunale"](imponibile)
+            imposta_lorda = (
+                r.irpef(imponibile)
+                + r.addizionale_regionale(p["regione"], imponibile)
+                + add_comunale
+            )
+        detrazioni = r.detrazioni_lavoro(imponibile) * (p["giorni_lavorati"] / 365)
+        agevolazioni = r.agevolazioni(imponibile)
+        imposta_netta = max(0, imposta_lorda - detrazioni) - agevolazioni
+        return imponibile - imposta_netta + self.premio_flat
+
+    def _tratti_imponibile(self, inizio, fine):
+        """
+        Tratti affini (inizio, fine, pendenza, intercetta) del netto rispetto
+        all'imponibile nell'intervallo aperto (inizio, fine), spezzato dove
+        imposta lorda e detrazioni si incrociano.
+        """
+        r = self.regole
+        p = self.parametri
+        medio = inizio + 1.0 if math.isinf(fine) else (inizio + fine) / 2
+
+        if medio <= r.soglia_no_tax:
+            lorda = (0.0, 0.0)
+        else:
+            lorda = _somma(
+                r.irpef.affine(medio),
+                r.addizionale_regionale_affine(p["regione"], medio),
+                (p["addizionale_comunale_perc"] / 100, 0.0) if p["addizionale_comunale"] is None
+                else p["addizionale_comunale"].affine(medio),
+            )
+        quota_giorni = p["giorni_lavorati"] / 365
+        pd_, qd = r.detrazioni_lavoro.affine(medio)
+        detrazioni = (pd_ * quota_giorni, qd * quota_giorni)
+        agevolazioni = r.agevolazioni.affine(medio)
+        differenza = (lorda[0] - detrazioni[0], lorda[1] - detrazioni[1])
+
+        tagli = [inizio, fine]
+        if differenza[0] != 0:
+            radice = -differenza[1] / differenza[0]
+            if inizio < radice < fine:
+                tagli = [inizio, radice, fine]
+
+        tratti = []
+        for u, v in zip(tagli, tagli[1:]):
+            m = u + 1.0 if math.isinf(v) else (u + v) / 2
+            if differenza[0] * m + differenza[1] > 0:
+                imposta = (differenza[0] - agevolazioni[0], differenza[1] - agevolazioni[1])
+            else:
+                imposta = (-agevolazioni[0], -agevolazioni[1])
+            tratti.append((u, v, 1 - imposta[0], self.premio_flat - imposta[1]))
+        return tratti
+
+    def _punti_di_rottura(self):
+        """Soglie delle tabelle e, se c'è una regola comunale, le sue."""
+        punti = self.regole.punti_di_rottura(self.parametri["regione"])
+        if self.parametri["addizionale_comunale"] is not None:
+            punti = sorted(set(punti).union(self.parametri["addizionale_comunale"].punti_di_rottura))
+        return punti
+
+    def punti_imponibile(self):
+        """
+        Imponibili (> 0) in cui il netto cambia pendenza o salta: soglie
+        delle tabelle e incroci tra imposta lorda e detrazioni, in ordine.
+        """
+        punti = [0.0] + [s for s in self._punti_di_rottura() if s > 0]
+        tagli = set()
+        for inizio, fine in zip(punti, punti[1:] + [math.inf]):
+            tagli.update(u for u, _, _, _ in self._tratti_imponibile(inizio, fine))
+        tagli.discard(0.0)
+        return np.array(sorted(tagli))
+
+    # -------------------------
+    # Tratti sulla RAL
+    # -------------------------
+    def _costruisci_segmenti(self):
+        k, c = self.k, self.c
+        segmenti = []
+
+        imponibile_minimo = max(0.0, c)
+        if c < 0:
+            # RAL troppo bassa: imponibile fermo a 0
+            netto_zero = self._netto_da_imponibile(0.0)
+            segmenti.append(Segmento(0.0, 0.0, 0.0, netto_zero))
+            segmenti.append(Segmento(0.0, -c / k, 0.0, netto_zero))
+
+        punti = [imponibile_minimo] + [
+            s for s in self._punti_di_rottura()
+            if s > imponibile_minimo
+        ]
+        for inizio, fine in zip(punti, punti[1:] + [math.inf]):
+            ral_punto = max(0.0, (inizio - c) / k)
+            segmenti.append(Segmento(ral_punto, ral_punto, 0.0, self._netto_da_imponibile(inizio)))
+
+            for u, v, pendenza, intercetta in self._tratti_imponibile(inizio, fine):
+                ral_u = max(0.0, (u - c) / k)
+                ral_v = (v - c) / k
+                if u != inizio:
+                    # punto di raccordo (continuo) tra due tratti
+                    segmenti.append(Segmento(ral_u, ral_u, 0.0, pendenza * u + intercetta))
+                segmenti.append(Segmento(ral_u, ral_v, pendenza * k, pendenza * c + intercetta))
+
+        return segmenti
+
+    def _come_array(self):
+        if self._array is None:
+            s = np.array(self.segmenti, dtype=float)
+            inizio, fine, pendenza, intercetta = s.T
+            puntuale = inizio == fine
+            with np.errstate(invalid="ignore"):
+                netto_inizio = pendenza * inizio + intercetta
+                netto_fine = np.where(
+                    np.isinf(fine),
+                    np.where(pendenza > 0, np.inf, np.where(pendenza < 0, -np.inf, intercetta)),
+                    pendenza * fine + intercetta
+                )
+            self._array = (inizio, fine, pendenza, intercetta, puntuale, netto_inizio, netto_fine)
+        return self._array
+
+    def tratti_aperti(self):
+        """
+        Intervalli aperti su cui il netto è lineare nella RAL:
+        array (ral_inizio, ral_fine, pendenza), in ordine crescente.
+        """
+        inizio, fine, pendenza, _, puntuale, _, _ = self._come_array()
+        aperti = ~puntuale
+        return inizio[aperti], fine[aperti], pendenza[aperti]
+
+    def pendenza(self, ral):
+        """
+        Netto marginale esatto (d netto / d RAL) alle RAL indicate:
+        su una soglia vale la pendenza del tratto successivo.
+        """
+        inizio, _, pendenza = self.tratti_aperti()
+        indice = np.searchsorted(inizio, np.asarray(ral, dtype=float), side="right") - 1
+        return pendenza[np.maximum(indice, 0)]
+
+    def ral_per_netto_annuo(self, netto_annuo):
+        """
+        RAL minima con cui il netto annuo in busta vale `netto_annuo`.
+        Restituisce (ral, esatta); se l'obiettivo cade in un salto, ral è la
+        RAL minima oltre la quale il netto lo supera.
+        """
+        inizio, fine, pendenza, intercetta, puntuale, netto_inizio, netto_fine = self._come_array()
+        obiettivo = np.atleast_1d(np.asarray(netto_annuo, dtype=float))[:, None]
+        tolleranza = 1e-9 * np.maximum(1.0, np.abs(obiettivo))
+
+        basso = np.minimum(netto_inizio, netto_fine)
+        alto = np.maximum(netto_inizio, netto_fine)
+        costante = puntuale | (pendenza == 0)
+        esatto = np.where(
+            costante,
+            np.abs(intercetta - obiettivo) <= tolleranza,
+            (basso < obiettivo) & (obiettivo < alto)
+        )
+        oltre = alto >= obiettivo
+
+        trovato = esatto.any(axis=1)
+        indice = np.where(trovato, esatto.argmax(axis=1), oltre.argmax(axis=1))
+        obiettivo = obiettivo[:, 0]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ral_tratto = (obiettivo - intercetta[indice]) / pendenza[indice]
+        ral = np.where(trovato & ~costante[indice], ral_tratto, inizio[indice])
+        return ral, trovato
+
+
+def ral_per_netto_mensile_batch(
+    netto_mensile,
+    mensilita,
+    regione,
+    addizionale_comunale_perc,
+    tipo_contratto,
+    assicurazione_sanitaria_perc=0.0,
+    fondo_pensione_val=None,
+    fondo_pensione_perc=None,
+    premio_risultato=0.0,
+    premio_modalita="flat",
+    premio_flat_perc=0.0,
+    giorni_lavorati=365,
+    regole=None,
+    addizionale_comunale=None
+):
+    """
+    RAL necessarie per un array di obiettivi di "Stipendio Netto Mensile",
+    tutti con gli stessi parametri.
+
+    Restituisce un dizionario di array:
+    - "ral": RAL minima trovata
+    - "netto_mensile": netto mensile ricalcolato con calcola_dettagli_batch
+    - "esatta": False se l'obiettivo non è raggiungibile esattamente
+    """
+    profilo = ProfiloNetto(
+        regione=regione,
+        addizionale_comunale_perc=addizionale_comunale_perc,
+        tipo_contratto=tipo_contratto,
+        assicurazione_sanitaria_perc=assicurazione_sanitaria_perc,
+        fondo_pensione_val=fondo_pensione_val,
+        fondo_pensione_perc=fondo_pensione_perc,
+        premio_risultato=premio_risultato,
+        premio_modalita=premio_modalita,
+        premio_flat_perc=premio_flat_perc,
+        giorni_lavorati=giorni_lavorati,
+        regole=regole,
+        addizionale_comunale=addizionale_comunale
+    )
+    ral, esatta = profilo.ral_per_netto_annuo(np.asarray(netto_mensile, dtype=float) * mensilita)
+
+    # verifica con il motore: i parametri che non toccano il netto in busta sono irrilevanti
+    dati = calcola_dettagli_batch(
+        ral=ral,
+        mensilita=mensilita,
+        buono_giornaliero=0.0,
+        giorni_buoni=0,
+        contributo_datore_perc=0.0,
+        welfare=0.0,
+        orario_settimanale=40.0,
+        giorni_ferie=0,
+        regole=regole,
+        **profilo.parametri
+    )
+
+    return {
+        "ral": ral,
+        "netto_mensile": dati["Stipendio Netto Mensile"],
+        "esatta": esatta,
+    }
+
+
+def ral_per_netto_mensile(netto_mensile, mensilita, regione, addizionale_comunale_perc, tipo_contratto, **parametri):
+    """
+    RAL minima per ottenere `netto_mensile` di "Stipendio Netto Mensile".
+    Gli altri parametri sono quelli di calcola_dettagli che incidono sul netto in busta.
+    """
+    risultato = ral_per_netto_mensile_batch(
+        [netto_mensile], mensilita, regione, addizionale_comunale_perc, tipo_contratto, **parametri
+    )
+    return SoluzioneRAL(
+        ral=float(risultato["ral"][0]),
+        netto_mensile=float(risultato["netto_mensile"][0]),
+        esatta=bool(risultato["esatta"][0]),
+    )
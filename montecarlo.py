@@ -0,0 +1,230 @@
+"""
+Simulazione Monte Carlo del premio di risultato (e facoltativamente del welfare).
+
+Premio e welfare sono estratti da una distribuzione scelta dall'utente; ogni
+estrazione è calcolata in un solo passaggio vettoriale con entrambe le
+modalità del premio ("flat" e "irpef"), a blocchi di estrazioni.
+
+I quantili si ottengono da istogrammi aggiornati blocco per blocco
+(IstogrammaStreaming): la memoria non dipende dal numero di estrazioni né
+dall'ampiezza dei valori (al più MAX_BIN bin), l'errore su ogni quantile è
+al più il passo dell'istogramma.
+
+Esempio:
+    risultato = simula_premio(1_000_000, Distribuzione("normale", (3000, 1000)), ral=40000)
+    risultato.quantili()["flat"]["netto"]
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from motore_batch import calcola_colonne
+from validazione import VALORI_PREDEFINITI
+
+MODALITA = ("flat", "irpef")
+
+# voci di cui si stimano i quantili e risoluzione (€) del relativo istogramma
+CAMPI_SIMULATI = {
+    "netto": 1.0,
+    "netto_mensile": 0.1,
+    "netto_con_buoni": 1.0,
+}
+
+QUANTILI = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+ESTRAZIONI_PER_BLOCCO = 100_000
+
+# massimo dei parametri delle distribuzioni negli input dell'app (€)
+PREMIO_MASSIMO = 1_000_000.0
+
+# bin massimi per istogramma (512 KiB): oltre, il passo raddoppia
+MAX_BIN = 1 << 16
+
+
+class Distribuzione(NamedTuple):
+    """
+    Distribuzione di un importo annuo (€); le estrazioni negative valgono 0.
+
+    tipo e parametri:
+        "costante":    (valore,)
+        "uniforme":    (minimo, massimo)
+        "triangolare": (minimo, moda, massimo)
+        "normale":     (media, deviazione standard)
+        "lognormale":  (media, deviazione standard) dell'importo, non del logaritmo
+    """
+    tipo: str
+    parametri: tuple
+
+    def campiona(self, generatore, n: int):
+        p = self.parametri
+        if self.tipo == "costante":
+            valori = np.full(n, float(p[0]))
+        elif self.tipo == "uniforme":
+            valori = generatore.uniform(p[0], p[1], n)
+        elif self.tipo == "triangolare":
+            valori = generatore.triangular(p[0], p[1], p[2], n)
+        elif self.tipo == "normale":
+            valori = generatore.normal(p[0], p[1], n)
+        elif self.tipo == "lognormale":
+            if p[0] <= 0:
+                raise ValueError("lognormale: la media deve essere positiva")
+            sigma2 = np.log1p((p[1] / p[0]) ** 2)
+            valori = generatore.lognormal(np.log(p[0]) - sigma2 / 2, np.sqrt(sigma2), n)
+        else:
+            raise ValueError(f"distribuzione sconosciuta: {self.tipo!r}")
+        return np.maximum(0.0, valori)
+
+
+class IstogrammaStreaming:
+    """
+    Istogramma che si estende man mano che arrivano valori fuori
+    dall'intervallo già visto; quantili per interpolazione lineare nel bin
+    (errore <= passo).
+
+    Il passo parte da `risoluzione` e raddoppia (unendo i bin a coppie)
+    quando l'intervallo richiederebbe più di max_bin bin.
+    """
+
+    def __init__(self, risoluzione: float, max_bin: int = MAX_BIN):
+        self.risoluzione = risoluzione
+        self.passo = risoluzione
+        self.max_bin = max_bin
+        self.conteggi = np.zeros(0, dtype=np.int64)
+        self.primo_bin = 0
+        self.n = 0
+        self.somma = 0.0
+        self.minimo = np.inf
+        self.massimo = -np.inf
+
+    def aggiungi(self, valori):
+        valori = np.asarray(valori, dtype=float).ravel()
+        if valori.size == 0:
+            return
+        minimo = min(self.minimo, float(valori.min()))
+        massimo = max(self.massimo, float(valori.max()))
+        fattore = 1
+        while np.floor(massimo / (self.passo * fattore)) - np.floor(minimo / (self.passo * fattore)) >= self.max_bin:
+            fattore *= 2
+        if fattore > 1:
+            self._unisci(fattore)
+
+        bins = np.floor(valori / self.passo).astype(np.int64)
+        primo, ultimo = int(bins.min()), int(bins.max())
+        if self.n == 0:
+            self.primo_bin = primo
+            self.conteggi = np.zeros(ultimo - primo + 1, dtype=np.int64)
+        else:
+            nuovo_primo = min(primo, self.primo_bin)
+            nuovo_ultimo = max(ultimo, self.primo_bin + len(self.conteggi) - 1)
+            if nuovo_primo != self.primo_bin or nuovo_ultimo - nuovo_primo + 1 != len(self.conteggi):
+                conteggi = np.zeros(nuovo_ultimo - nuovo_primo + 1, dtype=np.int64)
+                inizio = self.primo_bin - nuovo_primo
+                conteggi[inizio:inizio + len(self.conteggi)] = self.conteggi
+                self.conteggi, self.primo_bin = conteggi, nuovo_primo
+        self.conteggi += np.bincount(bins - self.primo_bin, minlength=len(self.conteggi))
+        self.n += valori.size
+        self.somma += float(valori.sum())
+        self.minimo, self.massimo = minimo, massimo
+
+    def _unisci(self, fattore: int):
+        """Moltiplica il passo per `fattore` sommando i bin che finiscono nello stesso."""
+        self.passo *= fattore
+        if self.n == 0:
+            return
+        nuovi = (self.primo_bin + np.arange(len(self.conteggi))) // fattore
+        nuovo_primo = int(nuovi[0])
+        self.conteggi = np.bincount(nuovi - nuovo_primo, weights=self.conteggi).astype(np.int64)
+        self.primo_bin = nuovo_primo
+
+    @property
+    def media(self) -> float:
+        return self.somma / self.n if self.n else np.nan
+
+    def quantili(self, q=QUANTILI):
+        q = np.asarray(q, dtype=float)
+        if self.n == 0:
+            return np.full(q.shape, np.nan)
+        cumulati = np.cumsum(self.conteggi)
+        obiettivo = q * self.n
+        i = np.minimum(np.searchsorted(cumulati, obiettivo, side="left"), len(cumulati) - 1)
+        precedenti = np.where(i > 0, cumulati[i - 1], 0)
+        frazione = (obiettivo - precedenti) / np.maximum(self.conteggi[i], 1)
+        valori = (self.primo_bin + i + np.clip(frazione, 0.0, 1.0)) * self.passo
+        # gli estremi sono noti esattamente
+        return np.clip(valori, self.minimo, self.massimo)
+
+
+class RisultatoMonteCarlo:
+    """Istogrammi per modalità e voce, più la quota di estrazioni in cui flat rende di più."""
+
+    def __init__(self):
+        self.istogrammi = {
+            modalita: {campo: IstogrammaStreaming(risoluzione) for campo, risoluzione in CAMPI_SIMULATI.items()}
+            for modalita in MODALITA
+        }
+        self.estrazioni = 0
+        self.flat_migliore = 0
+
+    @property
+    def quota_flat_migliore(self) -> float:
+        return self.flat_migliore / self.estrazioni if self.estrazioni else np.nan
+
+    def quantili(self, q=QUANTILI) -> dict:
+        """modalità -> voce -> {quantile: valore}."""
+        return {
+            modalita: {campo: dict(zip(q, istogramma.quantili(q).tolist())) for campo, istogramma in voci.items()}
+            for modalita, voci in self.istogrammi.items()
+        }
+
+
+def simula_premio(
+    n_estrazioni: int,
+    premio: Distribuzione,
+    welfare=VALORI_PREDEFINITI["welfare"],
+    seme=None,
+    estrazioni_per_blocco: int = ESTRAZIONI_PER_BLOCCO,
+    regole=None,
+    addizionale_comunale=None,
+    **parametri
+) -> RisultatoMonteCarlo:
+    """
+    Simula n_estrazioni premi per un dipendente.
+
+    welfare: importo fisso oppure Distribuzione (estratto insieme al premio).
+    parametri: gli altri argomenti di calcola_dettagli (scalari) tranne
+    premio_risultato e premio_modalita; quelli mancanti prendono i valori
+    predefiniti dell'app.
+    addizionale_comunale: regola del comune (sostituisce la %).
+    """
+    esclusi = {"premio_risultato", "premio_modalita", "welfare"}
+    sconosciuti = set(parametri) - ({"ral"} | set(VALORI_PREDEFINITI)) | (set(parametri) & esclusi)
+    if sconosciuti:
+        raise TypeError(f"argomenti non ammessi: {', '.join(sorted(sconosciuti))}")
+    argomenti = {**VALORI_PREDEFINITI, **parametri}
+    for nome in esclusi:
+        argomenti.pop(nome, None)
+
+    generatore = np.random.default_rng(seme)
+    risultato = RisultatoMonteCarlo()
+    modalita = np.array(MODALITA)[:, np.newaxis]
+
+    for inizio in range(0, n_estrazioni, estrazioni_per_blocco):
+        n = min(estrazioni_per_blocco, n_estrazioni - inizio)
+        estratti = {"premio_risultato": premio.campiona(generatore, n)[np.newaxis, :]}
+        if isinstance(welfare, Distribuzione):
+            estratti["welfare"] = welfare.campiona(generatore, n)[np.newaxis, :]
+        else:
+            estratti["welfare"] = welfare
+
+        # righe: modalità, colonne: estrazioni
+        colonne = calcola_colonne(
+            premio_modalita=modalita, regole=regole, addizionale_comunale=addizionale_comunale,
+            **estratti, **argomenti
+        )
+        for riga, nome_modalita in enumerate(MODALITA):
+            for campo, istogramma in risultato.istogrammi[nome_modalita].items():
+                istogramma.aggiungi(colonne[campo][riga])
+        netto = colonne["netto"]
+        risultato.flat_migliore += int(np.count_nonzero(netto[0] > netto[1]))
+        risultato.estrazioni += n
+    return risultato
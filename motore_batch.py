@@ -0,0 +1,129 @@
+"""
+Versione vettoriale (NumPy) del motore di calcolo.
+
+Stesse formule di motore_fiscale.calcola_dettagli applicate ad array interi:
+utile per curve, tabelle di simulazione e intere popolazioni di buste paga.
+"""
+import numpy as np
+
+from fasi import FASI_IMPOSTE, GRAFO_CALCOLO, prepara_ingressi, risultato
+from motore_fiscale import ETICHETTE_DETTAGLI, REGOLE_2026, DettagliStipendio
+
+# campi numerici del risultato (regione e tipo contratto sono già negli input)
+CAMPI_NUMERICI = tuple(c for c in DettagliStipendio._fields if c not in ("regione", "tipo_contratto"))
+
+# una riga per dipendente, 8 byte per campo, nessuna stringa
+DTYPE_DETTAGLI = np.dtype([(campo, np.float64) for campo in CAMPI_NUMERICI])
+
+def calcola_addizionale_regionale_batch(regione, reddito_imponibile, regole=None):
+    """
+    Versione vettoriale di calcola_addizionale_regionale:
+    aliquota unica scelta per fascia, ricerca binaria per regione.
+    """
+    regole = regole or REGOLE_2026
+    return regole.addizionale_regionale_array(regione, reddito_imponibile)
+
+
+def calcola_dettagli_batch(*args, **kwargs) -> dict:
+    """
+    Versione vettoriale di calcola_dettagli.
+
+    Ogni argomento può essere uno scalare o un array (broadcast NumPy);
+    per fondo_pensione_val / fondo_pensione_perc None o NaN significano
+    "non impostato". Restituisce un dizionario colonna -> array con le
+    stesse chiavi e, riga per riga, gli stessi valori di calcola_dettagli.
+    """
+    colonne = calcola_colonne(*args, **kwargs)
+    return {ETICHETTE_DETTAGLI[campo]: colonne[campo] for campo in DettagliStipendio._fields}
+
+
+def calcola_dettagli_strutturato(*args, **kwargs):
+    """
+    Come calcola_dettagli_batch, ma restituisce un array strutturato NumPy
+    (dtype DTYPE_DETTAGLI, campi di DettagliStipendio senza regione e
+    tipo contratto): un solo blocco di memoria per milioni di righe.
+    """
+    colonne = calcola_colonne(*args, **kwargs)
+    risultato = np.empty(colonne["stipendio_lordo"].shape, dtype=DTYPE_DETTAGLI)
+    for campo in CAMPI_NUMERICI:
+        risultato[campo] = colonne.pop(campo)
+    return risultato
+
+
+def calcola_colonne(
+    ral,
+    regione,
+    addizionale_comunale_perc,
+    mensilita,
+    tipo_contratto,
+
+    buono_giornaliero,
+    giorni_buoni,
+
+    assicurazione_sanitaria_perc,
+
+    fondo_pensione_val,
+    fondo_pensione_perc,
+    contributo_datore_perc,
+
+    premio_risultato,
+    premio_modalita,
+    premio_flat_perc,
+    welfare,
+
+    giorni_lavorati,
+    orario_settimanale,
+    giorni_ferie,
+
+    regole=None,
+    addizionale_comunale=None
+):
+    """
+    Calcolo vettoriale vero e proprio: dizionario campo di
+    DettagliStipendio -> array, senza etichette.
+
+    addizionale_comunale: regole dei comuni riga per riga (ad es.
+    comuni.DatasetComuni.seleziona(codici)); se indicato sostituisce
+    addizionale_comunale_perc.
+    """
+    valori = prepara_ingressi(
+        ral=ral, regione=regione, addizionale_comunale_perc=addizionale_comunale_perc,
+        mensilita=mensilita, tipo_contratto=tipo_contratto,
+        buono_giornaliero=buono_giornaliero, giorni_buoni=giorni_buoni,
+        assicurazione_sanitaria_perc=assicurazione_sanitaria_perc,
+        fondo_pensione_val=fondo_pensione_val, fondo_pensione_perc=fondo_pensione_perc,
+        contributo_datore_perc=contributo_datore_perc,
+        premio_risultato=premio_risultato, premio_modalita=premio_modalita,
+        premio_flat_perc=premio_flat_perc, welfare=welfare,
+        giorni_lavorati=giorni_lavorati, orario_settimanale=orario_settimanale, giorni_ferie=giorni_ferie,
+    )
+    valori["regole"] = regole
+    valori["regola_comunale"] = addizionale_comunale
+
+    # fasi 1-15 in ordine (vedi fasi.FASI)
+    return risultato(GRAFO_CALCOLO.esegui(valori))
+
+
+def calcola_imposte(
+    imponibile,
+    regione,
+    addizionale_comunale_perc,
+    giorni_lavorati,
+    regole=None,
+    addizionale_comunale=None
+) -> dict:
+    """
+    Fasi 7-11 del calcolo a partire dal reddito imponibile annuo: IRPEF,
+    addizionali, detrazioni, agevolazioni e imposta netta (array).
+    Usata dal motore mensile.
+    """
+    valori = {
+        "reddito_imponibile": imponibile,
+        "regione": regione,
+        "addizionale_comunale_perc": addizionale_comunale_perc,
+        "giorni_lavorati": giorni_lavorati,
+        "regole": regole,
+        "regola_comunale": addizionale_comunale,
+    }
+    GRAFO_CALCOLO.esegui(valori, FASI_IMPOSTE)
+    return {nome: valori[nome] for fase in FASI_IMPOSTE for nome in fase.uscite}
@@ -0,0 +1,286 @@
+"""
+Motore di calcolo dello stipendio netto 2026.
+
+Modulo senza dipendenze esterne né effetti collaterali all'import (a parte
+la lettura di regole/2026.json): può essere usato da worker, script batch e
+test senza avviare Streamlit.
+
+Scaglioni, detrazioni, agevolazioni, addizionali, aliquote INPS, soglia di
+deducibilità del fondo pensione e giorni lavorativi sono dati: il pacchetto
+dell'anno (vedi pacchetti_regole.py) viene compilato una volta in
+REGOLE_2026 e calcola_dettagli accetta un set di regole alternativo (ad es.
+carica_regole(2025)) tramite il parametro `regole`.
+"""
+from typing import NamedTuple
+
+from pacchetti_regole import carica_regole
+
+# ======================
+# REGOLE 2026 (regole/2026.json)
+# ======================
+REGOLE_2026 = carica_regole(2026)
+
+# valori del pacchetto 2026 per chi li importa direttamente
+GIORNI_LAVORATIVI_STANDARD = REGOLE_2026.giorni_lavorativi
+SOGLIA_DEDUCIBILITA_FONDO = REGOLE_2026.soglia_deducibilita_fondo
+SOGLIA_NO_TAX = REGOLE_2026.soglia_no_tax
+SCAGLIONI_IRPEF = list(REGOLE_2026.irpef.scaglioni)
+DETRAZIONI_LAVORO = list(REGOLE_2026.detrazioni_lavoro.tratti)
+AGEVOLAZIONI = list(REGOLE_2026.agevolazioni.tratti)
+ALIQUOTE_REGIONALI = {
+    regione: list(tabella.fasce) for regione, tabella in REGOLE_2026.addizionali_regionali.items()
+}
+
+
+def aliquota_inps(tipo_contratto: str, regole=None) -> float:
+    """Aliquota contributiva INPS a carico del dipendente."""
+    return (regole or REGOLE_2026).aliquota_contributi(tipo_contratto)
+
+
+def calcola_addizionale_regionale(regione: str, reddito_imponibile: float, regole=None) -> float:
+    """
+    Addizionale regionale IRPEF:
+    aliquota UNICA in base alla fascia di reddito.
+    NON è progressiva.
+    """
+    regole = regole or REGOLE_2026
+    return regole.addizionale_regionale(regione, reddito_imponibile)
+
+
+
+# ======================
+# RISULTATO
+# ======================
+class DettagliStipendio(NamedTuple):
+    """
+    Risultato compatto di un calcolo: una tupla con campi nominati,
+    senza le etichette dell'interfaccia (applicate da come_dizionario).
+    """
+    stipendio_lordo: float
+    reddito_imponibile: float
+    irpef_lorda: float
+    addizionale_regionale: float
+    addizionale_comunale: float
+    detrazioni: float
+    agevolazioni: float
+    tasse_totali: float
+    netto: float
+    netto_orario: float
+    buoni_pasto_annui: float
+    buoni_pasto_mensili: float
+    netto_con_buoni: float
+    netto_mensile: float
+    fondo_pensione_totale: float
+    tfr: float
+    premio_netto: float
+    welfare: float
+    regione: str
+    tipo_contratto: str
+
+    def come_dizionario(self) -> dict:
+        """Vista a dizionario con le etichette usate dall'app."""
+        return dict(zip(ETICHETTE_DETTAGLI.values(), self))
+
+
+# etichette mostrate all'utente, nello stesso ordine dei campi
+ETICHETTE_DETTAGLI = {
+    "stipendio_lordo": "Stipendio Lordo",
+    "reddito_imponibile": "Reddito Imponibile Fiscale",
+    "irpef_lorda": "IRPEF Lorda",
+    "addizionale_regionale": "Addizionale Regionale",
+    "addizionale_comunale": "Addizionale Comunale",
+    "detrazioni": "Detrazioni",
+    "agevolazioni": "Agevolazioni",
+    "tasse_totali": "Tasse Totali",
+    "netto": "Stipendio Netto",
+    "netto_orario": "Stipendio Netto Orario",
+    "buoni_pasto_annui": "Buoni Pasto Annui",
+    "buoni_pasto_mensili": "Buoni Pasto Mensili",
+    "netto_con_buoni": "Stipendio Netto con buoni",
+    "netto_mensile": "Stipendio Netto Mensile",
+    "fondo_pensione_totale": "Fondo Pensione Totale",
+    "tfr": "TFR",
+    "premio_netto": "Premio Netto",
+    "welfare": "Welfare",
+    "regione": "Regione",
+    "tipo_contratto": "Tipo Contratto",
+}
+
+
+# -------------------------
+# Funzione per calcolare il netto
+# -------------------------
+def calcola_dettagli(*args, **kwargs) -> dict:
+    """
+    Come calcola_dettagli_record, ma restituisce il dizionario con le
+    etichette dell'interfaccia (la vista usata dall'app).
+    """
+    return calcola_dettagli_record(*args, **kwargs).come_dizionario()
+
+
+def calcola_dettagli_record(
+    ral,
+    regione,
+    addizionale_comunale_perc,
+    mensilita,
+    tipo_contratto,
+
+    buono_giornaliero,
+    giorni_buoni,
+
+    assicurazione_sanitaria_perc,
+
+    fondo_pensione_val,
+    fondo_pensione_perc,
+    contributo_datore_perc,
+
+    premio_risultato,
+    premio_modalita,   # "flat" o "irpef"
+    premio_flat_perc,      # usato solo se flat
+    welfare,
+
+    giorni_lavorati,
+    orario_settimanale,
+    giorni_ferie,
+
+    regole=None,
+    addizionale_comunale=None  # regola del comune (comuni.AddizionaleComunale), sostituisce la %
+):
+    regole = regole or REGOLE_2026
+
+    # =========================
+    # 1. CONTRIBUTI INPS
+    # =========================
+    contributi_inps = ral * regole.aliquota_contributi(tipo_contratto)
+
+    # =========================
+    # 2. TFR
+    # =========================
+    tfr = ral / 13.5 - ral * 0.005
+
+    # =========================
+    # 3. FONDO PENSIONE (deducibile)
+    # =========================
+    base_fondo = ral - contributi_inps
+    if fondo_pensione_val is not None:
+        contributo_volontario = fondo_pensione_val
+    elif fondo_pensione_perc is not None:
+        contributo_volontario = base_fondo * fondo_pensione_perc / 100
+    else:
+        contributo_volontario = 0.0
+
+    contributo_datore = base_fondo * contributo_datore_perc / 100
+    fondo_totale = contributo_volontario + contributo_datore
+
+    # =========================
+    # 4. ASSICURAZIONE SANITARIA
+    # =========================
+    assicurazione = ral * assicurazione_sanitaria_perc / 100
+
+    # =========================
+    # 5. PREMIO VARIABILE
+    # =========================
+    if premio_modalita == "irpef":
+        ral_effettiva = ral + premio_risultato
+        premio_netto = 0  # viene tassato insieme alla RAL
+    else:
+        ral_effettiva = ral
+        premio_netto = premio_risultato * (1 - premio_flat_perc / 100)
+
+    # =========================
+    # 6. IMPONIBILE IRPEF
+    # =========================
+    imponibile = max(0, ral_effettiva - contributi_inps - contributo_volontario - assicurazione)
+
+    # =========================
+    # 7. IRPEF
+    # =========================
+    irpef_lorda = regole.irpef(imponibile)
+
+    # =========================
+    # 8. ADDIZIONALI
+    # =========================
+    add_regionale = regole.addizionale_regionale(regione, imponibile)
+    if addizionale_comunale is None:
+        add_comunale = imponibile * addizionale_comunale_perc / 100
+    else:
+        add_comunale = addizionale_comunale(imponibile)
+
+    if imponibile <= regole.soglia_no_tax:
+        imposta_lorda_totale = 0
+    else:
+        imposta_lorda_totale = irpef_lorda + add_regionale + add_comunale
+
+    # =========================
+    # 9. DETRAZIONI LAVORO + BONUS RENZI
+    # =========================
+
+    detrazioni = regole.detrazioni_lavoro(imponibile)
+
+    detrazioni *= giorni_lavorati / 365
+
+    # =========================
+    # 10. AGEVOLAZIONI
+    # =========================
+
+    agevolazioni = regole.agevolazioni(imponibile)
+
+    # =========================
+    # 11. IMPOSTA NETTA
+    # =========================
+    imposta_netta = max(0, imposta_lorda_totale - detrazioni) - agevolazioni
+
+    # imposta_netta =  imposta_lorda_totale - detrazioni - agevolazioni
+
+    # =========================
+    # 12. NETTO BUSTA
+    # =========================
+    netto_busta = imponibile - imposta_netta  + (premio_netto if premio_modalita=="flat" else 0)
+
+    # =========================
+    # 13. BUONI PASTO
+    # =========================
+    buoni_annui = buono_giornaliero * giorni_buoni
+    buoni_mensili = buoni_annui / 12
+
+    # =========================
+    # 14. NETTO TOTALE E MENSILE
+    # =========================
+    netto_totale = netto_busta + buoni_annui + welfare
+    netto_mensile = netto_busta / mensilita
+
+    tasse_totali = imposta_lorda_totale
+
+    # =========================
+    # 15. NETTO ORARIO
+    # =========================
+    giorni_effettivi = regole.giorni_lavorativi - giorni_ferie
+    ore_giornaliere = orario_settimanale / 5
+
+    ore_lavorate_annue = giorni_effettivi * ore_giornaliere
+
+    netto_orario = netto_busta / ore_lavorate_annue
+
+
+    return DettagliStipendio(
+        ral,
+        imponibile,
+        irpef_lorda,
+        add_regionale,
+        add_comunale,
+        detrazioni,
+        agevolazioni,
+        tasse_totali,
+        netto_busta,
+        netto_orario,
+        buoni_annui,
+        buoni_mensili,
+        netto_totale,
+        netto_mensile,
+        fondo_totale,
+        tfr,
+        premio_netto,
+        welfare,
+        regione,
+        tipo_contratto
+    )
@@ -0,0 +1,321 @@
+"""
+Motore scalare compilato con Numba (facoltativo).
+
+Per chi calcola una busta alla volta e non può usare il batch: il nucleo
+numerico di calcola_dettagli_record (INPS, TFR, fondo, IRPEF, addizionali,
+detrazioni, agevolazioni, netto) è una funzione compilata che lavora solo su
+numeri e array. Le tabelle di RegoleFiscali sono convertite una volta in
+array (TabelleCompilate), le regioni in indici interi.
+
+Stesse formule nello stesso ordine del motore Python: risultati identici al
+bit (tests/test_motore_jit.py). Se Numba non è installato calcola_dettagli_record e
+calcola_addizionale_regionale di questo modulo sono quelle di motore_fiscale;
+anche una regola comunale (addizionale_comunale) usa il motore Python.
+
+    pip install numba
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+import motore_fiscale
+from motore_fiscale import REGOLE_2026, DettagliStipendio
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+JIT_DISPONIBILE = njit is not None
+
+
+class TabelleCompilate(NamedTuple):
+    """RegoleFiscali come array (costanti del nucleo compilato)."""
+    irpef_soglie: np.ndarray
+    irpef_basi: np.ndarray
+    irpef_inferiori: np.ndarray
+    irpef_aliquote: np.ndarray
+    soglia_no_tax: float
+    giorni_lavorativi: float
+    detrazioni: tuple     # (chiavi, costanti, aliquote, rampe, estremi, larghezze)
+    agevolazioni: tuple
+    regionali_soglie: np.ndarray    # (regioni, fasce), righe completate con inf
+    regionali_aliquote: np.ndarray  # (regioni, fasce)
+    regionali_fasce: np.ndarray     # numero di fasce per regione
+    indici_regioni: dict            # nome -> riga (usato fuori dal nucleo)
+
+
+def compila_tabelle(regole) -> TabelleCompilate:
+    def tratti(tabella):
+        return tuple(
+            np.array(v, dtype=np.float64)
+            for v in (tabella.chiavi, tabella.costanti, tabella.aliquote, tabella.rampe, tabella.estremi, tabella.larghezze)
+        )
+
+    regioni = list(regole.addizionali_regionali)
+    max_fasce = max((len(t.soglie) for t in regole.addizionali_regionali.values()), default=1)
+    soglie = np.full((max(len(regioni), 1), max_fasce), np.inf)
+    aliquote = np.zeros((max(len(regioni), 1), max_fasce))
+    fasce = np.zeros(max(len(regioni), 1), dtype=np.int64)
+    for i, regione in enumerate(regioni):
+        tabella = regole.addizionali_regionali[regione]
+        n = len(tabella.soglie)
+        soglie[i, :n] = tabella.soglie
+        aliquote[i, :n] = tabella.aliquote
+        fasce[i] = n
+
+    return TabelleCompilate(
+        irpef_soglie=np.array(regole.irpef.soglie, dtype=np.float64),
+        irpef_basi=np.array(regole.irpef.basi, dtype=np.float64),
+        irpef_inferiori=np.array(regole.irpef.inferiori, dtype=np.float64),
+        irpef_aliquote=np.array(regole.irpef.aliquote, dtype=np.float64),
+        soglia_no_tax=float(regole.soglia_no_tax),
+        giorni_lavorativi=float(regole.giorni_lavorativi),
+        detrazioni=tratti(regole.detrazioni_lavoro),
+        agevolazioni=tratti(regole.agevolazioni),
+        regionali_soglie=soglie,
+        regionali_aliquote=aliquote,
+        regionali_fasce=fasce,
+        indici_regioni={regione: i for i, regione in enumerate(regioni)},
+    )
+
+
+# -------------------------
+# Nucleo numerico (stesso ordine delle operazioni di calcola_dettagli_record)
+# -------------------------
+def _cerca(soglie, n, x):
+    # bisect_left su soglie[:n] (poche voci: scansione lineare)
+    i = 0
+    while i < n and soglie[i] < x:
+        i += 1
+    return i
+
+
+def _tratti(tabella, x):
+    chiavi, costanti, aliquote, rampe, estremi, larghezze = tabella
+    i = _cerca(chiavi, len(chiavi), x)
+    if i == len(chiavi):
+        return 0.0
+    return costanti[i] + x * aliquote[i] + rampe[i] * (estremi[i] - x) / larghezze[i]
+
+
+def _addizionale_regionale(soglie, aliquote, fasce, i_regione, reddito):
+    if i_regione < 0:
+        return 0.0
+    n = fasce[i_regione]
+    i = _cerca(soglie[i_regione], n, reddito)
+    if i == n:
+        return 0.0
+    return reddito * aliquote[i_regione, i]
+
+
+def _crea_nucleo(t: TabelleCompilate):
+    """
+    Nucleo con le tabelle di `t` come costanti: passarle come argomenti
+    costerebbe a ogni chiamata più del calcolo stesso.
+    """
+    irpef_soglie, irpef_basi, irpef_inferiori, irpef_aliquote = (
+        t.irpef_soglie, t.irpef_basi, t.irpef_inferiori, t.irpef_aliquote
+    )
+    soglia_no_tax, giorni_lavorativi = t.soglia_no_tax, t.giorni_lavorativi
+    detrazioni_tabella, agevolazioni_tabella = t.detrazioni, t.agevolazioni
+    regionali_soglie, regionali_aliquote, regionali_fasce = t.regionali_soglie, t.regionali_aliquote, t.regionali_fasce
+
+    def nucleo(
+        ral, aliquota_contributi, i_regione, addizionale_comunale_perc, mensilita,
+        buono_giornaliero, giorni_buoni, assicurazione_sanitaria_perc,
+        modo_fondo, fondo_pensione, contributo_datore_perc,
+        premio_risultato, premio_irpef, premio_flat, premio_flat_perc, welfare,
+        giorni_lavorati, orario_settimanale, giorni_ferie,
+    ):
+        return _calcola(
+            ral, aliquota_contributi, i_regione, addizionale_comunale_perc, mensilita,
+            buono_giornaliero, giorni_buoni, assicurazione_sanitaria_perc,
+            modo_fondo, fondo_pensione, contributo_datore_perc,
+            premio_risultato, premio_irpef, premio_flat, premio_flat_perc, welfare,
+            giorni_lavorati, orario_settimanale, giorni_ferie,
+            irpef_soglie, irpef_basi, irpef_inferiori, irpef_aliquote, soglia_no_tax, giorni_lavorativi,
+            detrazioni_tabella, agevolazioni_tabella, regionali_soglie, regionali_aliquote, regionali_fasce,
+        )
+
+    def addizionale_regionale(i_regione, reddito):
+        return _addizionale_regionale(regionali_soglie, regionali_aliquote, regionali_fasce, i_regione, reddito)
+
+    if JIT_DISPONIBILE:
+        return njit(nucleo), njit(addizionale_regionale)
+    return nucleo, addizionale_regionale
+
+
+def _calcola(
+    ral, aliquota_contributi, i_regione, addizionale_comunale_perc, mensilita,
+    buono_giornaliero, giorni_buoni, assicurazione_sanitaria_perc,
+    modo_fondo, fondo_pensione, contributo_datore_perc,
+    premio_risultato, premio_irpef, premio_flat, premio_flat_perc, welfare,
+    giorni_lavorati, orario_settimanale, giorni_ferie,
+    irpef_soglie, irpef_basi, irpef_inferiori, irpef_aliquote, soglia_no_tax, giorni_lavorativi,
+    detrazioni_tabella, agevolazioni_tabella, regionali_soglie, regionali_aliquote, regionali_fasce,
+):
+    # 1-2. INPS e TFR
+    contributi_inps = ral * aliquota_contributi
+    tfr = ral / 13.5 - ral * 0.005
+
+    # 3. FONDO PENSIONE (modo_fondo: 0 nessuno, 1 importo, 2 percentuale)
+    base_fondo = ral - contributi_inps
+    if modo_fondo == 1:
+        contributo_volontario = fondo_pensione
+    elif modo_fondo == 2:
+        contributo_volontario = base_fondo * fondo_pensione / 100
+    else:
+        contributo_volontario = 0.0
+    contributo_datore = base_fondo * contributo_datore_perc / 100
+    fondo_totale = contributo_volontario + contributo_datore
+
+    # 4. ASSICURAZIONE SANITARIA
+    assicurazione = ral * assicurazione_sanitaria_perc / 100
+
+    # 5. PREMIO VARIABILE
+    if premio_irpef:
+        ral_effettiva = ral + premio_risultato
+        premio_netto = 0.0
+    else:
+        ral_effettiva = ral
+        premio_netto = premio_risultato * (1 - premio_flat_perc / 100)
+
+    # 6. IMPONIBILE
+    imponibile = max(0.0, ral_effettiva - contributi_inps - contributo_volontario - assicurazione)
+
+    # 7. IRPEF
+    i = _cerca(irpef_soglie, len(irpef_soglie), imponibile)
+    irpef_lorda = irpef_basi[i] + (imponibile - irpef_inferiori[i]) * irpef_aliquote[i]
+
+    # 8. ADDIZIONALI
+    add_regionale = _addizionale_regionale(
+        regionali_soglie, regionali_aliquote, regionali_fasce, i_regione, imponibile
+    )
+    add_comunale = imponibile * addizionale_comunale_perc / 100
+    if imponibile <= soglia_no_tax:
+        imposta_lorda_totale = 0.0
+    else:
+        imposta_lorda_totale = irpef_lorda + add_regionale + add_comunale
+
+    # 9-11. DETRAZIONI, AGEVOLAZIONI, IMPOSTA NETTA
+    detrazioni = _tratti(detrazioni_tabella, imponibile)
+    detrazioni *= giorni_lavorati / 365
+    agevolazioni = _tratti(agevolazioni_tabella, imponibile)
+    imposta_netta = max(0.0, imposta_lorda_totale - detrazioni) - agevolazioni
+
+    # 12-15. NETTO, BUONI, TOTALI, NETTO ORARIO
+    netto_busta = imponibile - imposta_netta + (premio_netto if premio_flat else 0.0)
+    buoni_annui = buono_giornaliero * giorni_buoni
+    buoni_mensili = buoni_annui / 12
+    netto_totale = netto_busta + buoni_annui + welfare
+    netto_mensile = netto_busta / mensilita
+    giorni_effettivi = giorni_lavorativi - giorni_ferie
+    ore_giornaliere = orario_settimanale / 5
+    ore_lavorate_annue = giorni_effettivi * ore_giornaliere
+    netto_orario = netto_busta / ore_lavorate_annue
+
+    return (
+        imponibile, irpef_lorda, add_regionale, add_comunale, detrazioni, agevolazioni,
+        imposta_lorda_totale, netto_busta, netto_orario, buoni_annui, buoni_mensili,
+        netto_totale, netto_mensile, fondo_totale, tfr, premio_netto,
+    )
+
+
+if JIT_DISPONIBILE:
+    _cerca = njit(cache=True)(_cerca)
+    _tratti = njit(cache=True)(_tratti)
+    _addizionale_regionale = njit(cache=True)(_addizionale_regionale)
+    _calcola = njit(cache=True)(_calcola)
+
+
+class _Compilato(NamedTuple):
+    regole: object
+    tabelle: TabelleCompilate
+    nucleo: object
+    addizionale_regionale: object
+
+
+# un nucleo per set di regole (chiave id, il riferimento tiene vivo l'oggetto)
+_COMPILATI = {}
+
+
+def _compilato(regole) -> _Compilato:
+    voce = _COMPILATI.get(id(regole))
+    if voce is None or voce.regole is not regole:
+        tabelle = compila_tabelle(regole)
+        voce = _COMPILATI[id(regole)] = _Compilato(regole, tabelle, *_crea_nucleo(tabelle))
+    return voce
+
+
+def _calcola_dettagli_record_jit(
+    ral,
+    regione,
+    addizionale_comunale_perc,
+    mensilita,
+    tipo_contratto,
+    buono_giornaliero,
+    giorni_buoni,
+    assicurazione_sanitaria_perc,
+    fondo_pensione_val,
+    fondo_pensione_perc,
+    contributo_datore_perc,
+    premio_risultato,
+    premio_modalita,
+    premio_flat_perc,
+    welfare,
+    giorni_lavorati,
+    orario_settimanale,
+    giorni_ferie,
+    regole=None,
+    addizionale_comunale=None
+):
+    """Come motore_fiscale.calcola_dettagli_record, con il nucleo compilato."""
+    if addizionale_comunale is not None:
+        return motore_fiscale.calcola_dettagli_record(
+            ral, regione, addizionale_comunale_perc, mensilita, tipo_contratto,
+            buono_giornaliero, giorni_buoni, assicurazione_sanitaria_perc,
+            fondo_pensione_val, fondo_pensione_perc, contributo_datore_perc,
+            premio_risultato, premio_modalita, premio_flat_perc, welfare,
+            giorni_lavorati, orario_settimanale, giorni_ferie,
+            regole=regole, addizionale_comunale=addizionale_comunale
+        )
+    regole = regole or REGOLE_2026
+    c = _compilato(regole)
+
+    if fondo_pensione_val is not None:
+        modo_fondo, fondo_pensione = 1, fondo_pensione_val
+    elif fondo_pensione_perc is not None:
+        modo_fondo, fondo_pensione = 2, fondo_pensione_perc
+    else:
+        modo_fondo, fondo_pensione = 0, 0.0
+
+    risultato = c.nucleo(
+        float(ral), regole.aliquota_contributi(tipo_contratto), c.tabelle.indici_regioni.get(regione, -1),
+        float(addizionale_comunale_perc), float(mensilita),
+        float(buono_giornaliero), float(giorni_buoni), float(assicurazione_sanitaria_perc),
+        modo_fondo, float(fondo_pensione), float(contributo_datore_perc),
+        float(premio_risultato), premio_modalita == "irpef", premio_modalita == "flat",
+        float(premio_flat_perc), float(welfare),
+        float(giorni_lavorati), float(orario_settimanale), float(giorni_ferie),
+    )
+    return DettagliStipendio(ral, *risultato, welfare, regione, tipo_contratto)
+
+
+def _calcola_addizionale_regionale_jit(regione: str, reddito_imponibile: float, regole=None) -> float:
+    """Come motore_fiscale.calcola_addizionale_regionale, con il nucleo compilato."""
+    c = _compilato(regole or REGOLE_2026)
+    return c.addizionale_regionale(c.tabelle.indici_regioni.get(regione, -1), float(reddito_imponibile))
+
+
+if JIT_DISPONIBILE:
+    calcola_dettagli_record = _calcola_dettagli_record_jit
+    calcola_addizionale_regionale = _calcola_addizionale_regionale_jit
+else:
+    calcola_dettagli_record = motore_fiscale.calcola_dettagli_record
+    calcola_addizionale_regionale = motore_fiscale.calcola_addizionale_regionale
+
+
+def calcola_dettagli(*args, **kwargs) -> dict:
+    """Come motore_fiscale.calcola_dettagli (dizionario con etichette)."""
+    return calcola_dettagli_record(*args, **kwargs).come_dizionario()
@@ -0,0 +1,248 @@
+"""
+Cedolini mese per mese con conguaglio di dicembre.
+
+Vettoriale su dipendenti × 12 mesi: ogni voce è un array (dipendenti, 12).
+
+Ritenute con il metodo progressivo (cumulativo):
+- imponibile del mese = lordo + premio tassato in IRPEF - INPS - fondo
+  pensione - assicurazione sanitaria (come nel motore annuale);
+- a fine mese m il reddito presunto è l'imponibile progressivo riportato
+  all'anno (progressivo * 12 / m); le ritenute progressive sono l'imposta
+  netta annua su quel reddito per m/12; la ritenuta del mese è la differenza
+  con le ritenute progressive del mese precedente;
+- a dicembre il reddito presunto coincide con quello effettivo: il totale
+  delle ritenute è l'imposta netta annua di calcola_dettagli e la differenza
+  rispetto a una ritenuta "ordinaria" è il conguaglio.
+
+I totali annui coincidono con calcola_dettagli (a meno degli arrotondamenti
+delle somme) finché l'imponibile di nessun mese viene azzerato, cioè quando
+fondo pensione e deduzioni del mese non superano il lordo del mese.
+
+Ogni mese dipende solo dai progressivi dei mesi precedenti: una variazione
+nel mese k (ricalcola_da) ricalcola solo i mesi k..12.
+"""
+import numpy as np
+
+from motore_batch import calcola_imposte
+from motore_fiscale import REGOLE_2026
+from validazione import VALORI_PREDEFINITI
+
+MESI = 12
+
+# mese (0 = gennaio) in cui si pagano le mensilità aggiuntive: 13ª, 14ª, 15ª
+MESI_MENSILITA_AGGIUNTIVE = (11, 6, 11)
+
+# mese di pagamento predefinito del premio di risultato (luglio)
+MESE_PREMIO = 7
+
+VOCI = (
+    "lordo",
+    "contributi_inps",
+    "fondo_pensione",
+    "imponibile",
+    "imponibile_progressivo",
+    "reddito_presunto",
+    "ritenute_progressive",
+    "ritenuta",
+    "conguaglio",
+    "premio_netto",
+    "netto",
+)
+
+
+def lordo_mensile(ral, mensilita):
+    """
+    Lordo di ogni mese (dipendenti, 12): RAL / mensilità ogni mese, più le
+    mensilità aggiuntive nei mesi di MESI_MENSILITA_AGGIUNTIVE.
+    """
+    ral, mensilita = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(ral, dtype=float)), np.atleast_1d(np.asarray(mensilita, dtype=float))
+    )
+    rata = ral / mensilita
+    quote = np.ones(ral.shape + (MESI,))
+    for k, mese in enumerate(MESI_MENSILITA_AGGIUNTIVE):
+        quote[..., mese] += mensilita >= MESI + k + 1
+    return rata[..., np.newaxis] * quote
+
+
+def _colonna(valore):
+    """Parametro per dipendente -> forma (dipendenti, 1) per il broadcast sui mesi."""
+    valore = np.asarray(valore)
+    return valore[..., np.newaxis] if valore.ndim else valore
+
+
+class CedoliniAnno:
+    """
+    Risultato di calcola_anno: voci (dipendenti, 12) e parametri, per
+    poter ricalcolare dal mese k in poi.
+    """
+
+    def __init__(self, voci: dict, parametri: dict, regole):
+        self.voci = voci
+        self.parametri = parametri
+        self.regole = regole
+
+    def __getitem__(self, voce):
+        return self.voci[voce]
+
+    def totali(self) -> dict:
+        """Somme annue per dipendente di ciascuna voce mensile."""
+        return {
+            voce: valori.sum(axis=-1)
+            for voce, valori in self.voci.items()
+            if voce not in ("imponibile_progressivo", "reddito_presunto", "ritenute_progressive")
+        }
+
+    def ricalcola_da(self, mese: int, lordo=None, premio_irpef=None, premio_flat=None) -> "CedoliniAnno":
+        """
+        Nuovi cedolini con lordo e/o premi cambiati dal mese `mese` (1-12)
+        in poi. I mesi precedenti restano quelli già calcolati: si riparte
+        dai loro progressivi.
+        """
+        k = mese - 1
+        if not 0 <= k < MESI:
+            raise ValueError("il mese deve essere compreso tra 1 e 12")
+
+        ingressi = {}
+        for nome, nuovo in (("lordo", lordo), ("premio_irpef", premio_irpef), ("premio_flat", premio_flat)):
+            valori = self.parametri[nome].copy()
+            if nuovo is not None:
+                valori[..., k:] = np.broadcast_to(nuovo, valori[..., k:].shape)
+            ingressi[nome] = valori
+
+        parametri = {**self.parametri, **ingressi}
+        coda = _calcola_mesi(parametri, self.regole, k, self.voci)
+        voci = {}
+        for voce, valori in self.voci.items():
+            voci[voce] = valori.copy()
+            voci[voce][..., k:] = coda[voce]
+        return CedoliniAnno(voci, parametri, self.regole)
+
+
+def calcola_anno(
+    lordo,
+    regione,
+    addizionale_comunale_perc,
+    tipo_contratto,
+    assicurazione_sanitaria_perc=0.0,
+    fondo_pensione_val=None,
+    fondo_pensione_perc=None,
+    contributo_datore_perc=0.0,
+    premio_risultato=0.0,
+    premio_modalita="flat",
+    premio_flat_perc=VALORI_PREDEFINITI["premio_flat_perc"],
+    mese_premio=MESE_PREMIO,
+    giorni_lavorati=365,
+    regole=None,
+    addizionale_comunale=None
+) -> CedoliniAnno:
+    """
+    Cedolini di un anno per uno o più dipendenti.
+
+    lordo: (dipendenti, 12) lordo di ogni mese, ad es. lordo_mensile(ral, mensilita)
+    gli altri parametri sono scalari o array (dipendenti,), con lo stesso
+    significato di calcola_dettagli; fondo_pensione_val è annuo e ripartito
+    in 12 quote, il premio è pagato nel mese `mese_premio` (1-12).
+    addizionale_comunale: come in calcola_colonne, con un comune per riga
+    di `lordo` (ad es. dataset.seleziona(codici[:, np.newaxis])).
+    """
+    regole = regole or REGOLE_2026
+    lordo = np.atleast_2d(np.asarray(lordo, dtype=float))
+    forma = lordo.shape
+
+    # premio nel mese di pagamento: in IRPEF si somma all'imponibile, flat è netto a parte
+    premio_risultato, premio_modalita, mese_premio = np.broadcast_arrays(
+        np.asarray(premio_risultato, dtype=float), np.asarray(premio_modalita, dtype=str), np.asarray(mese_premio)
+    )
+    nel_mese = np.arange(1, MESI + 1) == _colonna(mese_premio)
+    premio = np.where(nel_mese, _colonna(premio_risultato), 0.0)
+    premio_irpef = np.broadcast_to(np.where(_colonna(premio_modalita) == "irpef", premio, 0.0), forma).copy()
+    premio_flat = np.broadcast_to(np.where(_colonna(premio_modalita) == "flat", premio, 0.0), forma).copy()
+
+    tipo_contratto = np.asarray(tipo_contratto, dtype=str)
+    parametri = {
+        "lordo": lordo,
+        "premio_irpef": premio_irpef,
+        "premio_flat": premio_flat,
+        "premio_flat_perc": _colonna(np.asarray(premio_flat_perc, dtype=float)),
+        "aliquota_inps": _colonna(regole.aliquota_contributi_array(tipo_contratto)),
+        "assicurazione_sanitaria_perc": _colonna(np.asarray(assicurazione_sanitaria_perc, dtype=float)),
+        "fondo_pensione_val": _colonna(np.array(fondo_pensione_val, dtype=float)),    # None -> NaN
+        "fondo_pensione_perc": _colonna(np.array(fondo_pensione_perc, dtype=float)),  # None -> NaN
+        "contributo_datore_perc": _colonna(np.asarray(contributo_datore_perc, dtype=float)),
+        "regione": _colonna(np.asarray(regione, dtype=str)),
+        "addizionale_comunale_perc": _colonna(np.asarray(addizionale_comunale_perc, dtype=float)),
+        "giorni_lavorati": _colonna(np.asarray(giorni_lavorati, dtype=float)),
+        "addizionale_comunale": addizionale_comunale,
+    }
+    return CedoliniAnno(_calcola_mesi(parametri, regole, 0), parametri, regole)
+
+
+def _calcola_mesi(p: dict, regole, k: int, precedenti: dict = None) -> dict:
+    """Voci dei mesi k..11, partendo dai progressivi del mese k-1 di `precedenti`."""
+    lordo = p["lordo"][..., k:]
+    premio_irpef = p["premio_irpef"][..., k:]
+    premio_flat = p["premio_flat"][..., k:]
+
+    # contributi e deduzioni del mese (stesse formule del motore annuale)
+    contributi_inps = lordo * p["aliquota_inps"]
+    base_fondo = lordo - contributi_inps
+    fondo_volontario = np.where(
+        ~np.isnan(p["fondo_pensione_val"]),
+        p["fondo_pensione_val"] / MESI,
+        np.where(~np.isnan(p["fondo_pensione_perc"]), base_fondo * p["fondo_pensione_perc"] / 100, 0.0)
+    )
+    fondo_volontario = np.broadcast_to(fondo_volontario, lordo.shape)
+    fondo_pensione = fondo_volontario + base_fondo * p["contributo_datore_perc"] / 100
+    assicurazione = lordo * p["assicurazione_sanitaria_perc"] / 100
+    imponibile = np.maximum(0, lordo + premio_irpef - contributi_inps - fondo_volontario - assicurazione)
+
+    # progressivi e reddito presunto
+    mesi = np.arange(k + 1, MESI + 1, dtype=float)
+    if k == 0:
+        progressivo_iniziale = 0.0
+        ritenute_iniziali = 0.0
+    else:
+        progressivo_iniziale = precedenti["imponibile_progressivo"][..., k - 1:k]
+        ritenute_iniziali = precedenti["ritenute_progressive"][..., k - 1:k]
+    imponibile_progressivo = progressivo_iniziale + np.cumsum(imponibile, axis=-1)
+    reddito_presunto = imponibile_progressivo * MESI / mesi
+    # a dicembre il reddito presunto è quello effettivo, senza arrotondamenti
+    reddito_presunto[..., -1] = imponibile_progressivo[..., -1]
+
+    imposta_annua = calcola_imposte(
+        reddito_presunto,
+        p["regione"],
+        p["addizionale_comunale_perc"],
+        p["giorni_lavorati"],
+        regole,
+        p["addizionale_comunale"],
+    )["imposta_netta"]
+    ritenute_progressive = imposta_annua * mesi / MESI
+    ritenuta = np.diff(ritenute_progressive, axis=-1, prepend=ritenute_iniziali)
+
+    # conguaglio: ritenuta di dicembre meno quella "ordinaria" (un altro mese
+    # al ritmo del reddito presunto di novembre)
+    conguaglio = np.zeros(lordo.shape)
+    if k <= MESI - 2:
+        ritenute_novembre = ritenute_progressive[..., -2]
+    else:
+        ritenute_novembre = precedenti["ritenute_progressive"][..., MESI - 2]
+    conguaglio[..., -1] = ritenuta[..., -1] - ritenute_novembre / (MESI - 1)
+
+    premio_netto = premio_flat * (1 - p["premio_flat_perc"] / 100)
+    netto = imponibile - ritenuta + premio_netto
+
+    return {
+        "lordo": lordo.copy(),
+        "contributi_inps": contributi_inps,
+        "fondo_pensione": fondo_pensione,
+        "imponibile": imponibile,
+        "imponibile_progressivo": imponibile_progressivo,
+        "reddito_presunto": reddito_presunto,
+        "ritenute_progressive": ritenute_progressive,
+        "ritenuta": ritenuta,
+        "conguaglio": conguaglio,
+        "premio_netto": premio_netto,
+        "netto": netto,
+    }
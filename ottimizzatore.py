@@ -0,0 +1,197 @@
+"""
+Contributo volontario al fondo pensione e tassazione del premio ottimali.
+
+Sceglie il contributo volontario (entro la soglia di deducibilità delle
+regole, contributo del datore compreso) e la modalità
+del premio ("flat" o "irpef") che massimizzano la ricchezza generata della
+sezione "Ricchezza Generata" dell'app:
+
+    netto + buoni × coeff_buoni + welfare × coeff_welfare + (fondo pensione + TFR) × coeff_futuro
+
+A RAL fissata l'imponibile è base - contributo e il netto è lineare a tratti
+nell'imponibile (vedi inversa.ProfiloNetto): la ricchezza, lineare a tratti
+nel contributo, ha il massimo agli estremi (0 e tetto) o in corrispondenza
+di una soglia. Si valutano con il motore solo questi candidati (più un
+centesimo prima e dopo ogni soglia, per i salti), per entrambe le modalità
+e per tutti i dipendenti insieme: nessuna griglia.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from inversa import ProfiloNetto
+from motore_batch import calcola_colonne
+from motore_fiscale import REGOLE_2026
+from proiezione import COEFF_BUONI, COEFF_FUTURO, COEFF_WELFARE
+from validazione import VALORI_PREDEFINITI
+
+MODALITA = ("flat", "irpef")
+
+# intorno delle soglie valutato (gli importi sono in centesimi)
+CENTESIMO = 0.01
+
+DIPENDENTI_PER_BLOCCO = 20_000
+
+
+class SceltaOttimale(NamedTuple):
+    fondo_pensione_val: float  # contributo volontario annuo
+    premio_modalita: str
+    ricchezza: float
+    netto: float
+
+
+def ricchezza_generata(colonne: dict, coeff_buoni=COEFF_BUONI, coeff_welfare=COEFF_WELFARE, coeff_futuro=COEFF_FUTURO):
+    """Stessa formula della sezione "Ricchezza Generata" dell'app, su colonne di calcola_colonne."""
+    return (
+        colonne["netto"]
+        + colonne["buoni_pasto_annui"] * coeff_buoni
+        + colonne["welfare"] * coeff_welfare
+        + (colonne["fondo_pensione_totale"] + colonne["tfr"]) * coeff_futuro
+    )
+
+
+def _punti_imponibile(regione, addizionale_comunale_perc, giorni_lavorati, regole, addizionale_comunale):
+    # i punti non dipendono da contratto, deduzioni e premio
+    return ProfiloNetto(
+        regione=regione,
+        addizionale_comunale_perc=addizionale_comunale_perc,
+        tipo_contratto="Indeterminato",
+        giorni_lavorati=giorni_lavorati,
+        regole=regole,
+        addizionale_comunale=addizionale_comunale,
+    ).punti_imponibile()
+
+
+def _candidati(base, massimo, punti):
+    """
+    Contributi candidati (dipendenti, C): 0, il massimo e, per ogni soglia
+    dell'imponibile raggiungibile, il contributo che la tocca ± un centesimo.
+    """
+    contributi = base[:, np.newaxis] - punti[np.newaxis, :]
+    validi = (contributi > 0) & (contributi < massimo[:, np.newaxis])
+    k = int(validi.sum(axis=1).max(initial=0))
+    # i validi in testa, gli altri (riempimento) diventano 0
+    contributi = np.sort(np.where(validi, contributi, np.inf), axis=1)[:, :k]
+    contributi = np.where(np.isinf(contributi), 0.0, contributi)
+    candidati = np.concatenate(
+        [
+            np.zeros((len(base), 1)),
+            massimo[:, np.newaxis],
+            contributi,
+            contributi - CENTESIMO,
+            contributi + CENTESIMO,
+        ],
+        axis=1,
+    )
+    return np.clip(candidati, 0.0, massimo[:, np.newaxis])
+
+
+def ottimizza_batch(
+    ral,
+    coeff_buoni=COEFF_BUONI,
+    coeff_welfare=COEFF_WELFARE,
+    coeff_futuro=COEFF_FUTURO,
+    regole=None,
+    addizionale_comunale=None,
+    dipendenti_per_blocco: int = DIPENDENTI_PER_BLOCCO,
+    **parametri
+) -> dict:
+    """
+    Scelta ottimale per ogni dipendente.
+
+    parametri: gli altri argomenti di calcola_dettagli (scalari o array per
+    dipendente) tranne fondo_pensione_val, fondo_pensione_perc e
+    premio_modalita, che vengono scelti; quelli mancanti prendono i valori
+    predefiniti dell'app.
+    addizionale_comunale: regola di un comune (comuni.AddizionaleComunale),
+    la stessa per tutti i dipendenti; sostituisce la %.
+
+    Restituisce array per dipendente: "fondo_pensione_val", "premio_modalita",
+    "ricchezza", "netto".
+    """
+    scelti = {"fondo_pensione_val", "fondo_pensione_perc", "premio_modalita"}
+    sconosciuti = (set(parametri) - set(VALORI_PREDEFINITI)) | (set(parametri) & scelti)
+    if sconosciuti:
+        raise TypeError(f"argomenti non ammessi: {', '.join(sorted(sconosciuti))}")
+    argomenti = {nome: valore for nome, valore in {**VALORI_PREDEFINITI, **parametri}.items() if nome not in scelti}
+
+    ral = np.atleast_1d(np.asarray(ral, dtype=float))
+    nomi = list(argomenti)
+    colonne = np.broadcast_arrays(ral, *(np.asarray(argomenti[nome]) for nome in nomi))
+    ral, argomenti = colonne[0].ravel(), {nome: c.ravel() for nome, c in zip(nomi, colonne[1:])}
+    n = len(ral)
+
+    # imponibile = max(0, base - contributo), con base diversa per le due modalità
+    aliquota = (regole or REGOLE_2026).aliquota_contributi_array(argomenti["tipo_contratto"])
+    inps = ral * aliquota
+    base_flat = ral - inps - ral * argomenti["assicurazione_sanitaria_perc"].astype(float) / 100
+    premio = argomenti["premio_risultato"].astype(float)
+    contributo_datore = (ral - inps) * argomenti["contributo_datore_perc"].astype(float) / 100
+    tetto = np.maximum(0.0, (regole or REGOLE_2026).soglia_deducibilita_fondo - contributo_datore)
+
+    # soglie dell'imponibile per gruppo di regione / aliquota comunale / giorni lavorati
+    chiavi = np.stack([
+        argomenti["regione"].astype(str),
+        argomenti["addizionale_comunale_perc"].astype(float).astype(str),
+        argomenti["giorni_lavorati"].astype(float).astype(str),
+    ], axis=1)
+    gruppi, gruppo = np.unique(chiavi, axis=0, return_inverse=True)
+    gruppo = gruppo.ravel()
+
+    risultato = {
+        "fondo_pensione_val": np.empty(n),
+        "premio_modalita": np.empty(n, dtype="<U5"),
+        "ricchezza": np.empty(n),
+        "netto": np.empty(n),
+    }
+    modalita = np.array(MODALITA)
+
+    for g, (regione, comunale, giorni) in enumerate(gruppi):
+        punti = _punti_imponibile(str(regione), float(comunale), float(giorni), regole, addizionale_comunale)
+        righe_gruppo = np.flatnonzero(gruppo == g)
+
+        for inizio in range(0, len(righe_gruppo), dipendenti_per_blocco):
+            righe = righe_gruppo[inizio:inizio + dipendenti_per_blocco]
+            candidati = []
+            for nome_modalita in MODALITA:
+                base = base_flat[righe] + (premio[righe] if nome_modalita == "irpef" else 0.0)
+                # oltre l'imponibile il contributo non riduce più il netto calcolato: non ha senso
+                massimo = np.minimum(tetto[righe], np.maximum(base, 0.0))
+                candidati.append(_candidati(base, massimo, punti))
+            larghezza = max(c.shape[1] for c in candidati)
+            candidati = np.stack(
+                [np.pad(c, ((0, 0), (0, larghezza - c.shape[1])), mode="edge") for c in candidati], axis=1
+            )  # (dipendenti, modalità, candidati)
+
+            colonne = calcola_colonne(
+                ral=ral[righe][:, np.newaxis, np.newaxis],
+                premio_modalita=modalita[np.newaxis, :, np.newaxis],
+                fondo_pensione_val=candidati,
+                fondo_pensione_perc=None,
+                regole=regole,
+                addizionale_comunale=addizionale_comunale,
+                **{nome: valori[righe][:, np.newaxis, np.newaxis] for nome, valori in argomenti.items()}
+            )
+            ricchezza = ricchezza_generata(colonne, coeff_buoni, coeff_welfare, coeff_futuro).reshape(len(righe), -1)
+            # a parità di ricchezza vince il primo candidato: flat prima di irpef, 0 prima del tetto
+            migliore = ricchezza.argmax(axis=1)
+            i_modalita, i_candidato = np.divmod(migliore, larghezza)
+            posizioni = np.arange(len(righe))
+
+            risultato["fondo_pensione_val"][righe] = candidati[posizioni, i_modalita, i_candidato]
+            risultato["premio_modalita"][righe] = modalita[i_modalita]
+            risultato["ricchezza"][righe] = ricchezza[posizioni, migliore]
+            risultato["netto"][righe] = colonne["netto"].reshape(len(righe), -1)[posizioni, migliore]
+
+    return risultato
+
+
+def ottimizza(ral, **parametri) -> SceltaOttimale:
+    """Scelta ottimale per un solo dipendente (stessi argomenti di ottimizza_batch, scalari)."""
+    risultato = ottimizza_batch([ral], **parametri)
+    return SceltaOttimale(
+        fondo_pensione_val=float(risultato["fondo_pensione_val"][0]),
+        premio_modalita=str(risultato["premio_modalita"][0]),
+        ricchezza=float(risultato["ricchezza"][0]),
+        netto=float(risultato["netto"][0]),
+    )
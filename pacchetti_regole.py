@@ -0,0 +1,124 @@
+"""
+Pacchetti di regole fiscali versionati.
+
+Ogni anno (o proposta di legge) è un file JSON nella cartella regole/, ad
+es. regole/2026.json: scaglioni IRPEF, no tax area, detrazioni, agevolazioni,
+addizionali regionali, aliquote INPS, soglia di deducibilità del fondo
+pensione e giorni lavorativi. Il nome del file è la versione.
+
+carica_regole legge e compila un pacchetto una sola volta per processo
+(cache per versione): lo stesso oggetto RegoleFiscali è condiviso da tutti
+i calcoli, comprese le cache dei motori che lo usano come chiave.
+RegoleFiscali.impronta è lo sha256 del JSON canonico del pacchetto: cambia
+con qualunque modifica ai dati, anche senza cambiare versione.
+
+Formato (soglia null = nessun limite superiore):
+    "scaglioni_irpef":       [[soglia, aliquota], ...]
+    "detrazioni_lavoro":     [{"soglia": ..., "costante": ..., "aliquota": ...,
+                               "rampa": ..., "inclusiva": ...}, ...]   (vedi scaglioni.Tratto)
+    "agevolazioni":          come detrazioni_lavoro
+    "addizionali_regionali": {regione: [[soglia, aliquota], ...]}
+    "inps":                  {"aliquota": ..., "aliquota_apprendistato": ...}
+    "soglia_no_tax", "soglia_deducibilita_fondo", "giorni_lavorativi": numeri
+
+Esempio:
+    regole_2025 = carica_regole(2025)
+    calcola_dettagli(..., regole=regole_2025)
+"""
+import hashlib
+import json
+import math
+from functools import lru_cache
+from pathlib import Path
+
+from scaglioni import RegoleFiscali, Tratto
+
+CARTELLA_REGOLE = Path(__file__).with_name("regole")
+
+_CHIAVI_OBBLIGATORIE = (
+    "scaglioni_irpef",
+    "soglia_no_tax",
+    "detrazioni_lavoro",
+    "agevolazioni",
+    "addizionali_regionali",
+    "inps",
+    "soglia_deducibilita_fondo",
+    "giorni_lavorativi",
+)
+_CAMPI_TRATTO = set(Tratto._fields)
+
+
+def versioni_disponibili(cartella=CARTELLA_REGOLE):
+    """Versioni presenti nella cartella (nomi dei file senza .json), in ordine."""
+    return sorted(percorso.stem for percorso in Path(cartella).glob("*.json"))
+
+
+def _soglia(valore) -> float:
+    return math.inf if valore is None else valore
+
+
+def _fasce(fasce, nome: str):
+    soglie = [_soglia(s) for s, _ in fasce]
+    if not soglie or soglie != sorted(soglie) or not math.isinf(soglie[-1]):
+        raise ValueError(f"{nome}: soglie non crescenti o ultima soglia non null")
+    return [(s, a) for s, (_, a) in zip(soglie, fasce)]
+
+
+def _tratti(tratti, nome: str):
+    risultato = []
+    for tratto in tratti:
+        sconosciuti = set(tratto) - _CAMPI_TRATTO
+        if sconosciuti:
+            raise ValueError(f"{nome}: campi sconosciuti {', '.join(sorted(sconosciuti))}")
+        risultato.append(Tratto(**{**tratto, "soglia": _soglia(tratto["soglia"])}))
+    if not risultato or not math.isinf(risultato[-1].soglia):
+        raise ValueError(f"{nome}: l'ultimo tratto deve avere soglia null")
+    return risultato
+
+
+def impronta(dati: dict) -> str:
+    """sha256 del JSON canonico (chiavi ordinate, senza spazi) del pacchetto."""
+    canonico = json.dumps(dati, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonico.encode("utf-8")).hexdigest()
+
+
+def da_dizionario(dati: dict, versione: str = "") -> RegoleFiscali:
+    """Compila un pacchetto già letto (dizionario con il formato dei file JSON)."""
+    mancanti = [chiave for chiave in _CHIAVI_OBBLIGATORIE if chiave not in dati]
+    if mancanti:
+        raise ValueError(f"pacchetto {versione or '?'}: chiavi mancanti {', '.join(mancanti)}")
+    return RegoleFiscali.da_dati(
+        scaglioni_irpef=_fasce(dati["scaglioni_irpef"], "scaglioni_irpef"),
+        soglia_no_tax=dati["soglia_no_tax"],
+        detrazioni_lavoro=_tratti(dati["detrazioni_lavoro"], "detrazioni_lavoro"),
+        agevolazioni=_tratti(dati["agevolazioni"], "agevolazioni"),
+        aliquote_regionali={
+            regione: _fasce(fasce, regione) for regione, fasce in dati["addizionali_regionali"].items()
+        },
+        aliquota_inps=dati["inps"]["aliquota"],
+        aliquota_inps_apprendistato=dati["inps"]["aliquota_apprendistato"],
+        soglia_deducibilita_fondo=dati["soglia_deducibilita_fondo"],
+        giorni_lavorativi=dati["giorni_lavorativi"],
+        versione=str(dati.get("versione", versione)),
+        impronta=impronta(dati),
+    )
+
+
+@lru_cache(maxsize=None)
+def _carica(versione: str, cartella: str) -> RegoleFiscali:
+    percorso = Path(cartella) / f"{versione}.json"
+    if not percorso.exists():
+        disponibili = ", ".join(versioni_disponibili(cartella)) or "nessuna"
+        raise KeyError(f"regole {versione!r} non trovate (disponibili: {disponibili})")
+    return da_dizionario(json.loads(percorso.read_text(encoding="utf-8")), versione)
+
+
+def carica_regole(versione, cartella=CARTELLA_REGOLE) -> RegoleFiscali:
+    """RegoleFiscali della versione (es. 2026 o "2026"), compilate una volta per processo."""
+    return _carica(str(versione), str(cartella))
+
+
+def descrizione(versione, cartella=CARTELLA_REGOLE) -> str:
+    """Testo "descrizione" del pacchetto (vuoto se assente)."""
+    percorso = Path(cartella) / f"{versione}.json"
+    return json.loads(percorso.read_text(encoding="utf-8")).get("descrizione", "")
@@ -0,0 +1,170 @@
+"""
+Tempi delle fasi del calcolo e delle sezioni dell'interfaccia (opzionale).
+
+Si attiva con la variabile d'ambiente CALCOLATORE_PROFILAZIONE, che indica
+anche il file di esportazione (formato dall'estensione):
+
+    CALCOLATORE_PROFILAZIONE=tempi.json streamlit run calc_stip.py
+    CALCOLATORE_PROFILAZIONE=tempi.prom python elabora_buste.py ...
+
+- .json: per categoria e nome conteggio, totale, medio, massimo e istogramma;
+- .prom (o altro): formato testuale Prometheus, un istogramma
+  calcolatore_durata_secondi con etichette categoria e nome.
+
+L'app riscrive il file a ogni rerun, gli altri processi all'uscita.
+Da spento il costo è un controllo di PROFILATORE.attivo per fase e un
+cronometro che non fa nulla per sezione.
+"""
+import atexit
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from time import perf_counter
+
+VARIABILE_AMBIENTE = "CALCOLATORE_PROFILAZIONE"
+
+# limiti superiori (secondi) dei bucket dell'istogramma
+BUCKET_SECONDI = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class _Misura:
+    __slots__ = ("conteggio", "totale", "massimo", "bucket")
+
+    def __init__(self):
+        self.conteggio = 0
+        self.totale = 0.0
+        self.massimo = 0.0
+        self.bucket = [0] * (len(BUCKET_SECONDI) + 1)  # l'ultimo è +Inf
+
+    def aggiungi(self, secondi: float):
+        self.conteggio += 1
+        self.totale += secondi
+        self.massimo = max(self.massimo, secondi)
+        i = 0
+        while i < len(BUCKET_SECONDI) and secondi > BUCKET_SECONDI[i]:
+            i += 1
+        self.bucket[i] += 1
+
+
+class Cronometro:
+    """Tempi di sezioni consecutive: segna(nome) registra il tempo dal segno precedente."""
+
+    def __init__(self, profilatore, categoria: str):
+        self.profilatore = profilatore
+        self.categoria = categoria
+        self.ultimo = perf_counter()
+
+    def segna(self, nome: str):
+        adesso = perf_counter()
+        self.profilatore.registra(self.categoria, nome, adesso - self.ultimo)
+        self.ultimo = adesso
+
+
+class _CronometroSpento:
+    def segna(self, nome: str):
+        pass
+
+
+_CRONOMETRO_SPENTO = _CronometroSpento()
+
+
+class Profilatore:
+    def __init__(self, attivo: bool = False, percorso=None):
+        self.attivo = attivo
+        self.percorso = percorso
+        self._misure = {}  # (categoria, nome) -> _Misura
+        self._lock = threading.Lock()
+
+    def registra(self, categoria: str, nome: str, secondi: float):
+        with self._lock:
+            misura = self._misure.get((categoria, nome))
+            if misura is None:
+                misura = self._misure[(categoria, nome)] = _Misura()
+            misura.aggiungi(secondi)
+
+    def cronometro(self, categoria: str):
+        return Cronometro(self, categoria) if self.attivo else _CRONOMETRO_SPENTO
+
+    def azzera(self):
+        with self._lock:
+            self._misure.clear()
+
+    # ----- esportazione -----
+    def dati(self) -> dict:
+        """categoria -> nome -> statistiche, in ordine di prima registrazione."""
+        with self._lock:
+            misure = list(self._misure.items())
+        risultato = {}
+        for (categoria, nome), m in misure:
+            risultato.setdefault(categoria, {})[nome] = {
+                "conteggio": m.conteggio,
+                "totale_s": m.totale,
+                "medio_s": m.totale / m.conteggio,
+                "massimo_s": m.massimo,
+                "bucket": dict(zip([*map(str, BUCKET_SECONDI), "+Inf"], m.bucket)),
+            }
+        return risultato
+
+    def testo_prometheus(self) -> str:
+        righe = [
+            "# HELP calcolatore_durata_secondi Durata delle fasi del calcolo e delle sezioni dell'interfaccia.",
+            "# TYPE calcolatore_durata_secondi histogram",
+        ]
+        for categoria, nomi in self.dati().items():
+            for nome, m in nomi.items():
+                etichette = f'categoria="{_escape(categoria)}",nome="{_escape(nome)}"'
+                cumulato = 0
+                for limite, conteggio in m["bucket"].items():
+                    cumulato += conteggio
+                    righe.append(f'calcolatore_durata_secondi_bucket{{{etichette},le="{limite}"}} {cumulato}')
+                righe.append(f"calcolatore_durata_secondi_sum{{{etichette}}} {m['totale_s']!r}")
+                righe.append(f"calcolatore_durata_secondi_count{{{etichette}}} {m['conteggio']}")
+        return "\n".join(righe) + "\n"
+
+    def esporta(self, percorso=None) -> bool:
+        """
+        Scrive il file (JSON se l'estensione è .json, altrimenti Prometheus).
+
+        Può essere chiamata da più sessioni o frammenti insieme: ognuno scrive
+        un proprio file temporaneo. Un errore di scrittura non interrompe il
+        calcolo: viene segnalato su stderr e restituisce False.
+        """
+        percorso = Path(percorso or self.percorso)
+        if percorso.suffix.lower() == ".json":
+            testo = json.dumps(self.dati(), ensure_ascii=False, indent=2)
+        else:
+            testo = self.testo_prometheus()
+        # scrittura atomica: chi legge (es. node_exporter) non vede file a metà
+        temporaneo = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=percorso.parent,
+                prefix=percorso.name + ".", suffix=".tmp", delete=False
+            ) as file:
+                temporaneo = file.name
+                file.write(testo)
+            os.replace(temporaneo, percorso)
+        except OSError as errore:
+            if temporaneo is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(temporaneo)
+            print(f"profilazione: esportazione in {percorso} non riuscita: {errore}", file=sys.stderr)
+            return False
+        return True
+
+
+def _escape(valore: str) -> str:
+    return valore.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+PROFILATORE = Profilatore(
+    attivo=bool(os.environ.get(VARIABILE_AMBIENTE)),
+    percorso=os.environ.get(VARIABILE_AMBIENTE) or None,
+)
+
+if PROFILATORE.attivo:
+    atexit.register(PROFILATORE.esporta)
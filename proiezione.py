@@ -0,0 +1,119 @@
+"""
+Proiezione pluriennale di carriera e ricchezza.
+
+Per ogni scenario un percorso di RAL anno per anno; il motore fiscale è
+applicato a tutti gli anni di tutti gli scenari in un solo passaggio
+vettoriale (array scenari × anni). Su questo:
+
+- TFR: le quote annue (campo tfr di calcola_dettagli) restano in azienda e
+  il fondo accumulato è rivalutato ogni anno dell'1,5% + 75% dell'inflazione,
+  al netto dell'imposta sostitutiva del 17% sulla rivalutazione;
+- fondo pensione: i contributi annui (volontario + datore) si capitalizzano
+  al rendimento netto indicato;
+- ricchezza: come nella sezione "Ricchezza Generata" dell'app, netto +
+  buoni pasto × coeff_buoni + welfare × coeff_welfare anno per anno, più
+  TFR e fondo maturati a fine periodo × coeff_futuro, tutto scontato
+  all'anno 0 (il primo anno è scontato di un anno).
+
+I contributi e le quote di ogni anno sono accreditati a fine anno.
+"""
+import numpy as np
+
+from motore_batch import calcola_colonne
+from validazione import VALORI_PREDEFINITI
+
+TFR_RIVALUTAZIONE_FISSA = 0.015
+TFR_QUOTA_INFLAZIONE = 0.75
+TFR_IMPOSTA_RIVALUTAZIONE = 0.17
+
+# stessi valori predefiniti della sezione "Ricchezza Generata" dell'app
+COEFF_BUONI = 0.95
+COEFF_WELFARE = 0.95
+COEFF_FUTURO = 0.85
+
+
+def _per_scenario(valore):
+    """Scalare, (scenari,) o (scenari, anni) -> forma che fa broadcast su (scenari, anni)."""
+    valore = np.asarray(valore)
+    return valore[:, np.newaxis] if valore.ndim == 1 else valore
+
+
+def percorso_ral(ral_iniziale, crescita, anni: int):
+    """RAL di ogni anno (scenari, anni): ral_iniziale × (1 + crescita)^anno."""
+    ral_iniziale = np.atleast_1d(np.asarray(ral_iniziale, dtype=float))
+    crescita = np.atleast_1d(np.asarray(crescita, dtype=float))
+    esponenti = np.arange(anni)
+    return ral_iniziale[:, np.newaxis] * (1 + crescita[:, np.newaxis]) ** esponenti
+
+
+def _montante(quote, tassi):
+    """
+    Capitale a fine di ogni anno con versamenti `quote` a fine anno e
+    capitale dell'anno prima rivalutato a `tassi`: M_t = M_{t-1} (1 + r_t) + q_t.
+    """
+    fattori = np.cumprod(np.broadcast_to(1 + tassi, quote.shape), axis=-1)
+    return fattori * np.cumsum(quote / fattori, axis=-1)
+
+
+def proietta_carriera(
+    ral,
+    rendimento_fondo=0.03,
+    inflazione=0.02,
+    tasso_sconto=0.02,
+    coeff_buoni=COEFF_BUONI,
+    coeff_welfare=COEFF_WELFARE,
+    coeff_futuro=COEFF_FUTURO,
+    regole=None,
+    addizionale_comunale=None,
+    **parametri
+) -> dict:
+    """
+    Proiezione di uno o più scenari.
+
+    ral: RAL (scenari, anni), ad es. percorso_ral(30000, [0.01, 0.02, 0.03], 30)
+    rendimento_fondo, inflazione, tasso_sconto: tassi annui, scalari o per
+        scenario (scenari,) o per scenario e anno (scenari, anni)
+    parametri: gli altri argomenti di calcola_dettagli, scalari o per
+        scenario; quelli mancanti prendono i valori predefiniti dell'app
+    addizionale_comunale: regola del comune (sostituisce la %)
+
+    Restituisce array (scenari, anni) — flussi annui del motore e montanti
+    di TFR e fondo a fine anno — e "ricchezza_scontata" (scenari,).
+    """
+    sconosciuti = set(parametri) - set(VALORI_PREDEFINITI)
+    if sconosciuti:
+        raise TypeError(f"argomenti non ammessi: {', '.join(sorted(sconosciuti))}")
+    ral = np.atleast_2d(np.asarray(ral, dtype=float))
+    argomenti = {nome: _per_scenario(valore) for nome, valore in {**VALORI_PREDEFINITI, **parametri}.items()}
+
+    colonne = calcola_colonne(ral=ral, regole=regole, addizionale_comunale=addizionale_comunale, **argomenti)
+
+    inflazione = _per_scenario(np.asarray(inflazione, dtype=float))
+    rivalutazione_tfr = (TFR_RIVALUTAZIONE_FISSA + TFR_QUOTA_INFLAZIONE * inflazione) * (1 - TFR_IMPOSTA_RIVALUTAZIONE)
+    montante_tfr = _montante(colonne["tfr"], rivalutazione_tfr)
+    montante_fondo = _montante(colonne["fondo_pensione_totale"], _per_scenario(np.asarray(rendimento_fondo, dtype=float)))
+
+    # fattore di sconto a fine di ogni anno (anno 1 scontato di un periodo)
+    tasso_sconto = np.broadcast_to(_per_scenario(np.asarray(tasso_sconto, dtype=float)), ral.shape)
+    fattore_sconto = 1 / np.cumprod(1 + tasso_sconto, axis=-1)
+
+    ricchezza_liquida = (
+        colonne["netto"]
+        + colonne["buoni_pasto_annui"] * coeff_buoni
+        + colonne["welfare"] * coeff_welfare
+    )
+    ricchezza_futura = (montante_tfr[..., -1] + montante_fondo[..., -1]) * coeff_futuro
+    ricchezza_scontata = (ricchezza_liquida * fattore_sconto).sum(axis=-1) + ricchezza_futura * fattore_sconto[..., -1]
+
+    return {
+        "ral": colonne["stipendio_lordo"],
+        "netto": colonne["netto"],
+        "buoni_pasto_annui": colonne["buoni_pasto_annui"],
+        "welfare": colonne["welfare"],
+        "tfr": colonne["tfr"],
+        "fondo_pensione_totale": colonne["fondo_pensione_totale"],
+        "montante_tfr": montante_tfr,
+        "montante_fondo": montante_fondo,
+        "fattore_sconto": fattore_sconto,
+        "ricchezza_scontata": ricchezza_scontata,
+    }
@@ -0,0 +1,297 @@
+"""
+Tabelle fiscali a scaglioni espresse come dati.
+
+Ogni tabella viene compilata una sola volta in tuple ordinate di soglie e
+coefficienti; la fascia si trova con una ricerca binaria:
+- bisect per il calcolo scalare (nessuna dipendenza esterna)
+- np.searchsorted per il calcolo vettoriale (NumPy importato solo lì)
+
+Le formule valutate sono le stesse, nello stesso ordine, delle vecchie
+catene if/elif: i risultati coincidono al bit.
+"""
+import math
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+
+def _chiave_ricerca(soglia: float, inclusiva: bool) -> float:
+    """
+    Soglia usata nella ricerca binaria: "x < soglia" equivale a
+    "x <= soglia precedente" (il float subito sotto).
+    """
+    return soglia if inclusiva else math.nextafter(soglia, -math.inf)
+
+
+class ScaglioniProgressivi:
+    """
+    Imposta progressiva per scaglioni (IRPEF): ogni aliquota si applica
+    solo alla parte di reddito che cade nel proprio scaglione.
+
+    scaglioni: [(limite superiore, aliquota), ...] in ordine crescente,
+    l'ultimo limite è float("inf").
+    """
+
+    def __init__(self, scaglioni):
+        self.scaglioni = tuple(scaglioni)
+        self.soglie = tuple(float(s) for s, _ in self.scaglioni)
+        self.aliquote = tuple(a for _, a in self.scaglioni)
+        self.inferiori = (0.0,) + self.soglie[:-1]
+
+        # imposta già maturata all'inizio di ogni scaglione
+        basi = [0.0]
+        for i in range(len(self.soglie) - 1):
+            basi.append(basi[i] + (self.soglie[i] - self.inferiori[i]) * self.aliquote[i])
+        self.basi = tuple(basi)
+
+        self.punti_di_rottura = tuple(s for s in self.soglie if math.isfinite(s))
+        self._array = None
+
+    def __call__(self, reddito: float) -> float:
+        i = bisect_left(self.soglie, reddito)
+        return self.basi[i] + (reddito - self.inferiori[i]) * self.aliquote[i]
+
+    def affine(self, reddito: float):
+        """(pendenza, intercetta) dello scaglione che contiene `reddito`."""
+        i = bisect_left(self.soglie, reddito)
+        return self.aliquote[i], self.basi[i] - self.inferiori[i] * self.aliquote[i]
+
+    def valuta_array(self, reddito):
+        import numpy as np
+
+        if self._array is None:
+            self._array = tuple(
+                np.array(v, dtype=float)
+                for v in (self.soglie, self.basi, self.inferiori, self.aliquote)
+            )
+        soglie, basi, inferiori, aliquote = self._array
+
+        i = np.searchsorted(soglie, reddito, side="left")
+        return basi[i] + (reddito - inferiori[i]) * aliquote[i]
+
+
+class Tratto(NamedTuple):
+    """
+    Un tratto di una funzione lineare a tratti, valido fino a `soglia`:
+
+        valore = costante + x * aliquota + rampa * (soglia - x) / larghezza
+
+    dove larghezza è l'ampiezza del tratto (soglia - soglia precedente).
+    `rampa` descrive i decalage lineari che si annullano alla soglia;
+    `inclusiva=False` significa x < soglia invece di x <= soglia.
+    """
+    soglia: float
+    costante: float = 0.0
+    aliquota: float = 0.0
+    rampa: float = 0.0
+    inclusiva: bool = True
+
+
+class TabellaTratti:
+    """Funzione lineare a tratti (detrazioni, agevolazioni) compilata per la ricerca binaria."""
+
+    def __init__(self, tratti):
+        self.tratti = tuple(tratti)
+        self.chiavi = tuple(_chiave_ricerca(float(t.soglia), t.inclusiva) for t in self.tratti)
+        self.costanti = tuple(t.costante for t in self.tratti)
+        self.aliquote = tuple(t.aliquota for t in self.tratti)
+        self.rampe = tuple(t.rampa for t in self.tratti)
+
+        # i tratti senza rampa usano estremo 0 e larghezza 1: il termine vale 0
+        # senza mai calcolare inf - x
+        estremi, larghezze = [], []
+        precedente = 0.0
+        for t in self.tratti:
+            if t.rampa:
+                estremi.append(float(t.soglia))
+                larghezze.append(float(t.soglia) - precedente)
+            else:
+                estremi.append(0.0)
+                larghezze.append(1.0)
+            precedente = float(t.soglia)
+        self.estremi = tuple(estremi)
+        self.larghezze = tuple(larghezze)
+
+        self.punti_di_rottura = tuple(float(t.soglia) for t in self.tratti if math.isfinite(t.soglia))
+        self._array = None
+
+    def __call__(self, x: float) -> float:
+        i = bisect_left(self.chiavi, x)
+        if i == len(self.chiavi):
+            return 0.0
+        return self.costanti[i] + x * self.aliquote[i] + self.rampe[i] * (self.estremi[i] - x) / self.larghezze[i]
+
+    def affine(self, x: float):
+        """(pendenza, intercetta) del tratto che contiene `x`."""
+        i = bisect_left(self.chiavi, x)
+        if i == len(self.chiavi):
+            return 0.0, 0.0
+        pendenza_rampa = self.rampe[i] / self.larghezze[i]
+        return self.aliquote[i] - pendenza_rampa, self.costanti[i] + pendenza_rampa * self.estremi[i]
+
+    def valuta_array(self, x):
+        import numpy as np
+
+        if self._array is None:
+            # ultima riga "fuori tabella": vale 0 come nel caso scalare
+            self._array = tuple(
+                np.array(v + (fuori,), dtype=float)
+                for v, fuori in (
+                    (self.chiavi, math.inf),
+                    (self.costanti, 0.0),
+                    (self.aliquote, 0.0),
+                    (self.rampe, 0.0),
+                    (self.estremi, 0.0),
+                    (self.larghezze, 1.0),
+                )
+            )
+        chiavi, costanti, aliquote, rampe, estremi, larghezze = self._array
+
+        i = np.searchsorted(chiavi[:-1], x, side="left")
+        return costanti[i] + x * aliquote[i] + rampe[i] * (estremi[i] - x) / larghezze[i]
+
+
+class AliquotaPerFascia:
+    """
+    Aliquota UNICA scelta in base alla fascia di reddito (addizionale regionale):
+    NON progressiva, si applica a tutto il reddito.
+    """
+
+    def __init__(self, fasce):
+        self.fasce = tuple(fasce)
+        self.soglie = tuple(float(s) for s, _ in self.fasce)
+        self.aliquote = tuple(a for _, a in self.fasce)
+        self.punti_di_rottura = tuple(s for s in self.soglie if math.isfinite(s))
+        self._array = None
+
+    def __call__(self, reddito: float) -> float:
+        i = bisect_left(self.soglie, reddito)
+        if i == len(self.soglie):
+            return 0.0
+        return reddito * self.aliquote[i]
+
+    def affine(self, reddito: float):
+        """(pendenza, intercetta) della fascia che contiene `reddito`."""
+        i = bisect_left(self.soglie, reddito)
+        if i == len(self.soglie):
+            return 0.0, 0.0
+        return self.aliquote[i], 0.0
+
+    def valuta_array(self, reddito):
+        import numpy as np
+
+        if self._array is None:
+            self._array = (
+                np.array(self.soglie, dtype=float),
+                np.array(self.aliquote + (0.0,), dtype=float),
+            )
+        soglie, aliquote = self._array
+
+        i = np.searchsorted(soglie, reddito, side="left")
+        return reddito * aliquote[i]
+
+
+@dataclass(frozen=True)
+class RegoleFiscali:
+    """Insieme di tabelle compilate e parametri di un anno usato dal motore di calcolo."""
+    irpef: ScaglioniProgressivi
+    soglia_no_tax: float
+    detrazioni_lavoro: TabellaTratti
+    agevolazioni: TabellaTratti
+    aliquota_inps: float                # contributi a carico del dipendente
+    aliquota_inps_apprendistato: float
+    soglia_deducibilita_fondo: float    # fondo pensione, contributo del datore compreso
+    giorni_lavorativi: int              # giorni lavorativi standard dell'anno (netto orario)
+    addizionali_regionali: dict = field(default_factory=dict)
+    versione: str = ""
+    impronta: str = ""                  # sha256 del contenuto del pacchetto (vedi pacchetti_regole)
+
+    @classmethod
+    def da_dati(
+        cls,
+        scaglioni_irpef,
+        soglia_no_tax,
+        detrazioni_lavoro,
+        agevolazioni,
+        aliquote_regionali,
+        aliquota_inps,
+        aliquota_inps_apprendistato,
+        soglia_deducibilita_fondo,
+        giorni_lavorativi,
+        versione="",
+        impronta=""
+    ):
+        return cls(
+            irpef=ScaglioniProgressivi(scaglioni_irpef),
+            soglia_no_tax=soglia_no_tax,
+            detrazioni_lavoro=TabellaTratti(detrazioni_lavoro),
+            agevolazioni=TabellaTratti(agevolazioni),
+            aliquota_inps=aliquota_inps,
+            aliquota_inps_apprendistato=aliquota_inps_apprendistato,
+            soglia_deducibilita_fondo=soglia_deducibilita_fondo,
+            giorni_lavorativi=giorni_lavorativi,
+            addizionali_regionali={
+                regione: AliquotaPerFascia(fasce)
+                for regione, fasce in aliquote_regionali.items()
+            },
+            versione=versione,
+            impronta=impronta,
+        )
+
+    def aliquota_contributi(self, tipo_contratto: str) -> float:
+        """Aliquota INPS a carico del dipendente per il tipo di contratto."""
+        if tipo_contratto.lower() == "apprendistato":
+            return self.aliquota_inps_apprendistato
+        return self.aliquota_inps
+
+    def aliquota_contributi_array(self, tipo_contratto):
+        import numpy as np
+
+        apprendistato = np.char.lower(np.asarray(tipo_contratto, dtype=str)) == "apprendistato"
+        return np.where(apprendistato, self.aliquota_inps_apprendistato, self.aliquota_inps)
+
+    def addizionale_regionale(self, regione: str, reddito: float) -> float:
+        tabella = self.addizionali_regionali.get(regione)
+        if tabella is None:
+            return 0.0
+        return tabella(reddito)
+
+    def punti_di_rottura(self, regione: str):
+        """
+        Tutte le soglie di reddito imponibile in cui cambia una delle
+        tabelle (IRPEF, no tax area, detrazioni, agevolazioni, fasce regionali).
+        """
+        punti = {float(self.soglia_no_tax)}
+        punti.update(self.irpef.punti_di_rottura)
+        punti.update(self.detrazioni_lavoro.punti_di_rottura)
+        punti.update(self.agevolazioni.punti_di_rottura)
+        tabella = self.addizionali_regionali.get(regione)
+        if tabella is not None:
+            punti.update(tabella.punti_di_rottura)
+        return sorted(punti)
+
+    def addizionale_regionale_affine(self, regione: str, reddito: float):
+        tabella = self.addizionali_regionali.get(regione)
+        if tabella is None:
+            return 0.0, 0.0
+        return tabella.affine(reddito)
+
+    def addizionale_regionale_array(self, regione, reddito):
+        """
+        Versione vettoriale: una ricerca binaria per ciascuna regione presente;
+        le regioni sconosciute pagano 0.
+        """
+        import numpy as np
+
+        regione, reddito = np.broadcast_arrays(np.asarray(regione, dtype=str), np.asarray(reddito, dtype=float))
+        risultato = np.zeros(reddito.shape)
+
+        nomi, inverso = np.unique(regione, return_inverse=True)
+        inverso = inverso.reshape(reddito.shape)
+        for k, nome in enumerate(nomi):
+            tabella = self.addizionali_regionali.get(str(nome))
+            if tabella is None:
+                continue
+            maschera = inverso == k
+            risultato[maschera] = tabella.valuta_array(reddito[maschera])
+        return risultato
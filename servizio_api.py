@@ -0,0 +1,352 @@
+"""
+API HTTP/JSON locale per il calcolo del netto.
+
+Server asyncio della libreria standard (nessuna dipendenza in più), pensato
+per girare accanto all'app su localhost:
+
+    POST /calcola          un oggetto JSON con gli argomenti di calcola_dettagli
+                           -> un oggetto con i campi di DettagliStipendio
+    POST /calcola/batch    {"righe": [ {...}, {...} ]}
+                           -> NDJSON in streaming (una riga di risultato per
+                              riga di input, nello stesso ordine), calcolato a
+                              blocchi con calcola_colonne
+    GET  /metriche         contatori di richieste, righe calcolate, throughput
+                           e latenze (media, p50, p95, p99, massima) per endpoint
+                           (più le statistiche della cache, se attiva)
+
+Gli input sono controllati con gli stessi limiti dei widget dell'app
+(validazione.py); i campi mancanti prendono i valori di default dell'app.
+
+Con --cache N le richieste singole passano da una CacheCalcolo di N voci.
+
+Esempio:
+    python servizio_api.py --porta 8080 --cache 4096
+    curl -s localhost:8080/calcola -d '{"ral": 35000, "regione": "Lazio"}'
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter, defaultdict, deque
+
+import numpy as np
+
+from cache_calcolo import CacheCalcolo
+from motore_batch import calcola_colonne
+from motore_fiscale import DettagliStipendio, calcola_dettagli_record
+from validazione import COLONNE_INPUT, ErroreValidazione, valida_colonne, valida_parametri
+
+# righe calcolate e inviate per ogni blocco della risposta batch
+DIMENSIONE_BLOCCO = 10_000
+# corpo massimo accettato per una richiesta (byte)
+MAX_CORPO = 256 * 1024 * 1024
+# latenze conservate per endpoint per il calcolo dei percentili
+CAMPIONI_LATENZA = 10_000
+
+_STATI = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    500: "Internal Server Error",
+}
+
+# percorso -> (metodo, metodo di ServizioAPI che lo gestisce)
+_ENDPOINT = {
+    "/calcola": ("POST", "_calcola"),
+    "/calcola/batch": ("POST", "_calcola_batch"),
+    "/metriche": ("GET", "_metriche"),
+}
+
+
+class ErroreHTTP(Exception):
+    def __init__(self, stato: int, messaggio: str, dettagli=None):
+        super().__init__(messaggio)
+        self.stato = stato
+        self.messaggio = messaggio
+        self.dettagli = dettagli or []
+
+
+# -------------------------
+# Metriche
+# -------------------------
+class Metriche:
+    """Contatori in memoria; aggiornati solo dal thread dell'event loop."""
+
+    def __init__(self, campioni: int = CAMPIONI_LATENZA):
+        self.avvio = time.monotonic()
+        self.richieste = Counter()
+        self.stati = Counter()
+        self.righe = 0
+        self.latenze = defaultdict(lambda: deque(maxlen=campioni))
+
+    def registra(self, percorso: str, stato: int, secondi: float, righe: int = 0):
+        self.richieste[percorso] += 1
+        self.stati[stato] += 1
+        self.righe += righe
+        self.latenze[percorso].append(secondi)
+
+    def istantanea(self) -> dict:
+        trascorso = time.monotonic() - self.avvio
+        latenze = {}
+        for percorso, campioni in self.latenze.items():
+            ms = np.array(campioni) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            latenze[percorso] = {
+                "campioni": len(ms),
+                "media": float(ms.mean()),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "massima": float(ms.max()),
+            }
+        totale = sum(self.richieste.values())
+        return {
+            "in_servizio_da_s": trascorso,
+            "richieste": dict(self.richieste),
+            "richieste_totali": totale,
+            "richieste_al_secondo": totale / trascorso if trascorso > 0 else 0.0,
+            "risposte_per_stato": {str(s): n for s, n in sorted(self.stati.items())},
+            "righe_calcolate": self.righe,
+            "righe_al_secondo": self.righe / trascorso if trascorso > 0 else 0.0,
+            "latenza_ms": latenze,
+        }
+
+
+# -------------------------
+# Calcolo
+# -------------------------
+# riga NDJSON con i campi di DettagliStipendio nell'ordine del record
+_MODELLO_RIGA = "{" + ", ".join(f'"{campo}": %s' for campo in DettagliStipendio._fields) + "}\n"
+
+
+def _blocco_ndjson(colonne: dict, inizio: int, fine: int) -> bytes:
+    """
+    Calcola le righe [inizio, fine) e le codifica come NDJSON.
+    Stesso testo di json.dumps riga per riga (i float sono scritti con repr),
+    ma ogni colonna viene convertita una volta sola.
+    """
+    risultati = calcola_colonne(**{nome: colonne[nome][inizio:fine] for nome in COLONNE_INPUT})
+    testi = []
+    for campo in DettagliStipendio._fields:
+        valori = risultati[campo]
+        if valori.dtype.kind == "U":
+            # poche stringhe distinte (regione, contratto): codificate una volta
+            nomi, inverso = np.unique(valori, return_inverse=True)
+            codificati = [json.dumps(str(n)) for n in nomi]
+            testi.append([codificati[i] for i in inverso.tolist()])
+        else:
+            testi.append(list(map(float.__repr__, valori.tolist())))
+    return "".join(map(_MODELLO_RIGA.__mod__, zip(*testi))).encode()
+
+
+def _leggi_json(corpo: bytes):
+    try:
+        return json.loads(corpo)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ErroreHTTP(400, f"JSON non valido: {e}")
+
+
+# -------------------------
+# Server
+# -------------------------
+class ServizioAPI:
+    def __init__(self, dimensione_blocco: int = DIMENSIONE_BLOCCO, max_corpo: int = MAX_CORPO, cache=None):
+        self.dimensione_blocco = dimensione_blocco
+        self.max_corpo = max_corpo
+        self.metriche = Metriche()
+        # CacheCalcolo facoltativa per /calcola
+        self.cache = cache
+
+    async def avvia(self, host: str = "127.0.0.1", porta: int = 8080):
+        return await asyncio.start_server(self.gestisci_connessione, host, porta)
+
+    async def gestisci_connessione(self, reader, writer):
+        """Una connessione (keep-alive): una richiesta dopo l'altra finché il client la tiene aperta."""
+        try:
+            while True:
+                try:
+                    richiesta = await self._leggi_richiesta(reader)
+                except ErroreHTTP as e:
+                    await self._rispondi_errore(writer, e)
+                    break
+                if richiesta is None:
+                    break
+                metodo, percorso, mantieni, corpo = richiesta
+
+                inizio = time.perf_counter()
+                righe = 0
+                try:
+                    righe = await self._instrada(writer, metodo, percorso, corpo, mantieni)
+                    stato = 200
+                except ErroreHTTP as e:
+                    stato = e.stato
+                    await self._rispondi_errore(writer, e, mantieni)
+                except Exception as e:
+                    # errore imprevisto (anche a risposta batch già iniziata): si chiude la connessione
+                    stato, mantieni = 500, False
+                    await self._rispondi_errore(writer, ErroreHTTP(500, f"errore interno: {e}"))
+                chiave = percorso if percorso in _ENDPOINT else "altro"
+                self.metriche.registra(chiave, stato, time.perf_counter() - inizio, righe)
+
+                if not mantieni:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _leggi_richiesta(self, reader):
+        riga = await reader.readline()
+        if not riga.strip():
+            return None
+        try:
+            metodo, percorso, versione = riga.decode("latin-1").split()
+        except ValueError:
+            raise ErroreHTTP(400, "riga di richiesta non valida")
+
+        intestazioni = {}
+        while True:
+            riga = await reader.readline()
+            if riga in (b"\r\n", b"\n", b""):
+                break
+            nome, _, valore = riga.decode("latin-1").partition(":")
+            intestazioni[nome.strip().lower()] = valore.strip()
+
+        try:
+            lunghezza = int(intestazioni.get("content-length", 0))
+        except ValueError:
+            raise ErroreHTTP(400, "Content-Length non valido")
+        if lunghezza < 0:
+            raise ErroreHTTP(400, "Content-Length non valido")
+        if lunghezza > self.max_corpo:
+            raise ErroreHTTP(413, f"corpo oltre {self.max_corpo} byte")
+        corpo = await reader.readexactly(lunghezza) if lunghezza else b""
+
+        connessione = intestazioni.get("connection", "").lower()
+        mantieni = connessione != "close" if versione == "HTTP/1.1" else connessione == "keep-alive"
+        return metodo.upper(), percorso.split("?", 1)[0], mantieni, corpo
+
+    async def _instrada(self, writer, metodo, percorso, corpo, mantieni) -> int:
+        """Esegue la richiesta e restituisce il numero di righe calcolate."""
+        endpoint = _ENDPOINT.get(percorso)
+        if endpoint is None:
+            raise ErroreHTTP(404, f"percorso sconosciuto: {percorso}")
+        metodo_atteso, nome = endpoint
+        if metodo != metodo_atteso:
+            raise ErroreHTTP(405, f"{percorso} accetta solo {metodo_atteso}")
+        return await getattr(self, nome)(writer, corpo, mantieni)
+
+    # ----- endpoint -----
+    async def _calcola(self, writer, corpo, mantieni) -> int:
+        # il parsing (corpi fino a max_corpo) non deve fermare l'event loop
+        dati = await asyncio.get_running_loop().run_in_executor(None, _leggi_json, corpo)
+        if not isinstance(dati, dict):
+            raise ErroreHTTP(400, "atteso un oggetto JSON")
+        try:
+            parametri = valida_parametri(dati)
+        except ErroreValidazione as e:
+            raise ErroreHTTP(422, "input non valido", e.errori)
+        # argomenti posizionali: stesso ordine di COLONNE_INPUT e della firma del motore
+        argomenti = [parametri[nome] for nome in COLONNE_INPUT]
+        if self.cache is not None:
+            risultato = self.cache.calcola_dettagli_record(*argomenti)._asdict()
+        else:
+            risultato = calcola_dettagli_record(*argomenti)._asdict()
+        await self._rispondi_json(writer, 200, risultato, mantieni)
+        return 1
+
+    async def _calcola_batch(self, writer, corpo, mantieni) -> int:
+        loop = asyncio.get_running_loop()
+        # anche il parsing fuori dall'event loop: il corpo può arrivare a max_corpo
+        dati = await loop.run_in_executor(None, _leggi_json, corpo)
+        righe = dati.get("righe") if isinstance(dati, dict) else None
+        if not isinstance(righe, list):
+            raise ErroreHTTP(400, 'atteso un oggetto {"righe": [...]}')
+
+        try:
+            colonne = await loop.run_in_executor(None, valida_colonne, righe)
+        except ErroreValidazione as e:
+            raise ErroreHTTP(422, "input non valido", e.errori)
+        n = len(righe)
+        del righe, dati
+
+        writer.write(self._intestazione(200, "application/x-ndjson", mantieni, chunked=True))
+        for inizio in range(0, n, self.dimensione_blocco):
+            fine = min(inizio + self.dimensione_blocco, n)
+            # calcolo e codifica fuori dall'event loop: le altre richieste non si fermano
+            blocco = await loop.run_in_executor(None, _blocco_ndjson, colonne, inizio, fine)
+            writer.write(b"%x\r\n%b\r\n" % (len(blocco), blocco))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return n
+
+    async def _metriche(self, writer, corpo, mantieni) -> int:
+        metriche = self.metriche.istantanea()
+        if self.cache is not None:
+            statistiche = self.cache.statistiche()
+            metriche["cache"] = {**statistiche._asdict(), "tasso_successo": statistiche.tasso_successo}
+        await self._rispondi_json(writer, 200, metriche, mantieni)
+        return 0
+
+    # ----- risposte -----
+    @staticmethod
+    def _intestazione(stato, tipo, mantieni, lunghezza=None, chunked=False) -> bytes:
+        righe = [
+            f"HTTP/1.1 {stato} {_STATI[stato]}",
+            f"Content-Type: {tipo}",
+            f"Connection: {'keep-alive' if mantieni else 'close'}",
+        ]
+        if chunked:
+            righe.append("Transfer-Encoding: chunked")
+        else:
+            righe.append(f"Content-Length: {lunghezza}")
+        return ("\r\n".join(righe) + "\r\n\r\n").encode("latin-1")
+
+    async def _rispondi_json(self, writer, stato, oggetto, mantieni):
+        corpo = json.dumps(oggetto).encode()
+        writer.write(self._intestazione(stato, "application/json", mantieni, len(corpo)) + corpo)
+        await writer.drain()
+
+    async def _rispondi_errore(self, writer, errore: ErroreHTTP, mantieni=False):
+        oggetto = {"errore": errore.messaggio}
+        if errore.dettagli:
+            oggetto["dettagli"] = errore.dettagli
+        await self._rispondi_json(writer, errore.stato, oggetto, mantieni)
+
+
+async def _servi(host, porta, dimensione_blocco, voci_cache):
+    cache = CacheCalcolo(max_voci=voci_cache) if voci_cache else None
+    server = await ServizioAPI(dimensione_blocco, cache=cache).avvia(host, porta)
+    indirizzi = ", ".join(str(s.getsockname()) for s in server.sockets)
+    print(f"In ascolto su {indirizzi}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP/JSON locale per il calcolo del netto.")
+    parser.add_argument("--host", default="127.0.0.1", help="indirizzo di ascolto (default: 127.0.0.1)")
+    parser.add_argument("--porta", type=int, default=8080, help="porta di ascolto (default: 8080)")
+    parser.add_argument(
+        "--blocco", type=int, default=DIMENSIONE_BLOCCO,
+        help=f"righe per blocco della risposta batch (default: {DIMENSIONE_BLOCCO})"
+    )
+    parser.add_argument(
+        "--cache", type=int, default=0,
+        help="voci della cache LRU per POST /calcola (default: 0 = disattivata)"
+    )
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_servi(args.host, args.porta, args.blocco, args.cache))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
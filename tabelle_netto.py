@@ -0,0 +1,234 @@
+"""
+Tabelle precalcolate del netto annuo, per le richieste più frequenti.
+
+Per ogni regione × tipo di contratto × aliquota comunale di
+ALIQUOTE_COMUNALI_TABELLATE, il netto di ogni RAL intera nel campo dell'app
+(1.000 - 200.000 €), con gli altri parametri ai valori predefiniti. È un cubo
+di scenari (cubo_scenari) con il solo campo "netto", salvato in un .npy
+mappato in memoria: una risposta è una lettura, senza calcolo.
+
+Il contratto incide sul netto solo con l'aliquota INPS: si tabella un
+contratto per aliquota (Indeterminato e Apprendistato) e gli altri
+(Determinato) leggono la tabella di quello con la stessa aliquota.
+
+Il .json accanto alle tabelle registra versione e impronta (sha256 del
+contenuto) delle regole fiscali: tabelle costruite con un altro pacchetto, o
+con lo stesso pacchetto poi modificato, non vengono aperte.
+
+Le combinazioni non tabellate (RAL non intere o fuori campo, altre aliquote
+o altri parametri, regole diverse) passano al motore.
+
+    python tabelle_netto.py [tabelle_netto.npy]     # costruisce e verifica
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from cubo_scenari import apri_cubo, calcola_cubo
+from motore_batch import calcola_colonne
+from motore_fiscale import REGOLE_2026, calcola_dettagli, calcola_dettagli_record
+from validazione import LIMITI, TIPI_CONTRATTO
+
+PERCORSO_PREDEFINITO = Path(__file__).with_name("tabelle_netto.npy")
+
+# aliquote comunali più diffuse: esenzione, 0,5%, 0,8% (massimo ordinario e default dell'app), 0,9% (Roma)
+ALIQUOTE_COMUNALI_TABELLATE = (0.0, 0.5, 0.8, 0.9)
+
+CAMPO = "netto"
+
+
+def contratti_distinti(regole=None):
+    """Un contratto per ciascuna aliquota INPS, nell'ordine di TIPI_CONTRATTO."""
+    regole = regole or REGOLE_2026
+    per_aliquota = {}
+    for contratto in TIPI_CONTRATTO:
+        per_aliquota.setdefault(regole.aliquota_contributi(contratto), contratto)
+    return tuple(per_aliquota.values())
+
+
+def costruisci_tabelle(percorso=PERCORSO_PREDEFINITO, regioni=None):
+    """
+    Calcola e salva le tabelle (regioni: default tutte). Con tutte le regioni
+    21 × 2 contratti × 4 aliquote × 199.001 RAL × 8 byte, circa 267 MB.
+    """
+    ral_min, ral_max = LIMITI["ral"]
+    return calcola_cubo(
+        np.arange(ral_min, ral_max + 1, dtype=float),
+        ALIQUOTE_COMUNALI_TABELLATE,
+        regioni=regioni,
+        tipi_contratto=contratti_distinti(),
+        percorso=percorso,
+        campi=(CAMPO,),
+    )
+
+
+class TabelleNetto:
+    def __init__(self, cubo):
+        if cubo.versione_regole != REGOLE_2026.versione:
+            raise ValueError(
+                f"tabelle costruite con le regole {cubo.versione_regole or 'sconosciute'}, "
+                f"attive le {REGOLE_2026.versione}: ricostruirle con python tabelle_netto.py"
+            )
+        if cubo.impronta_regole != REGOLE_2026.impronta:
+            raise ValueError(
+                f"le regole {REGOLE_2026.versione} sono cambiate dopo la costruzione delle tabelle: "
+                f"ricostruirle con python tabelle_netto.py"
+            )
+        self.cubo = cubo
+        self.valori = cubo.valori[CAMPO]
+        self.parametri = cubo.parametri
+        self._regioni = {r: i for i, r in enumerate(cubo.assi["regione"].tolist())}
+        # ogni contratto punta alla tabella del contratto con la stessa aliquota INPS
+        tabellati = {
+            REGOLE_2026.aliquota_contributi(c): i for i, c in enumerate(cubo.assi["tipo_contratto"].tolist())
+        }
+        self._contratti = {
+            c: tabellati[REGOLE_2026.aliquota_contributi(c)]
+            for c in TIPI_CONTRATTO
+            if REGOLE_2026.aliquota_contributi(c) in tabellati
+        }
+        self._aliquote = {a: i for i, a in enumerate(cubo.assi["addizionale_comunale_perc"].tolist())}
+        ral = cubo.assi["ral"]
+        self.ral_min = float(ral[0])
+        self.ral_max = float(ral[-1])
+
+    @classmethod
+    def apri(cls, percorso=PERCORSO_PREDEFINITO):
+        return cls(apri_cubo(percorso))
+
+    @classmethod
+    def apri_se_presente(cls, percorso=PERCORSO_PREDEFINITO):
+        """Come apri, ma None se le tabelle non sono state costruite (ValueError se superate)."""
+        percorso = Path(percorso)
+        return cls.apri(percorso) if percorso.exists() else None
+
+    def _tabellato(self, altri: dict) -> bool:
+        return all(nome in self.parametri and self.parametri[nome] == valore for nome, valore in altri.items())
+
+    # ----- singola richiesta -----
+    def netto(self, ral, regione, tipo_contratto, addizionale_comunale_perc, regole=None, **altri) -> float:
+        """
+        Netto annuo (campo netto di calcola_dettagli); gli altri argomenti di
+        calcola_dettagli sono facoltativi e valgono quelli delle tabelle.
+        """
+        if regole is None and self.ral_min <= ral <= self.ral_max and ral == int(ral) and self._tabellato(altri):
+            i_regione = self._regioni.get(regione)
+            i_contratto = self._contratti.get(tipo_contratto)
+            i_aliquota = self._aliquote.get(addizionale_comunale_perc)
+            if i_regione is not None and i_contratto is not None and i_aliquota is not None:
+                return float(self.valori[i_regione, i_contratto, i_aliquota, int(ral - self.ral_min)])
+
+        return calcola_dettagli_record(
+            ral=ral,
+            regione=regione,
+            tipo_contratto=tipo_contratto,
+            addizionale_comunale_perc=addizionale_comunale_perc,
+            regole=regole,
+            **{**self.parametri, **altri}
+        ).netto
+
+    # ----- batch -----
+    def netto_array(self, ral, regione, tipo_contratto, addizionale_comunale_perc, regole=None, **altri):
+        """Versione vettoriale di netto: lettura per le righe tabellate, motore batch per le altre."""
+        ral, regione, tipo_contratto, addizionale_comunale_perc = np.broadcast_arrays(
+            np.asarray(ral, dtype=float),
+            np.asarray(regione, dtype=str),
+            np.asarray(tipo_contratto, dtype=str),
+            np.asarray(addizionale_comunale_perc, dtype=float),
+        )
+        risultato = np.empty(ral.shape)
+        tabellate = np.zeros(ral.shape, dtype=bool)
+
+        if regole is None and self._tabellato(altri):
+            indici = []
+            for valori, posizioni in (
+                (regione, self._regioni),
+                (tipo_contratto, self._contratti),
+                (addizionale_comunale_perc, self._aliquote),
+            ):
+                distinti, inversi = np.unique(valori, return_inverse=True)
+                mappa = np.array([posizioni.get(v, -1) for v in distinti.tolist()], dtype=np.intp)
+                indici.append(mappa[inversi].reshape(ral.shape))
+            tabellate = (
+                (indici[0] >= 0) & (indici[1] >= 0) & (indici[2] >= 0)
+                & (ral >= self.ral_min) & (ral <= self.ral_max) & (ral == np.floor(ral))
+            )
+            i_ral = (ral[tabellate] - self.ral_min).astype(np.intp)
+            risultato[tabellate] = self.valori[
+                indici[0][tabellate], indici[1][tabellate], indici[2][tabellate], i_ral
+            ]
+
+        altre = ~tabellate
+        if altre.any():
+            risultato[altre] = calcola_colonne(
+                ral=ral[altre],
+                regione=regione[altre],
+                tipo_contratto=tipo_contratto[altre],
+                addizionale_comunale_perc=addizionale_comunale_perc[altre],
+                regole=regole,
+                **{**self.parametri, **altri}
+            )[CAMPO]
+        return risultato
+
+
+def verifica_tabelle(tabelle: TabelleNetto, campione: int = 10_000, seme: int = 0, max_differenze: int = 20):
+    """
+    Confronta le tabelle con il motore: tutte le celle con il motore batch
+    (identico al bit a quello scalare) e `campione` celle a caso direttamente
+    con calcola_dettagli. Restituisce le differenze trovate come tuple
+    (regione, tipo contratto, aliquota comunale, RAL, tabella, motore):
+    lista vuota se le tabelle sono esatte.
+    """
+    assi = tabelle.cubo.assi
+    differenze = []
+
+    for regione in assi["regione"]:
+        attese = calcola_cubo(
+            assi["ral"],
+            assi["addizionale_comunale_perc"],
+            regioni=[regione],
+            tipi_contratto=assi["tipo_contratto"],
+            campi=(CAMPO,),
+            **tabelle.parametri
+        ).valori[CAMPO][0]
+        trovate = tabelle.valori[tabelle.cubo.indice("regione", regione)]
+        for i_c, i_a, i_r in zip(*np.nonzero(trovate != attese)):
+            differenze.append((
+                str(regione), str(assi["tipo_contratto"][i_c]), float(assi["addizionale_comunale_perc"][i_a]),
+                float(assi["ral"][i_r]), float(trovate[i_c, i_a, i_r]), float(attese[i_c, i_a, i_r]),
+            ))
+            if len(differenze) >= max_differenze:
+                return differenze
+
+    # il campione usa tutti i contratti, anche quelli che leggono la tabella di un altro
+    generatore = np.random.default_rng(seme)
+    contratti = np.array(list(tabelle._contratti))
+    for i_regione, i_contratto, i_aliquota, i_ral in zip(
+        *(generatore.integers(0, n, campione) for n in (len(assi["regione"]), len(contratti), *tabelle.valori.shape[2:]))
+    ):
+        regione, contratto = assi["regione"][i_regione].item(), contratti[i_contratto].item()
+        aliquota, ral = assi["addizionale_comunale_perc"][i_aliquota].item(), assi["ral"][i_ral].item()
+        atteso = calcola_dettagli(
+            ral=ral, regione=regione, tipo_contratto=contratto, addizionale_comunale_perc=aliquota,
+            **tabelle.parametri
+        )["Stipendio Netto"]
+        trovato = float(tabelle.valori[i_regione, tabelle._contratti[contratto], i_aliquota, i_ral])
+        if trovato != atteso:
+            differenze.append((regione, contratto, aliquota, ral, trovato, atteso))
+            if len(differenze) >= max_differenze:
+                break
+    return differenze
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        print("uso: python tabelle_netto.py [destinazione.npy]", file=sys.stderr)
+        sys.exit(2)
+    percorso = sys.argv[1] if len(sys.argv) == 2 else PERCORSO_PREDEFINITO
+    cubo = costruisci_tabelle(percorso)
+    print(f"{cubo.valori.size} valori scritti in {percorso}", file=sys.stderr)
+    differenze = verifica_tabelle(TabelleNetto.apri(percorso))
+    for differenza in differenze:
+        print("differenza:", differenza, file=sys.stderr)
+    sys.exit(1 if differenze else 0)
@@ -0,0 +1,86 @@
+"""
+Parità di motore_jit con motore_fiscale.calcola_dettagli: con il nucleo
+compilato da Numba e con il ripiego in puro Python.
+"""
+import importlib
+import sys
+
+import pytest
+
+import motore_fiscale
+from benchmark import popolazione
+from pacchetti_regole import carica_regole
+
+N_BUSTE = 2000
+REDDITI = (0.0, 8500.0, 15000.0, 15000.01, 28000.0, 50000.0, 75000.0)
+
+
+def _buste(n=N_BUSTE, seme=0):
+    colonne = popolazione(n, seme=seme)
+    for i in range(n):
+        argomenti = {nome: valori[i].item() for nome, valori in colonne.items()}
+        for nome in ("fondo_pensione_val", "fondo_pensione_perc"):
+            if argomenti[nome] != argomenti[nome]:  # NaN = non impostato
+                argomenti[nome] = None
+        yield argomenti
+
+
+def _uguali(atteso: dict, ottenuto: dict):
+    assert atteso.keys() == ottenuto.keys()
+    for campo, a in atteso.items():
+        b = ottenuto[campo]
+        assert a == b or (a != a and b != b), (campo, a, b)
+
+
+def _verifica(motore, regole=None):
+    for argomenti in _buste():
+        _uguali(
+            motore_fiscale.calcola_dettagli(**argomenti, regole=regole),
+            motore.calcola_dettagli(**argomenti, regole=regole),
+        )
+    for regione in list(motore_fiscale.ALIQUOTE_REGIONALI) + ["Regione inesistente"]:
+        for reddito in REDDITI:
+            assert motore.calcola_addizionale_regionale(regione, reddito) == (
+                motore_fiscale.calcola_addizionale_regionale(regione, reddito)
+            ), (regione, reddito)
+
+
+@pytest.fixture
+def motore_senza_numba(monkeypatch):
+    """motore_jit importato come se Numba non fosse installato."""
+    import motore_jit
+
+    monkeypatch.setitem(sys.modules, "numba", None)
+    yield importlib.reload(motore_jit)
+    monkeypatch.undo()
+    importlib.reload(motore_jit)
+
+
+def test_parita_numba():
+    pytest.importorskip("numba")
+    import motore_jit
+
+    assert motore_jit.JIT_DISPONIBILE
+    _verifica(motore_jit)
+
+
+def test_parita_numba_regole_2025():
+    pytest.importorskip("numba")
+    import motore_jit
+
+    _verifica(motore_jit, regole=carica_regole(2025))
+
+
+def test_ripiego_senza_numba(motore_senza_numba):
+    assert not motore_senza_numba.JIT_DISPONIBILE
+    assert motore_senza_numba.calcola_dettagli_record is motore_fiscale.calcola_dettagli_record
+    _verifica(motore_senza_numba)
+
+
+def test_nucleo_interpretato_senza_numba(motore_senza_numba):
+    # lo stesso nucleo, eseguito da Python: le formule coincidono al bit
+    for argomenti in _buste(500):
+        _uguali(
+            motore_fiscale.calcola_dettagli_record(**argomenti)._asdict(),
+            motore_senza_numba._calcola_dettagli_record_jit(**argomenti)._asdict(),
+        )
@@ -0,0 +1,184 @@
+"""
+Limiti e valori predefiniti degli input di calcola_dettagli.
+
+Sono gli stessi dei widget st.number_input di calc_stip.py (che li leggono
+da qui), così API, calcolo massivo e interfaccia accettano gli stessi valori.
+"""
+from motore_fiscale import ALIQUOTE_REGIONALI
+
+TIPI_CONTRATTO = ("Indeterminato", "Apprendistato", "Determinato")
+MODALITA_PREMIO = ("flat", "irpef")
+
+# (minimo, massimo); None = nessun massimo
+LIMITI = {
+    "ral": (1000, 200000),
+    "addizionale_comunale_perc": (0.0, 2.0),
+    "mensilita": (12, 15),
+    "buono_giornaliero": (0.0, None),
+    "giorni_buoni": (0, 365),
+    "assicurazione_sanitaria_perc": (0.0, None),
+    "fondo_pensione_val": (0.0, None),
+    "fondo_pensione_perc": (0.0, None),
+    "contributo_datore_perc": (0.0, 10.0),
+    "premio_risultato": (0.0, None),
+    "premio_flat_perc": (0.0, 50.0),
+    "welfare": (0.0, None),
+    "giorni_lavorati": (0, 365),
+    "orario_settimanale": (1.0, 120.0),
+    "giorni_ferie": (0, 100),
+}
+
+# campi che devono essere numeri interi (13.0 è ammesso, 13.5 no)
+CAMPI_INTERI = ("mensilita", "giorni_buoni", "giorni_lavorati", "giorni_ferie")
+
+# massimo applicato anche ai campi senza massimo: oltre, i prodotti del calcolo
+# possono uscire dal range dei float (inf nelle risposte JSON)
+MASSIMO_ASSOLUTO = 1e9
+
+# valori usati quando un input manca (gli stessi di default dell'app)
+VALORI_PREDEFINITI = {
+    "regione": "Lombardia",
+    "addizionale_comunale_perc": 0.8,
+    "mensilita": 13,
+    "tipo_contratto": "Indeterminato",
+    "buono_giornaliero": 8.0,
+    "giorni_buoni": 220,
+    "assicurazione_sanitaria_perc": 0.0,
+    "fondo_pensione_val": None,
+    "fondo_pensione_perc": None,
+    "contributo_datore_perc": 0.0,
+    "premio_risultato": 0.0,
+    "premio_modalita": "flat",
+    "premio_flat_perc": 1.0,
+    "welfare": 0.0,
+    "giorni_lavorati": 365,
+    "orario_settimanale": 40.0,
+    "giorni_ferie": 26,
+}
+
+COLONNE_INPUT = ("ral", *VALORI_PREDEFINITI)
+
+_SCELTE = {
+    "regione": tuple(ALIQUOTE_REGIONALI),
+    "tipo_contratto": TIPI_CONTRATTO,
+    "premio_modalita": MODALITA_PREMIO,
+}
+
+
+# tipi ammessi nelle colonne numeriche (None = NaN, solo per il fondo pensione)
+_TIPI_NUMERICI = {int, float, type(None)}
+_CAMPI_FACOLTATIVI = ("fondo_pensione_val", "fondo_pensione_perc")
+
+
+class ErroreValidazione(ValueError):
+    """Input fuori dai limiti; `errori` contiene un messaggio per problema."""
+
+    def __init__(self, errori):
+        self.errori = list(errori)
+        super().__init__("; ".join(self.errori))
+
+
+def limiti_widget(nome: str) -> dict:
+    """Argomenti min_value / max_value per st.number_input."""
+    minimo, massimo = LIMITI[nome]
+    if massimo is None:
+        return {"min_value": minimo}
+    return {"min_value": minimo, "max_value": massimo}
+
+
+def _fuori_limiti(nome, minimo, massimo):
+    if massimo is None:
+        return f"{nome}: deve essere >= {minimo} e <= {MASSIMO_ASSOLUTO:g}"
+    return f"{nome}: deve essere compreso tra {minimo} e {massimo}"
+
+
+def valida_parametri(dati: dict) -> dict:
+    """
+    Controlla un singolo insieme di input e restituisce gli argomenti
+    completi per calcola_dettagli (predefiniti per i campi mancanti).
+    """
+    errori = [f"{nome}: campo sconosciuto" for nome in dati if nome not in COLONNE_INPUT]
+    if "ral" not in dati:
+        errori.append("ral: campo obbligatorio")
+
+    parametri = {**VALORI_PREDEFINITI, **{k: v for k, v in dati.items() if k in COLONNE_INPUT}}
+
+    for nome, scelte in _SCELTE.items():
+        if parametri[nome] not in scelte:
+            errori.append(f"{nome}: valore non ammesso {parametri[nome]!r}")
+
+    for nome, (minimo, massimo) in LIMITI.items():
+        valore = parametri.get(nome)
+        if valore is None and nome in _CAMPI_FACOLTATIVI:
+            continue
+        if isinstance(valore, bool) or not isinstance(valore, (int, float)):
+            errori.append(f"{nome}: atteso un numero")
+        elif not (valore >= minimo and valore <= (MASSIMO_ASSOLUTO if massimo is None else massimo)):
+            # falso anche per NaN e infinito
+            errori.append(_fuori_limiti(nome, minimo, massimo))
+        elif nome in CAMPI_INTERI and not float(valore).is_integer():
+            errori.append(f"{nome}: atteso un numero intero")
+
+    if parametri["fondo_pensione_val"] is not None and parametri["fondo_pensione_perc"] is not None:
+        errori.append("fondo_pensione_val / fondo_pensione_perc: indicarne al massimo uno")
+
+    if errori:
+        raise ErroreValidazione(errori)
+    return parametri
+
+
+def valida_colonne(righe, max_errori: int = 20) -> dict:
+    """
+    Versione vettoriale di valida_parametri per una lista di input:
+    restituisce le colonne (array NumPy) per calcola_dettagli_batch.
+    Gli errori indicano l'indice della riga.
+    """
+    import numpy as np
+
+    errori = []
+    for i, riga in enumerate(righe):
+        if not isinstance(riga, dict):
+            errori.append(f"riga {i}: atteso un oggetto")
+        else:
+            errori.extend(f"riga {i}: {nome}: campo sconosciuto" for nome in riga if nome not in COLONNE_INPUT)
+            if "ral" not in riga:
+                errori.append(f"riga {i}: ral: campo obbligatorio")
+        if len(errori) >= max_errori:
+            raise ErroreValidazione(errori)
+    if errori:
+        raise ErroreValidazione(errori)
+
+    colonne = {}
+    for nome in COLONNE_INPUT:
+        predefinito = VALORI_PREDEFINITI.get(nome)
+        valori = [riga.get(nome, predefinito) for riga in righe]
+        if nome in _SCELTE:
+            colonne[nome] = np.array(valori, dtype=str)
+            ammessi = np.isin(colonne[nome], _SCELTE[nome])
+            for i in np.flatnonzero(~ammessi)[:max_errori]:
+                errori.append(f"riga {i}: {nome}: valore non ammesso {valori[i]!r}")
+            continue
+        if not set(map(type, valori)) <= _TIPI_NUMERICI:
+            errori.append(f"{nome}: atteso un numero in ogni riga")
+            continue
+        colonne[nome] = np.array(valori, dtype=float)  # None -> NaN
+
+        minimo, massimo = LIMITI[nome]
+        # falso anche per NaN e infinito
+        valida = (colonne[nome] >= minimo) & (colonne[nome] <= (MASSIMO_ASSOLUTO if massimo is None else massimo))
+        if nome in _CAMPI_FACOLTATIVI:
+            valida |= np.array([v is None for v in valori], dtype=bool)
+        for i in np.flatnonzero(~valida)[:max_errori]:
+            errori.append(f"riga {i}: {_fuori_limiti(nome, minimo, massimo)}")
+        if nome in CAMPI_INTERI:
+            for i in np.flatnonzero(valida & (colonne[nome] % 1 != 0))[:max_errori]:
+                errori.append(f"riga {i}: {nome}: atteso un numero intero")
+
+    if not errori:
+        entrambi = ~np.isnan(colonne["fondo_pensione_val"]) & ~np.isnan(colonne["fondo_pensione_perc"])
+        for i in np.flatnonzero(entrambi)[:max_errori]:
+            errori.append(f"riga {i}: fondo_pensione_val / fondo_pensione_perc: indicarne al massimo uno")
+
+    if errori:
+        raise ErroreValidazione(errori[:max_errori])
+    return colonne